@@ -0,0 +1,963 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - Offline performance checks for the detection pipeline
+
+Usage:
+    python benchmark.py tiling --video ForBiggerEscapes.mp4 --frames 20
+    python benchmark.py parity --backend onnx
+    python benchmark.py imports
+    python benchmark.py frame-pipeline --sizes 1280x720 1920x1080
+    python benchmark.py decode --video upload/video.mp4 --frames 300
+    python benchmark.py live --video upload/video.mp4 --seconds 20 --drop-every 5
+    python benchmark.py broadcast --subscribers 500 --streams 8 --slow 10
+    python benchmark.py broadcast --subscribers 500 --subscribe one
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+import config
+import detection_broadcast
+from benchmark_utils import latency_summary, match_boxes, match_count, print_table, read_frames, time_detector
+from detection_broadcast import DetectionBroadcaster, encode_message
+from frame_pipeline import FrameBufferPool, bgr_to_frame, frame_to_bgr
+from model_backends import MODEL_BACKENDS
+from person_detector import PersonDetector, draw_positions, positions_from_array
+from video_sources import LatencyWindow, LiveCapture, PyAVFileReader, ReadAheadReader
+
+
+# ============================================================================
+# Tiling
+# ============================================================================
+
+def run_tiling(args) -> int:
+    """Compare single-pass and tiled inference latency and recall"""
+    frames = read_frames(args.video, args.frames, args.stride, args.scale)
+    height, width = frames[0].shape[:2]
+
+    single = PersonDetector(args.model, conf_threshold=args.conf)
+    tiled = PersonDetector(
+        args.model,
+        conf_threshold=args.conf,
+        tile_size=args.tile_size,
+        tile_overlap=args.overlap,
+        tile_nms_iou=args.nms_iou
+    )
+    if single.model is None:
+        print("Model could not be loaded", file=sys.stderr)
+        return 1
+
+    # Reference labels: one single pass on the upscaled frame, the expensive
+    # alternative to tiling. Without ground truth this measures how much of
+    # what a high-resolution pass finds each mode recovers.
+    reference_size = args.reference_size or int(np.ceil(max(height, width) * 2 / 32) * 32)
+    reference_boxes = []
+    reference_latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        results = single.model(frame, conf=args.conf, imgsz=reference_size, verbose=False)
+        reference_latencies.append((time.perf_counter() - start) * 1000)
+        reference_boxes.append(single._result_boxes(results[0]))
+
+    report = {
+        "video": args.video,
+        "frames": len(frames),
+        "resolution": f"{width}x{height}",
+        "tile_size": args.tile_size,
+        "tile_overlap": args.overlap,
+        "reference_imgsz": reference_size,
+        "reference_persons": int(sum(len(boxes) for boxes in reference_boxes)),
+        "reference_latency": latency_summary(reference_latencies),
+        "modes": {}
+    }
+
+    for name, detector in (("single", single), ("tiled", tiled)):
+        boxes, latencies = time_detector(detector, frames)
+        matched = sum(
+            match_count(predicted, reference, args.match_iou)
+            for predicted, reference in zip(boxes, reference_boxes)
+        )
+        detected = sum(len(predicted) for predicted in boxes)
+        report["modes"][name] = {
+            "latency": latency_summary(latencies),
+            "persons": detected,
+            "recall": matched / report["reference_persons"] if report["reference_persons"] else 0.0,
+            "precision": matched / detected if detected else 0.0
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"\n{len(frames)} frame(s) at {width}x{height} from {args.video}")
+    print(f"Tiles: {args.tile_size}px, {args.overlap:.0%} overlap | "
+          f"reference: single pass at imgsz={reference_size} "
+          f"({report['reference_persons']} persons, "
+          f"{report['reference_latency']['mean_ms']:.1f} ms/frame)\n")
+    print_table(
+        ["mode", "mean ms", "p50 ms", "p95 ms", "persons", "recall", "precision"],
+        [
+            [
+                name,
+                f"{mode['latency']['mean_ms']:.1f}",
+                f"{mode['latency']['p50_ms']:.1f}",
+                f"{mode['latency']['p95_ms']:.1f}",
+                mode["persons"],
+                f"{mode['recall']:.3f}",
+                f"{mode['precision']:.3f}"
+            ]
+            for name, mode in report["modes"].items()
+        ]
+    )
+    return 0
+
+
+# ============================================================================
+# Backend Parity
+# ============================================================================
+
+def compare_detections(
+    reference: np.ndarray,
+    candidate: np.ndarray,
+    conf_threshold: float,
+    iou_tolerance: float,
+    conf_tolerance: float
+) -> List[str]:
+    """
+    Check that two backends found the same persons
+
+    Boxes must pair up with at least `iou_tolerance` IoU and confidences
+    within `conf_tolerance`. A box without a partner is only accepted when
+    its confidence is within `conf_tolerance` of the detection threshold,
+    where small numeric differences legitimately flip the decision.
+
+    Returns:
+        Human-readable mismatch descriptions (empty when the frames agree)
+    """
+    problems = []
+    pairs = match_boxes(candidate, reference, iou_tolerance)
+
+    for candidate_index, reference_index, iou in pairs:
+        delta = abs(float(candidate[candidate_index, 4]) - float(reference[reference_index, 4]))
+        if delta > conf_tolerance:
+            problems.append(f"confidence differs by {delta:.3f} (IoU {iou:.3f})")
+
+    borderline = conf_threshold + conf_tolerance
+    matched_reference = {reference_index for _, reference_index, _ in pairs}
+    matched_candidate = {candidate_index for candidate_index, _, _ in pairs}
+    for index, box in enumerate(reference):
+        if index not in matched_reference and box[4] > borderline:
+            problems.append(f"missing person at ({box[0]:.0f}, {box[1]:.0f}) conf {box[4]:.3f}")
+    for index, box in enumerate(candidate):
+        if index not in matched_candidate and box[4] > borderline:
+            problems.append(f"extra person at ({box[0]:.0f}, {box[1]:.0f}) conf {box[4]:.3f}")
+
+    return problems
+
+
+def run_parity(args) -> int:
+    """Compare an exported backend against the PyTorch checkpoint; exit 1 on mismatch"""
+    frames = read_frames(args.video, args.frames, args.stride)
+
+    reference = PersonDetector(args.model, conf_threshold=args.conf, backend="pytorch")
+    candidate = PersonDetector(args.model, conf_threshold=args.conf, backend=args.backend)
+    if reference.model is None or candidate.model is None:
+        print("Model could not be loaded", file=sys.stderr)
+        return 1
+    if candidate.active_backend != args.backend:
+        print(f"The {args.backend} backend could not be loaded", file=sys.stderr)
+        return 1
+
+    reference_boxes, reference_latencies = time_detector(reference, frames)
+    candidate_boxes, candidate_latencies = time_detector(candidate, frames)
+
+    failures = 0
+    persons = 0
+    for index, (expected, actual) in enumerate(zip(reference_boxes, candidate_boxes)):
+        persons += len(expected)
+        problems = compare_detections(expected, actual, args.conf, args.iou_tolerance, args.conf_tolerance)
+        if problems:
+            failures += 1
+            print(f"frame {index}: " + "; ".join(problems))
+
+    reference_ms = latency_summary(reference_latencies)["mean_ms"]
+    candidate_ms = latency_summary(candidate_latencies)["mean_ms"]
+    print(f"\n{len(frames)} frame(s), {persons} person(s) from the PyTorch reference")
+    print(f"pytorch: {reference_ms:.1f} ms/frame | {args.backend}: {candidate_ms:.1f} ms/frame "
+          f"({reference_ms / candidate_ms:.2f}x)")
+
+    if failures:
+        print(f"FAIL: {failures} frame(s) differ beyond tolerance "
+              f"(IoU >= {args.iou_tolerance}, confidence +/- {args.conf_tolerance})")
+        return 1
+
+    print(f"OK: detections match within tolerance "
+          f"(IoU >= {args.iou_tolerance}, confidence +/- {args.conf_tolerance})")
+    return 0
+
+
+# ============================================================================
+# Import Time
+# ============================================================================
+
+# Modules that processes without inference (API, tooling, workers before
+# model load) import; they must not pull in the ML stack
+LIGHT_MODULES = ["config", "model_backends", "person_detector", "inference", "detector_workers"]
+HEAVY_MODULES = ["torch", "ultralytics"]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed_ms = (time.perf_counter() - start) * 1000
+rss_mb = 0.0
+try:
+    with open("/proc/self/status") as status:
+        rss_mb = next(int(line.split()[1]) for line in status if line.startswith("VmRSS:")) / 1024
+except (OSError, StopIteration):
+    pass
+print(json.dumps({{
+    "ms": elapsed_ms,
+    "rss_mb": rss_mb,
+    "heavy": [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def probe_import(module: str) -> dict:
+    """Import a module in a fresh interpreter and measure time, RSS and heavy imports"""
+    completed = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=Path(__file__).resolve().parent,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        return {"error": error[-1] if error else f"exit code {completed.returncode}"}
+    # Modules may print (e.g. config warnings); the probe result is the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_imports(args) -> int:
+    """Guard import time: light modules must not import torch/ultralytics; exit 1 on regression"""
+    rows = []
+    failures = []
+
+    for module in args.modules:
+        samples = [probe_import(module) for _ in range(args.repeat)]
+        errors = [sample["error"] for sample in samples if "error" in sample]
+        if errors:
+            failures.append(f"{module}: import failed ({errors[0]})")
+            rows.append([module, "-", "-", "error"])
+            continue
+
+        best = min(samples, key=lambda sample: sample["ms"])
+        heavy = sorted({name for sample in samples for name in sample["heavy"]})
+        rows.append([module, f"{best['ms']:.0f}", f"{best['rss_mb']:.0f}", ", ".join(heavy) or "-"])
+
+        if heavy:
+            failures.append(f"{module}: imports {', '.join(heavy)} at import time")
+        if best["ms"] > args.max_ms:
+            failures.append(f"{module}: {best['ms']:.0f} ms exceeds the {args.max_ms:.0f} ms budget")
+
+    if args.baseline:
+        for module in HEAVY_MODULES:
+            sample = probe_import(module)
+            if "error" not in sample:
+                rows.append([f"({module})", f"{sample['ms']:.0f}", f"{sample['rss_mb']:.0f}", "baseline"])
+
+    print_table(["module", "import ms", "RSS MB", "heavy modules"], rows)
+
+    if failures:
+        print("\nFAIL:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+
+    print(f"\nOK: no module imports {' or '.join(HEAVY_MODULES)}; all within {args.max_ms:.0f} ms")
+    return 0
+
+
+# ============================================================================
+# Frame Pipeline
+# ============================================================================
+
+# Source frame kinds seen by ProcessedVideoTrack: (name, pixel format, owned by the track)
+FRAME_SOURCES = [
+    ("decoder yuv420p", "yuv420p", True),
+    ("file track bgr24", "bgr24", True),
+    ("relayed bgr24", "bgr24", False),
+]
+FRAME_STAGES = ["to_bgr", "copy", "draw", "wrap", "to_yuv"]
+
+
+def synthetic_frame(width: int, height: int, pixel_format: str, persons: int, seed: int = 0):
+    """Random video frame in the given format plus random person boxes to draw"""
+    from av import VideoFrame
+
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    frame = VideoFrame.from_ndarray(image, format="bgr24")
+    if pixel_format != "bgr24":
+        frame = frame.reformat(format=pixel_format)
+
+    sizes = rng.uniform(0.05, 0.3, (persons, 2)) * [width, height]
+    corners = rng.uniform(0, 1, (persons, 2)) * ([width, height] - sizes)
+    boxes = np.hstack([corners, corners + sizes, rng.uniform(0.5, 1.0, (persons, 1))])
+    return frame, positions_from_array(boxes, image.shape)
+
+
+def time_frame_pipeline(frame, person_positions: List[Dict], owned: bool, zero_copy: bool,
+                        iterations: int) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """
+    Time turning a source frame into an annotated frame ready for the encoder
+
+    Args:
+        frame: Source video frame
+        person_positions: Boxes to draw
+        owned: Whether the track may draw on the source frame's pixels
+        zero_copy: Use the frame_pipeline path instead of copy-annotate-copy
+        iterations: Number of timed runs
+
+    Returns:
+        Tuple of (average ms per stage, bytes written per stage)
+    """
+    from av import VideoFrame
+
+    pool = FrameBufferPool()
+    written = dict.fromkeys(FRAME_STAGES, 0)
+    totals = dict.fromkeys(FRAME_STAGES, 0.0)
+
+    for _ in range(iterations):
+        stage_start = time.perf_counter()
+
+        def lap(stage: str):
+            nonlocal stage_start
+            now = time.perf_counter()
+            totals[stage] += (now - stage_start) * 1000
+            stage_start = now
+
+        if zero_copy:
+            image, converted = frame_to_bgr(frame)
+            lap("to_bgr")
+            copied = not (converted or owned)
+            if copied:
+                image = pool.copy(image)
+            lap("copy")
+            draw_positions(image, person_positions)
+            lap("draw")
+            output = bgr_to_frame(image, frame)
+            lap("wrap")
+        else:
+            # Previous path: convert, annotate a copy, copy into a new frame
+            converted = frame.format.name != "bgr24"
+            copied = True
+            image = frame.to_ndarray(format="bgr24")
+            lap("to_bgr")
+            image = image.copy()
+            lap("copy")
+            draw_positions(image, person_positions)
+            lap("draw")
+            output = VideoFrame.from_ndarray(image, format="bgr24")
+            lap("wrap")
+        # What the encoder does before compressing
+        output.reformat(format="yuv420p")
+        lap("to_yuv")
+
+    frame_bytes = frame.width * frame.height * 3
+    written["to_bgr"] = frame_bytes if converted else 0
+    written["copy"] = frame_bytes if copied else 0
+    written["wrap"] = 0 if zero_copy else frame_bytes
+    written["to_yuv"] = frame_bytes // 2
+    return {stage: total / iterations for stage, total in totals.items()}, written
+
+
+def run_frame_pipeline(args) -> int:
+    """Per-stage time and memory traffic of the video overlay path, previous vs zero-copy"""
+    report = []
+    for size in args.sizes:
+        width, height = (int(value) for value in size.lower().split("x"))
+        for source, pixel_format, owned in FRAME_SOURCES:
+            frame, person_positions = synthetic_frame(width, height, pixel_format, args.persons)
+            for zero_copy in (False, True):
+                # One untimed pass to fault in buffers
+                time_frame_pipeline(frame, person_positions, owned, zero_copy, 1)
+                stage_ms, written = time_frame_pipeline(frame, person_positions, owned, zero_copy, args.iterations)
+                report.append({
+                    "size": size,
+                    "source": source,
+                    "path": "zero-copy" if zero_copy else "previous",
+                    "stage_ms": stage_ms,
+                    "total_ms": sum(stage_ms.values()),
+                    "written_mb": sum(written.values()) / 1e6,
+                    # Effective bandwidth of the stages that write whole frames
+                    "stage_gbps": {
+                        stage: written[stage] / (stage_ms[stage] * 1e6)
+                        for stage in FRAME_STAGES
+                        if written[stage] and stage_ms[stage] > 0
+                    },
+                })
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"{args.persons} boxes per frame, {args.iterations} iterations; ms per stage (GB/s where a full frame is written)\n")
+    rows = []
+    for entry in report:
+        stages = [
+            f"{entry['stage_ms'][stage]:.2f}"
+            + (f" ({entry['stage_gbps'][stage]:.1f})" if stage in entry["stage_gbps"] else "")
+            for stage in FRAME_STAGES
+        ]
+        rows.append([entry["size"], entry["source"], entry["path"], *stages,
+                     f"{entry['total_ms']:.2f}", f"{entry['written_mb']:.1f}"])
+    print_table(["size", "source", "path", *FRAME_STAGES, "total ms", "MB written"], rows)
+    return 0
+
+
+# ============================================================================
+# Decode Read-Ahead
+# ============================================================================
+
+def looping_reader(video_path: str):
+    """Blocking read function over a video file that rewinds at the end (like VideoFileTrack)"""
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+
+    def read() -> np.ndarray:
+        ok, frame = capture.read()
+        if not ok:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = capture.read()
+        if not ok:
+            raise RuntimeError(f"Could not read from {video_path}")
+        return frame
+
+    return capture, read
+
+
+async def measure_decode(video_path: str, frames: int, fps: float, readahead: int,
+                         decoder: str = "opencv") -> Dict[str, Dict]:
+    """
+    Serve frames at `fps` from a coroutine, decoding inline or on a read-ahead thread
+
+    A concurrent 1 ms ticker stands in for the other clients on the event loop;
+    its lateness is how long decoding held the loop. CPU time covers all
+    threads (decode, codec threads and the loop).
+    """
+    if decoder == "pyav":
+        capture = PyAVFileReader(video_path, loop=True)
+        read = capture.read
+    else:
+        capture, read = looping_reader(video_path)
+    reader = ReadAheadReader(read, capacity=readahead, name="benchmark-decode") if readahead else None
+    recv_latency = LatencyWindow(frames)
+    loop_lag = LatencyWindow(frames * 100)
+    done = False
+
+    async def ticker():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            loop_lag.record(max(0.0, (time.perf_counter() - start) * 1000 - 1.0))
+
+    ticker_task = asyncio.create_task(ticker())
+    cpu_start = time.process_time()
+    try:
+        next_frame_at = time.perf_counter()
+        for _ in range(frames):
+            next_frame_at += 1.0 / fps
+            await asyncio.sleep(max(0.0, next_frame_at - time.perf_counter()))
+
+            start = time.perf_counter()
+            if reader:
+                await reader.get()
+            else:
+                read()
+            recv_latency.record((time.perf_counter() - start) * 1000)
+    finally:
+        cpu_ms = (time.process_time() - cpu_start) * 1000
+        done = True
+        await ticker_task
+        release = capture.close if decoder == "pyav" else capture.release
+        if reader:
+            reader.stop(on_stopped=release)
+        else:
+            release()
+
+    return {
+        "recv": recv_latency.summary(),
+        "loop_lag": loop_lag.summary(),
+        "cpu_ms_per_frame": cpu_ms / frames
+    }
+
+
+def run_decode(args) -> int:
+    """recv() latency, event-loop lag and CPU per frame: inline vs read-ahead, OpenCV vs PyAV"""
+    runs = [
+        ("opencv inline", 0, "opencv"),
+        (f"opencv read-ahead {args.readahead}", args.readahead, "opencv"),
+        (f"pyav read-ahead {args.readahead}", args.readahead, "pyav"),
+    ]
+    results = {}
+    for name, readahead, decoder in runs:
+        results[name] = asyncio.run(measure_decode(args.video, args.frames, args.fps, readahead, decoder))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{args.frames} frames of {args.video} served at {args.fps:g} fps (loops at the end)\n")
+    rows = []
+    for name, result in results.items():
+        for metric in ("recv", "loop_lag"):
+            summary = result[metric]
+            rows.append([name, metric, *(f"{summary[key]:.2f}" for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")),
+                         f"{result['cpu_ms_per_frame']:.2f}" if metric == "recv" else ""])
+    print_table(["decode", "metric", "p50 ms", "p95 ms", "p99 ms", "max ms", "CPU ms/frame"], rows)
+    return 0
+
+
+# ============================================================================
+# Live Source
+# ============================================================================
+
+class MJPEGStandIn:
+    """
+    Local stand-in for a network camera: a video file served as an endless MJPEG stream
+
+    Frames are paced at the file's frame rate, like a camera. With drop_every,
+    each connection is cut after that many seconds and the server refuses new
+    ones for `outage` seconds, so the capture side has to reconnect and back off.
+    """
+
+    def __init__(self, video_path: str, max_frames: int = 300, drop_every: float = 0.0,
+                 outage: float = 0.0, quality: int = 80):
+        capture = cv2.VideoCapture(video_path)
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        capture.release()
+        # Encode once up front so serving costs no CPU next to the measured capture
+        self.jpegs = [cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+                      for frame in read_frames(video_path, max_frames)]
+        self.drop_every = drop_every
+        self.outage = outage
+        self.down_until = 0.0
+        self.connections = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/stream.mjpg"
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if time.time() < stand_in.down_until:
+                    self.send_error(503)
+                    return
+                stand_in.connections += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+
+                started = time.perf_counter()
+                index = 0
+                try:
+                    while True:
+                        due = started + index / stand_in.fps
+                        time.sleep(max(0.0, due - time.perf_counter()))
+                        if stand_in.drop_every and time.perf_counter() - started >= stand_in.drop_every:
+                            stand_in.down_until = time.time() + stand_in.outage
+                            return
+                        jpeg = stand_in.jpegs[index % len(stand_in.jpegs)]
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                         + f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+                        index += 1
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+        return Handler
+
+    def start(self) -> str:
+        threading.Thread(target=self.server.serve_forever, name="mjpeg-stand-in", daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+async def measure_live(url: str, seconds: float, consume_fps: float, buffer: int, drop_oldest: bool,
+                       initial_delay: float, max_delay: float) -> Dict:
+    """
+    Consume a live source at `consume_fps` (standing in for inference) for `seconds`
+
+    Frame age is the time from capture to dequeue: with a blocking buffer it
+    grows while the consumer is slower than the source, with drop-oldest it
+    stays near one consumer interval.
+    """
+    capture = LiveCapture(url, initial_delay=initial_delay, max_delay=max_delay)
+    reader = ReadAheadReader(capture.read, capacity=buffer, name="benchmark-live", drop_oldest=drop_oldest)
+    frame_age = LatencyWindow(int(seconds * consume_fps) + 1)
+    consumed = 0
+    try:
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            try:
+                item = await asyncio.wait_for(reader.get(), timeout=end - time.perf_counter())
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                break
+            frame_age.record((time.time() - item[1]) * 1000)
+            consumed += 1
+            await asyncio.sleep(1.0 / consume_fps)
+    finally:
+        capture.close()
+        reader.stop()
+
+    return {
+        "frames_consumed": consumed,
+        "frames_dropped": reader.dropped,
+        **capture.get_stats(),
+        "frame_age": frame_age.summary()
+    }
+
+
+def run_live(args) -> int:
+    """Frame age and reconnects of the live capture: blocking vs drop-oldest buffer"""
+    stand_in = None
+    url = args.url
+    if url is None:
+        stand_in = MJPEGStandIn(args.video, drop_every=args.drop_every, outage=args.outage)
+        url = stand_in.start()
+
+    results = {}
+    try:
+        for name, drop_oldest in (("blocking", False), ("drop-oldest", True)):
+            results[name] = asyncio.run(measure_live(
+                url, args.seconds, args.consume_fps, args.buffer, drop_oldest,
+                config.LIVE_RECONNECT_INITIAL_DELAY, config.LIVE_RECONNECT_MAX_DELAY
+            ))
+    finally:
+        if stand_in:
+            stand_in.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    source = url if stand_in is None else f"{args.video} looped over {url} ({stand_in.fps:g} fps)"
+    print(f"{source}, consumed at {args.consume_fps:g} fps for {args.seconds:g}s, buffer {args.buffer}\n")
+    rows = []
+    for name, result in results.items():
+        age = result["frame_age"]
+        rows.append([name, result["frames_captured"], result["frames_consumed"], result["frames_dropped"],
+                     result["connects"], result["failed_connects"],
+                     *(f"{age[key]:.1f}" if age[key] is not None else "-" for key in ("p50_ms", "p95_ms", "max_ms"))])
+    print_table(["buffer", "captured", "consumed", "dropped", "connects", "failed",
+                 "age p50 ms", "age p95 ms", "age max ms"], rows)
+    return 0
+
+
+# ============================================================================
+# Detection Broadcast
+# ============================================================================
+
+class CountingSocket:
+    """Stand-in WebSocket that counts what it is sent, optionally taking `delay` per send"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.messages = 0
+        self.bytes = 0
+        # Time of the last message relative to the broadcast tick that produced it
+        self.tick_started = 0.0
+        self.delivery_ms: List[float] = []
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages += 1
+        self.bytes += len(text)
+        self.delivery_ms.append((time.perf_counter() - self.tick_started) * 1000)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+class SyntheticStreams:
+    """
+    Detection summaries of simulated streams, shaped like ProcessedVideoTrack's
+
+    A fraction of the people stand still (sub-pixel detector jitter), the
+    rest walk; a stream gets a new detection every `detect_every` ticks.
+    """
+
+    def __init__(self, streams: int, persons: int, detect_every: int, stationary: float,
+                 width: int = 1920, height: int = 1080, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.detect_every = detect_every
+        self.width = width
+        self.height = height
+        self.tick = 0
+        self.state = {}
+        for index in range(streams):
+            boxes = np.column_stack([
+                self.rng.uniform(100, width - 100, persons),
+                self.rng.uniform(100, height - 100, persons),
+                self.rng.uniform(30, 80, persons),
+                self.rng.uniform(80, 200, persons),
+            ])
+            velocity = self.rng.normal(0, 4, (persons, 2))
+            velocity[self.rng.random(persons) < stationary] = 0
+            self.state[f"drone-{index}"] = (boxes, velocity)
+        self.detections = {stream_id: self._detect(stream_id, 0) for stream_id in self.state}
+
+    def _detect(self, stream_id: str, frame_number: int) -> Dict:
+        boxes, velocity = self.state[stream_id]
+        boxes[:, :2] += velocity
+        jittered = boxes + self.rng.normal(0, 0.3, boxes.shape)
+        confidences = np.clip(self.rng.normal(0.7, 0.005, len(boxes)), 0, 1)
+        positions = positions_from_array(np.column_stack([jittered, confidences]), (self.height, self.width))
+        return {
+            "total_persons": len(positions),
+            "average_confidence": float(confidences.mean()) if len(positions) else 0.0,
+            "positions": positions,
+            "timestamp": int(time.time() * 1000) + frame_number,
+            "frame_number": frame_number,
+            "pts": frame_number * 3000,
+            "client_id": "shared"
+        }
+
+    def advance(self) -> Dict[str, Dict]:
+        self.tick += 1
+        if self.tick % self.detect_every == 0:
+            for stream_id in self.state:
+                self.detections[stream_id] = self._detect(stream_id, self.tick)
+        return self.detections
+
+
+async def legacy_broadcast(sockets: List[CountingSocket], streams: Dict[str, Dict]):
+    """The previous loop: every stream in full to every socket each tick, encoded and awaited per socket"""
+    for stream_id, detection in streams.items():
+        message = {"type": "detection_update", "client_id": stream_id, "data": detection, "timestamp": time.time()}
+        for socket in sockets:
+            await socket.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+
+async def measure_broadcast(mode: str, args) -> Dict:
+    """
+    Deliveries, bytes, CPU and fast-subscriber latency of one broadcast mode
+
+    Ticks run at the broadcast interval. Latency is measured on the fast
+    subscribers only: from the start of a tick to the arrival of its message.
+    """
+    source = SyntheticStreams(args.streams, args.persons, args.detect_every, args.stationary)
+    fast = [CountingSocket() for _ in range(args.subscribers - args.slow)]
+    slow = [CountingSocket(delay=args.slow_ms / 1000) for _ in range(args.slow)]
+    # Slow subscribers first: the worst case for a sequential broadcast
+    sockets = slow + fast
+    broadcaster = DetectionBroadcaster(
+        min_interval=args.interval,
+        delta=(mode == "delta"),
+        keyframe_interval=float("inf"),
+        max_queue=args.queue_size,
+        slow_policy=args.policy
+    )
+    if mode != "legacy":
+        for i, socket in enumerate(sockets):
+            broadcaster.add(socket)
+            if args.subscribe == "one":
+                # A dashboard for a single drone (the old broadcast ignored subscriptions)
+                broadcaster.subscriptions.subscribe(socket, f"drone-{i % args.streams}")
+
+    cpu_start = time.process_time()
+    next_tick = time.perf_counter()
+    for _ in range(args.ticks):
+        detections = source.advance()
+        tick_started = time.perf_counter()
+        for socket in sockets:
+            socket.tick_started = tick_started
+
+        if mode == "legacy":
+            await legacy_broadcast(sockets, detections)
+        else:
+            await broadcaster.broadcast(detections)
+
+        next_tick = max(next_tick + args.interval, time.perf_counter())
+        await asyncio.sleep(next_tick - time.perf_counter())
+    cpu_ms = (time.process_time() - cpu_start) * 1000
+
+    for subscriber in list(broadcaster.subscribers.values()):
+        subscriber.sender.stop()
+    await asyncio.sleep(0)
+
+    stats = broadcaster.get_stats()
+    delivery = [latency for socket in fast for latency in socket.delivery_ms]
+    return {
+        "messages_per_tick": sum(socket.messages for socket in sockets) / args.ticks,
+        "kb_per_tick": sum(socket.bytes for socket in sockets) / args.ticks / 1024,
+        "encodings_per_tick": (stats["encodings"] / args.ticks if mode != "legacy"
+                               else args.subscribers * args.streams),
+        "cpu_ms_per_tick": cpu_ms / args.ticks,
+        "fast_delivery": latency_summary(delivery) if delivery else None,
+        "slow_messages": sum(socket.messages for socket in slow),
+        "dropped": stats["messages_dropped"] + sum(
+            subscriber["queue"]["coalesced"] for subscriber in stats["per_subscriber"]),
+        "slow_disconnects": stats["slow_disconnects"]
+    }
+
+
+def time_encoding(detection: Dict, iterations: int = 200) -> Dict[str, float]:
+    """Milliseconds to serialize one full update with json and with orjson (if installed)"""
+    message = {"type": "detection_update", "client_id": "drone-0", "data": detection, "timestamp": time.time()}
+    results = {}
+    encoders = {"json": lambda: json.dumps(message, separators=(",", ":"), ensure_ascii=False)}
+    if detection_broadcast.orjson is not None:
+        encoders["orjson"] = lambda: encode_message(message)
+    for name, encode in encoders.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            encode()
+        results[name] = (time.perf_counter() - start) * 1000 / iterations
+    return results
+
+
+def run_broadcast(args) -> int:
+    """WebSocket fan-out: the old sequential full resend vs queued change-detected (and delta) updates"""
+    args.slow = min(args.slow, args.subscribers)
+    results = {mode: asyncio.run(measure_broadcast(mode, args)) for mode in ("legacy", "full", "delta")}
+    encoding = time_encoding(SyntheticStreams(1, args.persons, 1, args.stationary).detections["drone-0"])
+
+    if args.json:
+        print(json.dumps({"modes": results, "encode_ms": encoding}, indent=2))
+        return 0
+
+    print(f"{args.subscribers} subscribers ({args.slow} taking {args.slow_ms:g} ms per send) x {args.streams} streams, "
+          f"{args.persons} persons ({args.stationary:.0%} standing), new detection every {args.detect_every} tick(s), "
+          f"{args.ticks} ticks of {args.interval * 1000:g} ms, queue {args.queue_size} ({args.policy}), "
+          f"subscribed to {args.subscribe} stream(s)\n")
+    rows = []
+    for mode, result in results.items():
+        delivery = result["fast_delivery"]
+        rows.append([mode, f"{result['messages_per_tick']:.0f}", f"{result['kb_per_tick']:.1f}",
+                     f"{result['encodings_per_tick']:.1f}", f"{result['cpu_ms_per_tick']:.2f}",
+                     f"{delivery['p50_ms']:.1f}" if delivery else "-", f"{delivery['p95_ms']:.1f}" if delivery else "-",
+                     result["dropped"], result["slow_disconnects"]])
+    print_table(["broadcast", "msgs/tick", "KB/tick", "encodes/tick", "CPU ms/tick",
+                 "fast p50 ms", "fast p95 ms", "dropped", "disconnects"], rows)
+    print("\nFull update encoding: " + ", ".join(f"{name} {ms:.3f} ms" for name, ms in encoding.items()))
+    return 0
+
+
+# ============================================================================
+# Main
+# ============================================================================
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Detection pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tiling = subparsers.add_parser("tiling", help="Single-pass vs tiled inference latency and recall")
+    tiling.add_argument("--video", default="ForBiggerEscapes.mp4", help="Input video file")
+    tiling.add_argument("--model", default=config.MODEL_PATH, help="YOLO model path")
+    tiling.add_argument("--frames", type=int, default=20, help="Number of frames to evaluate")
+    tiling.add_argument("--stride", type=int, default=5, help="Keep every Nth frame of the video")
+    tiling.add_argument("--scale", type=float, default=1.0, help="Resize frames by this factor first")
+    tiling.add_argument("--conf", type=float, default=config.DETECTION_CONFIDENCE, help="Confidence threshold")
+    tiling.add_argument("--tile-size", type=int, default=config.TILE_SIZE, help="Tile edge length in pixels")
+    tiling.add_argument("--overlap", type=float, default=config.TILE_OVERLAP, help="Tile overlap fraction")
+    tiling.add_argument("--nms-iou", type=float, default=config.TILE_NMS_IOU, help="Cross-tile NMS IoU")
+    tiling.add_argument("--reference-size", type=int, default=0,
+                        help="Model input size of the reference pass (default: 2x the frame)")
+    tiling.add_argument("--match-iou", type=float, default=0.5, help="IoU for a detection to count as found")
+    tiling.add_argument("--json", action="store_true", help="Print the report as JSON")
+    tiling.set_defaults(func=run_tiling)
+
+    parity = subparsers.add_parser("parity", help="Check an exported backend against PyTorch detections")
+    parity.add_argument("--backend", default="onnx", choices=[name for name in MODEL_BACKENDS if name != "pytorch"],
+                        help="Backend to check")
+    parity.add_argument("--video", default="ForBiggerEscapes.mp4", help="Input video file")
+    parity.add_argument("--model", default=config.MODEL_PATH, help="PyTorch checkpoint (.pt)")
+    parity.add_argument("--frames", type=int, default=30, help="Number of frames to compare")
+    parity.add_argument("--stride", type=int, default=5, help="Keep every Nth frame of the video")
+    parity.add_argument("--conf", type=float, default=config.DETECTION_CONFIDENCE, help="Confidence threshold")
+    parity.add_argument("--iou-tolerance", type=float, default=0.9, help="Minimum IoU between paired boxes")
+    parity.add_argument("--conf-tolerance", type=float, default=0.05, help="Maximum confidence difference")
+    parity.set_defaults(func=run_parity)
+
+    imports = subparsers.add_parser("imports", help="Guard import time of modules that must stay ML-free")
+    imports.add_argument("--modules", nargs="+", default=LIGHT_MODULES, help="Modules to import")
+    imports.add_argument("--max-ms", type=float, default=1000.0, help="Import time budget per module")
+    imports.add_argument("--repeat", type=int, default=3, help="Fresh imports per module (fastest counts)")
+    imports.add_argument("--baseline", action="store_true", help="Also show the cost of importing torch/ultralytics")
+    imports.set_defaults(func=run_imports)
+
+    frames = subparsers.add_parser("frame-pipeline", help="Per-stage cost of the video overlay path")
+    frames.add_argument("--sizes", nargs="+", default=["1280x720", "1920x1080"], help="Frame sizes (WIDTHxHEIGHT)")
+    frames.add_argument("--persons", type=int, default=20, help="Boxes drawn per frame")
+    frames.add_argument("--iterations", type=int, default=50, help="Timed runs per configuration")
+    frames.add_argument("--json", action="store_true", help="Print the report as JSON")
+    frames.set_defaults(func=run_frame_pipeline)
+
+    decode = subparsers.add_parser("decode", help="recv() latency and CPU of the file decoders")
+    decode.add_argument("--video", default=config.DEFAULT_VIDEO_PATH, help="Input video file")
+    decode.add_argument("--frames", type=int, default=300, help="Frames to serve (the video loops)")
+    decode.add_argument("--fps", type=float, default=30.0, help="Serving rate")
+    decode.add_argument("--readahead", type=int, default=config.VIDEO_READAHEAD_FRAMES, help="Read-ahead buffer size")
+    decode.add_argument("--json", action="store_true", help="Print the report as JSON")
+    decode.set_defaults(func=run_decode)
+
+    live = subparsers.add_parser("live", help="Frame age and reconnects of the live capture")
+    live.add_argument("--video", default=config.DEFAULT_VIDEO_PATH, help="File served by the local MJPEG stand-in")
+    live.add_argument("--url", default=None, help="Capture this stream instead (e.g. an RTSP camera)")
+    live.add_argument("--seconds", type=float, default=10.0, help="Capture time per buffer mode")
+    live.add_argument("--consume-fps", type=float, default=10.0, help="Consumer rate (stands in for inference)")
+    live.add_argument("--buffer", type=int, default=config.LIVE_BUFFER_FRAMES, help="Capture buffer size")
+    live.add_argument("--drop-every", type=float, default=0.0, help="Stand-in cuts connections after N seconds")
+    live.add_argument("--outage", type=float, default=1.0, help="Stand-in refuses connections this long after a cut")
+    live.add_argument("--json", action="store_true", help="Print the report as JSON")
+    live.set_defaults(func=run_live)
+
+    broadcast = subparsers.add_parser("broadcast", help="WebSocket detection fan-out: traffic, CPU and latency")
+    broadcast.add_argument("--subscribers", type=int, default=200, help="Simulated WebSocket subscribers")
+    broadcast.add_argument("--slow", type=int, default=2, help="Subscribers with slow sends")
+    broadcast.add_argument("--slow-ms", type=float, default=20.0, help="Time a slow subscriber takes per send")
+    broadcast.add_argument("--interval", type=float, default=config.BROADCAST_INTERVAL, help="Seconds per tick")
+    broadcast.add_argument("--queue-size", type=int, default=config.BROADCAST_QUEUE_SIZE, help="Send queue per socket")
+    broadcast.add_argument("--policy", default=config.BROADCAST_SLOW_POLICY, choices=["drop", "disconnect"],
+                           help="Full send queue policy")
+    broadcast.add_argument("--streams", type=int, default=8, help="Streams with detections")
+    broadcast.add_argument("--persons", type=int, default=20, help="Persons per stream")
+    broadcast.add_argument("--ticks", type=int, default=50, help="Broadcast ticks")
+    broadcast.add_argument("--detect-every", type=int, default=2, help="Ticks between new detections per stream")
+    broadcast.add_argument("--stationary", type=float, default=0.5, help="Fraction of people standing still")
+    broadcast.add_argument("--subscribe", default="all", choices=["all", "one"],
+                           help="Streams each subscriber receives (one: a single drone's dashboard)")
+    broadcast.add_argument("--json", action="store_true", help="Print the report as JSON")
+    broadcast.set_defaults(func=run_broadcast)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
@@ -0,0 +1,177 @@
+"""
+Benchmark Utilities - Helpers shared by benchmark.py and quantize_model.py
+Frame loading, latency and peak memory measurement, box matching and
+average precision, and table output.
+"""
+
+import resource
+import time
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from person_detector import PersonDetector, box_iou, positions_to_array
+
+
+# ============================================================================
+# Frames
+# ============================================================================
+
+def read_frames(video_path: str, count: int, stride: int = 1, scale: float = 1.0, start: int = 0) -> List[np.ndarray]:
+    """Read up to `count` BGR frames from frame `start` on, keeping every `stride`-th frame"""
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    if start:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    frames = []
+    index = 0
+    try:
+        while len(frames) < count:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            if index % stride == 0:
+                if scale != 1.0:
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+                frames.append(frame)
+            index += 1
+    finally:
+        capture.release()
+
+    if not frames:
+        raise RuntimeError(f"No frames read from {video_path}")
+    return frames
+
+
+# ============================================================================
+# Latency and Memory
+# ============================================================================
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    """Mean and percentiles of a list of latencies in milliseconds"""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "max_ms": float(samples.max())
+    }
+
+
+def time_detector(detector: PersonDetector, frames: List[np.ndarray], warmup: int = 1) -> Tuple[List[np.ndarray], List[float]]:
+    """Run detect_persons on every frame, returning boxes and per-frame latency"""
+    for frame in frames[:warmup]:
+        detector.detect_persons(frame)
+
+    boxes = []
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        person_positions = detector.detect_persons(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        boxes.append(positions_to_array(person_positions))
+    return boxes, latencies
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB"""
+    # ru_maxrss also counts the parent's peak before the spawn exec; VmHWM does not
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ============================================================================
+# Accuracy
+# ============================================================================
+
+def match_boxes(predicted: np.ndarray, reference: np.ndarray, iou_threshold: float = 0.5) -> List[Tuple[int, int, float]]:
+    """
+    Greedily match predicted boxes to reference boxes, highest confidence first
+
+    Args:
+        predicted: (N, 5) array of [x_center, y_center, width, height, confidence]
+        reference: (M, 4+) array of reference boxes
+        iou_threshold: Minimum IoU for a match
+
+    Returns:
+        List of (predicted index, reference index, IoU) pairs
+    """
+    if len(predicted) == 0 or len(reference) == 0:
+        return []
+
+    order = np.argsort(-predicted[:, 4], kind="stable")
+    ious = box_iou(predicted[order], reference)
+    taken = np.zeros(len(reference), dtype=bool)
+    pairs = []
+    for predicted_index, row in zip(order, ious):
+        row = np.where(taken, -1.0, row)
+        best = int(row.argmax())
+        if row[best] >= iou_threshold:
+            taken[best] = True
+            pairs.append((int(predicted_index), best, float(row[best])))
+    return pairs
+
+
+def match_count(predicted: np.ndarray, reference: np.ndarray, iou_threshold: float = 0.5) -> int:
+    """Number of predicted boxes that match a reference box (true positives)"""
+    return len(match_boxes(predicted, reference, iou_threshold))
+
+
+def average_precision(predictions: List[np.ndarray], references: List[np.ndarray], iou_threshold: float = 0.5) -> float:
+    """
+    COCO-style (101-point interpolated) average precision over a set of frames
+
+    Args:
+        predictions: Per-frame (N, 5) detections, ideally at a very low confidence threshold
+        references: Per-frame (M, 4+) reference boxes
+        iou_threshold: Minimum IoU for a true positive (0.5 gives AP50)
+
+    Returns:
+        Average precision in [0, 1]
+    """
+    total = sum(len(reference) for reference in references)
+    if total == 0:
+        return 0.0
+
+    scores = []
+    hits = []
+    for predicted, reference in zip(predictions, references):
+        matched = {index for index, _, _ in match_boxes(predicted, reference, iou_threshold)}
+        scores.extend(predicted[:, 4].tolist())
+        hits.extend(index in matched for index in range(len(predicted)))
+    if not scores:
+        return 0.0
+
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    hits = np.asarray(hits, dtype=bool)[order]
+    true_positives = np.cumsum(hits)
+    false_positives = np.cumsum(~hits)
+    recall = true_positives / total
+    # Precision envelope: best precision at this recall or higher
+    precision = np.maximum.accumulate((true_positives / (true_positives + false_positives))[::-1])[::-1]
+
+    points = np.linspace(0, 1, 101)
+    indices = np.searchsorted(recall, points, side="left")
+    return float(np.mean([precision[i] if i < len(precision) else 0.0 for i in indices]))
+
+
+# ============================================================================
+# Output
+# ============================================================================
+
+def print_table(headers: List[str], rows: List[List]):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    line = "  ".join(f"{{:<{width}}}" for width in widths)
+    print(line.format(*headers))
+    print(line.format(*("-" * width for width in widths)))
+    for row in rows:
+        print(line.format(*row))
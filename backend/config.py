@@ -63,8 +63,77 @@ else:
 # ============================================================================
 
 MODEL_PATH = os.getenv("MODEL_PATH", "yolov8n.pt")
+# Inference runtime: "pytorch", "torchscript", "onnx" or "openvino".
+# Non-PyTorch backends export MODEL_PATH once and cache the result on disk
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "pytorch").lower()
+# Exported models are cached here per weights hash ("" = .model_cache next to MODEL_PATH)
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "")
+# Run one inference at startup so the first client frame is not slow
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
 DETECTION_CONFIDENCE = float(os.getenv("DETECTION_CONFIDENCE", "0.5"))
 
+# Run detection every N frames; frames in between reuse the last boxes
+DETECTION_INTERVAL = int(os.getenv("DETECTION_INTERVAL", "1"))
+# Derive N from measured inference latency versus the frame budget
+DETECTION_ADAPTIVE = os.getenv("DETECTION_ADAPTIVE", "false").lower() == "true"
+DETECTION_MAX_INTERVAL = int(os.getenv("DETECTION_MAX_INTERVAL", "10"))
+# Deliver frames without waiting for inference; a background detector
+# works on the newest frame only (the interval settings then do not apply)
+DETECTION_DECOUPLED = os.getenv("DETECTION_DECOUPLED", "false").lower() == "true"
+
+# Persistent person ids ('id' in each position) via IoU tracking
+TRACKING_ENABLED = os.getenv("TRACKING_ENABLED", "true").lower() == "true"
+TRACKING_IOU_THRESHOLD = float(os.getenv("TRACKING_IOU_THRESHOLD", "0.3"))
+TRACKING_MAX_AGE = int(os.getenv("TRACKING_MAX_AGE", "30"))
+
+# Skip inference when a downscaled frame difference shows no motion
+MOTION_GATING_ENABLED = os.getenv("MOTION_GATING_ENABLED", "false").lower() == "true"
+MOTION_PIXEL_THRESHOLD = int(os.getenv("MOTION_PIXEL_THRESHOLD", "25"))
+MOTION_MIN_CHANGED_FRACTION = float(os.getenv("MOTION_MIN_CHANGED_FRACTION", "0.002"))
+MOTION_MAX_SKIPPED_FRAMES = int(os.getenv("MOTION_MAX_SKIPPED_FRAMES", "30"))
+
+# Tiled inference for high-resolution footage: frames larger than TILE_SIZE
+# are split into overlapping tiles that are merged with cross-tile NMS
+TILED_INFERENCE = os.getenv("TILED_INFERENCE", "false").lower() == "true"
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_NMS_IOU = float(os.getenv("TILE_NMS_IOU", "0.5"))
+
+# Keyword arguments for person_detector.PersonDetector
+DETECTOR_OPTIONS = {
+    "conf_threshold": DETECTION_CONFIDENCE,
+    "tile_size": TILE_SIZE if TILED_INFERENCE else None,
+    "tile_overlap": TILE_OVERLAP,
+    "tile_nms_iou": TILE_NMS_IOU,
+    "backend": MODEL_BACKEND,
+    "cache_dir": MODEL_CACHE_DIR or None,
+}
+
+# ============================================================================
+# Inference Configuration
+# ============================================================================
+
+# Frames from all streams are grouped into batches of up to this size
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+# How long the first queued frame waits for others before the batch runs
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+# Where model calls run, off the event loop: "thread" or "process"
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+# Thread count, or detector process pool size in "process" mode
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+
+# Process pool: frames are handed to workers through shared-memory slots
+DETECTOR_POOL_SLOTS = int(os.getenv("DETECTOR_POOL_SLOTS", str(INFERENCE_MAX_BATCH_SIZE)))
+DETECTOR_POOL_MAX_FRAME_WIDTH = int(os.getenv("DETECTOR_POOL_MAX_FRAME_WIDTH", "1920"))
+DETECTOR_POOL_MAX_FRAME_HEIGHT = int(os.getenv("DETECTOR_POOL_MAX_FRAME_HEIGHT", "1080"))
+
+# Keyword arguments for detector_workers.DetectorWorkerPool
+DETECTOR_POOL_OPTIONS = {
+    "slots_per_worker": DETECTOR_POOL_SLOTS,
+    "max_frame_width": DETECTOR_POOL_MAX_FRAME_WIDTH,
+    "max_frame_height": DETECTOR_POOL_MAX_FRAME_HEIGHT,
+}
+
 # ============================================================================
 # Video Configuration
 # ============================================================================
@@ -77,10 +146,52 @@ DEFAULT_VIDEO_FILE = os.getenv(
     "crowd-of-people-timelapse-SBV-304899215-preview.mp4"
 )
 DEFAULT_LOOP_VIDEO = os.getenv("DEFAULT_LOOP_VIDEO", "true").lower() == "true"
+# File decoder: "opencv" (cv2.VideoCapture, BGR frames) or "pyav" (native
+# pixel format, threaded codec, container timestamps)
+VIDEO_DECODER = os.getenv("VIDEO_DECODER", "opencv").lower()
+# Frames decoded ahead on a background thread per video file
+VIDEO_READAHEAD_FRAMES = int(os.getenv("VIDEO_READAHEAD_FRAMES", "8"))
+# Frames buffered per live source (camera or stream URL); older frames are dropped
+LIVE_BUFFER_FRAMES = int(os.getenv("LIVE_BUFFER_FRAMES", "2"))
+# Reconnect delay after a failed open of a live source, doubling up to the maximum
+LIVE_RECONNECT_INITIAL_DELAY = float(os.getenv("LIVE_RECONNECT_INITIAL_DELAY", "0.5"))
+LIVE_RECONNECT_MAX_DELAY = float(os.getenv("LIVE_RECONNECT_MAX_DELAY", "10"))
+# Stream URLs clients may open, as comma-separated patterns (e.g.
+# "rtsp://10.0.0.*:*/*", wildcards per host label); empty disables stream_url
+LIVE_ALLOWED_SOURCES = [
+    pattern.strip() for pattern in os.getenv("LIVE_ALLOWED_SOURCES", "").split(",") if pattern.strip()
+]
+# Draw boxes into the video server-side; when off, streams carry the raw
+# video and clients draw from the detection metadata (offers can override)
+VIDEO_OVERLAY = os.getenv("VIDEO_OVERLAY", "true").lower() == "true"
+# Seconds a source without viewers stays open (warm) before its capture is released
+SOURCE_IDLE_TIMEOUT = float(os.getenv("SOURCE_IDLE_TIMEOUT", "30"))
 
 # Computed video path
 DEFAULT_VIDEO_PATH = f"{UPLOAD_FOLDER}/{DEFAULT_VIDEO_FILE}"
 
+# ============================================================================
+# Detection Broadcast Configuration
+# ============================================================================
+
+# Seconds between WebSocket detection broadcasts (fastest rate per subscriber)
+BROADCAST_INTERVAL = float(os.getenv("BROADCAST_INTERVAL", "0.1"))
+# Slowest rate a subscriber with slow sends is backed off to
+BROADCAST_MAX_INTERVAL = float(os.getenv("BROADCAST_MAX_INTERVAL", "2.0"))
+# Send changes against each subscriber's last update instead of full detections
+# (sockets can also opt in with a "configure" message)
+BROADCAST_DELTA = os.getenv("BROADCAST_DELTA", "false").lower() == "true"
+# Seconds between full updates per stream, so subscribers resynchronize
+BROADCAST_KEYFRAME_INTERVAL = float(os.getenv("BROADCAST_KEYFRAME_INTERVAL", "10"))
+# Pixels a box must move before a delta includes it
+BROADCAST_POSITION_TOLERANCE = float(os.getenv("BROADCAST_POSITION_TOLERANCE", "1.0"))
+# Messages waiting per WebSocket before the slow-client policy applies
+BROADCAST_QUEUE_SIZE = int(os.getenv("BROADCAST_QUEUE_SIZE", "32"))
+# Full queue: "drop" the oldest message or "disconnect" the client
+BROADCAST_SLOW_POLICY = os.getenv("BROADCAST_SLOW_POLICY", "drop").lower()
+# Seconds a single send may take before the client is disconnected
+BROADCAST_SEND_TIMEOUT = float(os.getenv("BROADCAST_SEND_TIMEOUT", "5"))
+
 # ============================================================================
 # CORS Origins
 # ============================================================================
@@ -118,12 +229,45 @@ def print_config():
     print(f"Default Video:    {DEFAULT_VIDEO_FILE}")
     print(f"Default Path:     {DEFAULT_VIDEO_PATH}")
     print(f"Loop Video:       {DEFAULT_LOOP_VIDEO}")
+    print(f"Decoder:          {VIDEO_DECODER}")
+    print(f"Read-ahead:       {VIDEO_READAHEAD_FRAMES} frame(s)")
+    print(f"Live Buffer:      {LIVE_BUFFER_FRAMES} frame(s)")
+    print(f"Live Reconnect:   {LIVE_RECONNECT_INITIAL_DELAY}s - {LIVE_RECONNECT_MAX_DELAY}s")
+    print(f"Live URLs:        {', '.join(LIVE_ALLOWED_SOURCES) or 'disabled'}")
+    print(f"Video Overlay:    {VIDEO_OVERLAY}")
+    print(f"Source Idle:      {SOURCE_IDLE_TIMEOUT}s")
     print(f"Camera ID:        {DEFAULT_CAMERA_ID}")
     print("\n" + "=" * 70)
     print("MODEL CONFIGURATION")
     print("=" * 70)
     print(f"Model Path:       {MODEL_PATH}")
+    print(f"Model Backend:    {MODEL_BACKEND}")
+    print(f"Warm-up:          {MODEL_WARMUP}")
     print(f"Confidence:       {DETECTION_CONFIDENCE}")
+    print(f"Detect Every:     {DETECTION_INTERVAL} frame(s)"
+          f"{f' (adaptive, max {DETECTION_MAX_INTERVAL})' if DETECTION_ADAPTIVE else ''}")
+    print(f"Decoupled:        {DETECTION_DECOUPLED}")
+    print(f"Tracking:         {TRACKING_ENABLED}")
+    print(f"Motion Gating:    {MOTION_GATING_ENABLED}")
+    print(f"Tiled Inference:  {TILED_INFERENCE}"
+          f"{f' ({TILE_SIZE}px tiles, {TILE_OVERLAP:.0%} overlap)' if TILED_INFERENCE else ''}")
+    print("\n" + "=" * 70)
+    print("INFERENCE CONFIGURATION")
+    print("=" * 70)
+    print(f"Max Batch Size:   {INFERENCE_MAX_BATCH_SIZE}")
+    print(f"Max Wait:         {INFERENCE_MAX_WAIT_MS} ms")
+    print(f"Executor:         {INFERENCE_EXECUTOR} ({INFERENCE_WORKERS} worker(s))")
+    if INFERENCE_EXECUTOR == "process":
+        print(f"Pool Slots:       {DETECTOR_POOL_SLOTS} per worker, "
+              f"up to {DETECTOR_POOL_MAX_FRAME_WIDTH}x{DETECTOR_POOL_MAX_FRAME_HEIGHT}")
+    print("\n" + "=" * 70)
+    print("BROADCAST CONFIGURATION")
+    print("=" * 70)
+    print(f"Interval:         {BROADCAST_INTERVAL}s - {BROADCAST_MAX_INTERVAL}s (adaptive)")
+    print(f"Delta Updates:    {BROADCAST_DELTA} (full every {BROADCAST_KEYFRAME_INTERVAL}s, "
+          f"{BROADCAST_POSITION_TOLERANCE}px tolerance)")
+    print(f"Send Queue:       {BROADCAST_QUEUE_SIZE} message(s), slow clients: {BROADCAST_SLOW_POLICY}, "
+          f"{BROADCAST_SEND_TIMEOUT}s send timeout")
     print("\n" + "=" * 70)
     print("WEBRTC CONFIGURATION")
     print("=" * 70)
@@ -153,7 +297,34 @@ CONFIG = {
     
     # Model
     "MODEL_PATH": MODEL_PATH,
+    "MODEL_BACKEND": MODEL_BACKEND,
+    "MODEL_CACHE_DIR": MODEL_CACHE_DIR,
+    "MODEL_WARMUP": MODEL_WARMUP,
     "DETECTION_CONFIDENCE": DETECTION_CONFIDENCE,
+    "DETECTION_INTERVAL": DETECTION_INTERVAL,
+    "DETECTION_ADAPTIVE": DETECTION_ADAPTIVE,
+    "DETECTION_MAX_INTERVAL": DETECTION_MAX_INTERVAL,
+    "DETECTION_DECOUPLED": DETECTION_DECOUPLED,
+    "TRACKING_ENABLED": TRACKING_ENABLED,
+    "TRACKING_IOU_THRESHOLD": TRACKING_IOU_THRESHOLD,
+    "TRACKING_MAX_AGE": TRACKING_MAX_AGE,
+    "MOTION_GATING_ENABLED": MOTION_GATING_ENABLED,
+    "MOTION_PIXEL_THRESHOLD": MOTION_PIXEL_THRESHOLD,
+    "MOTION_MIN_CHANGED_FRACTION": MOTION_MIN_CHANGED_FRACTION,
+    "MOTION_MAX_SKIPPED_FRAMES": MOTION_MAX_SKIPPED_FRAMES,
+    "TILED_INFERENCE": TILED_INFERENCE,
+    "TILE_SIZE": TILE_SIZE,
+    "TILE_OVERLAP": TILE_OVERLAP,
+    "TILE_NMS_IOU": TILE_NMS_IOU,
+    
+    # Inference
+    "INFERENCE_MAX_BATCH_SIZE": INFERENCE_MAX_BATCH_SIZE,
+    "INFERENCE_MAX_WAIT_MS": INFERENCE_MAX_WAIT_MS,
+    "INFERENCE_EXECUTOR": INFERENCE_EXECUTOR,
+    "INFERENCE_WORKERS": INFERENCE_WORKERS,
+    "DETECTOR_POOL_SLOTS": DETECTOR_POOL_SLOTS,
+    "DETECTOR_POOL_MAX_FRAME_WIDTH": DETECTOR_POOL_MAX_FRAME_WIDTH,
+    "DETECTOR_POOL_MAX_FRAME_HEIGHT": DETECTOR_POOL_MAX_FRAME_HEIGHT,
     
     # Video
     "DEFAULT_VIDEO_SOURCE": DEFAULT_VIDEO_SOURCE,
@@ -162,6 +333,24 @@ CONFIG = {
     "DEFAULT_VIDEO_FILE": DEFAULT_VIDEO_FILE,
     "DEFAULT_VIDEO_PATH": DEFAULT_VIDEO_PATH,
     "DEFAULT_LOOP_VIDEO": DEFAULT_LOOP_VIDEO,
+    "VIDEO_DECODER": VIDEO_DECODER,
+    "VIDEO_READAHEAD_FRAMES": VIDEO_READAHEAD_FRAMES,
+    "LIVE_BUFFER_FRAMES": LIVE_BUFFER_FRAMES,
+    "LIVE_RECONNECT_INITIAL_DELAY": LIVE_RECONNECT_INITIAL_DELAY,
+    "LIVE_RECONNECT_MAX_DELAY": LIVE_RECONNECT_MAX_DELAY,
+    "LIVE_ALLOWED_SOURCES": LIVE_ALLOWED_SOURCES,
+    "VIDEO_OVERLAY": VIDEO_OVERLAY,
+    "SOURCE_IDLE_TIMEOUT": SOURCE_IDLE_TIMEOUT,
+    
+    # Broadcast
+    "BROADCAST_INTERVAL": BROADCAST_INTERVAL,
+    "BROADCAST_MAX_INTERVAL": BROADCAST_MAX_INTERVAL,
+    "BROADCAST_DELTA": BROADCAST_DELTA,
+    "BROADCAST_KEYFRAME_INTERVAL": BROADCAST_KEYFRAME_INTERVAL,
+    "BROADCAST_POSITION_TOLERANCE": BROADCAST_POSITION_TOLERANCE,
+    "BROADCAST_QUEUE_SIZE": BROADCAST_QUEUE_SIZE,
+    "BROADCAST_SLOW_POLICY": BROADCAST_SLOW_POLICY,
+    "BROADCAST_SEND_TIMEOUT": BROADCAST_SEND_TIMEOUT,
     
     # CORS
     "CORS_ORIGINS": CORS_ORIGINS,
@@ -0,0 +1,679 @@
+"""
+Detection Broadcast - Change-detected, delta-encoded detection updates
+Every WebSocket subscriber keeps the state it was last sent for each stream.
+A stream is sent again only once it has a new detection, as a delta against
+that state, and each subscriber's send rate backs off while its sends are slow.
+Messages are serialized once and handed to a per-socket send queue, so one
+slow socket never holds up the others. Sockets that subscribe to stream ids
+(or wildcard patterns) only receive those streams.
+"""
+
+import asyncio
+import fnmatch
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from itertools import count
+from typing import Any, Callable, Deque, Dict, FrozenSet, Hashable, Iterable, Optional, Set, Tuple
+
+try:
+    import orjson
+except ImportError:
+    # Optional: several times faster message encoding (pip install orjson)
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Box fields compared against the position tolerance (pixels)
+BOX_FIELDS = ("x_center", "y_center", "width", "height")
+
+# What a full send queue does: drop the oldest message, or close the socket
+SLOW_SOCKET_POLICIES = ("drop", "disconnect")
+
+# Characters that make a subscription topic a wildcard pattern (fnmatch syntax)
+WILDCARD_CHARS = frozenset("*?[")
+
+# Most topics a single socket may subscribe to
+MAX_TOPICS_PER_SOCKET = 256
+
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """Serialize a message for a WebSocket text frame (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def detection_key(detection: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Identity of a detection result: the frame it was made on and when"""
+    return detection.get("frame_number"), detection.get("timestamp")
+
+
+class StreamState:
+    """
+    The detection state a subscriber has been sent for one stream
+
+    States are immutable and shared: subscribers that received the same
+    messages hold the same state object, so a delta from it is encoded once.
+    """
+
+    __slots__ = ("version", "key", "scalars", "positions")
+
+    _versions = count()
+
+    def __init__(self, key: Tuple[Any, Any], scalars: Dict[str, Any], positions: Dict[Any, Dict]):
+        self.version = next(StreamState._versions)
+        self.key = key
+        self.scalars = scalars
+        # Person id -> position as sent
+        self.positions = positions
+
+
+def split_detection(detection: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[Any, Dict]]:
+    """Scalar fields and positions by person id (list index for untracked positions)"""
+    scalars = {key: value for key, value in detection.items() if key != "positions"}
+    positions = {
+        position.get("id", index): position
+        for index, position in enumerate(detection.get("positions") or [])
+    }
+    return scalars, positions
+
+
+class DeltaEncoder:
+    """
+    Encode detections as full updates or deltas against a subscriber's state
+
+    A full update is the existing "detection_update" message. A delta
+    ("detection_delta") carries the scalar fields that changed, the positions
+    that are new or moved by more than the tolerance ("upsert") and the ids
+    that disappeared ("remove"). Positions within the tolerance are not sent;
+    the subscriber keeps the version it has, so its error stays within the
+    tolerance. Encodings are cached until clear_cache(), so subscribers in the
+    same state share one serialized message per broadcast.
+    """
+
+    def __init__(self, position_tolerance: float = 1.0, confidence_tolerance: float = 0.02):
+        self.position_tolerance = position_tolerance
+        self.confidence_tolerance = confidence_tolerance
+        self._cache: Dict[Tuple[str, Optional[int], Tuple[Any, Any]], Tuple[str, StreamState]] = {}
+        self.encodings = 0
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def encode(
+        self,
+        stream_id: str,
+        base: Optional[StreamState],
+        detection: Dict[str, Any]
+    ) -> Tuple[str, StreamState]:
+        """
+        Serialized message bringing a subscriber from `base` to `detection`
+
+        Args:
+            stream_id: Stream the detection belongs to (client or publisher id)
+            base: State the subscriber holds, or None for a full update
+            detection: Latest detection summary of the stream
+
+        Returns:
+            Tuple of (message text, the subscriber's state once it is sent)
+        """
+        key = detection_key(detection)
+        cache_key = (stream_id, base.version if base else None, key)
+        cached = self._cache.get(cache_key)
+        if cached:
+            return cached
+
+        if base is None:
+            message, state = self._full(stream_id, detection, key)
+        else:
+            message, state = self._delta(stream_id, base, detection, key)
+        encoded = (encode_message(message), state)
+        self._cache[cache_key] = encoded
+        self.encodings += 1
+        return encoded
+
+    def _full(self, stream_id: str, detection: Dict[str, Any], key) -> Tuple[Dict, StreamState]:
+        message = {
+            "type": "detection_update",
+            "client_id": stream_id,
+            "data": detection,
+            "timestamp": time.time()
+        }
+        return message, StreamState(key, *split_detection(detection))
+
+    def _moved(self, sent: Dict, position: Dict) -> bool:
+        for field in BOX_FIELDS:
+            if abs(position.get(field, 0.0) - sent.get(field, 0.0)) > self.position_tolerance:
+                return True
+        return abs(position.get("confidence", 0.0) - sent.get("confidence", 0.0)) > self.confidence_tolerance
+
+    def _delta(self, stream_id: str, base: StreamState, detection: Dict[str, Any], key) -> Tuple[Dict, StreamState]:
+        scalars, positions = split_detection(detection)
+        changed = {name: value for name, value in scalars.items() if base.scalars.get(name) != value}
+
+        upsert = []
+        state_positions = {}
+        for person_id, position in positions.items():
+            sent = base.positions.get(person_id)
+            if sent is None or self._moved(sent, position):
+                upsert.append(position)
+                state_positions[person_id] = position
+            else:
+                state_positions[person_id] = sent
+        removed = [person_id for person_id in base.positions if person_id not in positions]
+
+        message = {
+            "type": "detection_delta",
+            "client_id": stream_id,
+            "base_frame": base.key[0],
+            "data": changed,
+            "upsert": upsert,
+            "remove": removed,
+            "timestamp": time.time()
+        }
+        return message, StreamState(key, scalars, state_positions)
+
+
+class SocketSender:
+    """
+    Send queued text messages to one WebSocket from its own task
+
+    enqueue() never waits, so a broadcast hands the same serialized message
+    to every socket and all of them send concurrently. The queue is bounded:
+    when it is full the oldest message is dropped ("drop") or the socket is
+    closed ("disconnect"). A message enqueued with the key of one still
+    waiting replaces it, so a backlogged socket only gets the newest update
+    of each stream. A send that takes longer than send_timeout closes the
+    socket as well. Priority messages (control replies) are sent before any
+    queued update and are never dropped.
+
+    The sender's task is the only writer of the socket: anything sent to it
+    must go through enqueue().
+    """
+
+    def __init__(
+        self,
+        websocket: Any,
+        max_queue: int = 32,
+        policy: str = "drop",
+        send_timeout: float = 5.0,
+        on_close: Optional[Callable[[Any, str], None]] = None
+    ):
+        """
+        Initialize the sender (call start() from the event loop)
+
+        Args:
+            websocket: Socket with an async send_text()
+            max_queue: Maximum number of messages waiting to be sent
+            policy: "drop" or "disconnect" when the queue is full
+            send_timeout: Seconds a single send may take
+            on_close: Called with (websocket, reason) when the socket is given up
+        """
+        if policy not in SLOW_SOCKET_POLICIES:
+            raise ValueError(f"Unknown slow socket policy: {policy} (expected one of {SLOW_SOCKET_POLICIES})")
+        self.websocket = websocket
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self._pending: "OrderedDict[Hashable, Tuple[str, Optional[Callable[[], None]]]]" = OrderedDict()
+        self._priority: Deque[str] = deque()
+        self._ids = count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + len(self._priority)
+
+    def is_pending(self, key: Hashable) -> bool:
+        return key in self._pending
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, text: str, key: Optional[Hashable] = None,
+                on_sent: Optional[Callable[[], None]] = None, priority: bool = False) -> bool:
+        """
+        Queue a message without waiting
+
+        Args:
+            text: Serialized message
+            key: Replace the waiting message with this key, if any
+            on_sent: Called when the message is taken off the queue to be sent
+            priority: Send ahead of queued updates, outside the queue limit
+                (key and on_sent do not apply)
+
+        Returns:
+            False if the socket is closed (or was closed by the disconnect policy)
+        """
+        if self.closed:
+            return False
+
+        if priority:
+            self._priority.append(text)
+        elif key is not None and key in self._pending:
+            self._pending[key] = (text, on_sent)
+            self.coalesced += 1
+        else:
+            if len(self._pending) >= self.max_queue:
+                if self.policy == "disconnect":
+                    self._give_up("send queue full")
+                    return False
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[key if key is not None else ("message", next(self._ids))] = (text, on_sent)
+
+        self._wakeup.set()
+        return True
+
+    async def _run(self):
+        while not self.closed:
+            if self._priority:
+                text = self._priority.popleft()
+            elif self._pending:
+                _, (text, on_sent) = self._pending.popitem(last=False)
+                if on_sent:
+                    on_sent()
+            else:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            try:
+                await asyncio.wait_for(self.websocket.send_text(text), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._give_up(f"send took longer than {self.send_timeout}s")
+                return
+            except Exception as e:
+                self._give_up(f"send failed: {e}")
+                return
+            self.messages_sent += 1
+            self.bytes_sent += len(text)
+
+    def _give_up(self, reason: str):
+        if self.closed:
+            return
+        self.closed = True
+        self._pending.clear()
+        self._priority.clear()
+        logger.warning(f"Closing slow WebSocket: {reason}")
+        if self.on_close:
+            self.on_close(self.websocket, reason)
+
+    def stop(self):
+        """Stop sending; messages still queued are discarded"""
+        self.closed = True
+        self._pending.clear()
+        self._priority.clear()
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced
+        }
+
+
+class Subscriber:
+    """
+    Broadcast state of one WebSocket: per-stream sent state and send rate
+
+    Updates go through the socket's SocketSender, one waiting update per
+    stream at most. A stream's state counts as sent once its message leaves
+    the queue, so deltas are always encoded against what the client will
+    hold when they arrive. The send interval adapts to the socket: it
+    doubles (up to max_interval) while the previous updates are still
+    queued when the next are due, and shrinks back step by step once the
+    socket keeps up. Clients can lower their rate further with a maximum
+    rate of their own.
+    """
+
+    def __init__(
+        self,
+        sender: SocketSender,
+        min_interval: float = 0.1,
+        max_interval: float = 2.0,
+        delta: bool = False,
+        keyframe_interval: float = 10.0
+    ):
+        self.sender = sender
+        self.websocket = sender.websocket
+        self.base_interval = min_interval
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.interval = min_interval
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.states: Dict[str, StreamState] = {}
+        # Detection last queued per stream
+        self.queued: Dict[str, Tuple[Any, Any]] = {}
+        self._keyframe_at: Dict[str, float] = {}
+        self.next_send_at = 0.0
+
+        self.messages_sent = 0
+        self.keyframes_sent = 0
+        self.unchanged_skipped = 0
+        self.slow_broadcasts = 0
+
+    def is_due(self, now: float) -> bool:
+        return now >= self.next_send_at
+
+    def base_state(self, stream_id: str, now: float) -> Optional[StreamState]:
+        """State to encode against, or None when a full update is due"""
+        if not self.delta or now - self._keyframe_at.get(stream_id, 0.0) >= self.keyframe_interval:
+            return None
+        return self.states.get(stream_id)
+
+    def send(self, stream_id: str, detection: Dict[str, Any], encoder: "DeltaEncoder", now: float):
+        """Queue the update bringing this socket's state of a stream to `detection`"""
+        key = detection_key(detection)
+        sent = self.states.get(stream_id)
+        if (sent is not None and sent.key == key) or (
+                self.queued.get(stream_id) == key and self.sender.is_pending(stream_id)):
+            # Nothing new since the last update of this stream (sent or waiting);
+            # an update the queue dropped is queued again
+            self.unchanged_skipped += 1
+            return
+
+        base = self.base_state(stream_id, now)
+        text, state = encoder.encode(stream_id, base, detection)
+        keyframe = base is None
+        self.queued[stream_id] = state.key
+        self.sender.enqueue(text, key=stream_id, on_sent=lambda: self.acknowledge(stream_id, state, keyframe))
+
+    def acknowledge(self, stream_id: str, state: StreamState, keyframe: bool):
+        """Record a message leaving the queue; its state is the base of the next delta"""
+        self.states[stream_id] = state
+        if keyframe:
+            self._keyframe_at[stream_id] = time.monotonic()
+            self.keyframes_sent += 1
+        self.messages_sent += 1
+
+    def forget(self, stream_ids):
+        """Drop the state of streams this socket no longer gets (gone or unsubscribed)"""
+        for stream_id in [stream_id for stream_id in self.queued if stream_id not in stream_ids]:
+            self.queued.pop(stream_id, None)
+            self.states.pop(stream_id, None)
+            self._keyframe_at.pop(stream_id, None)
+
+    def resync(self):
+        """Send every stream in full next time (the client lost track of its state)"""
+        self.states.clear()
+        self.queued.clear()
+        self._keyframe_at.clear()
+        self.next_send_at = 0.0
+
+    def set_max_rate(self, rate: Optional[float]):
+        """Cap the update rate (messages per second per stream); None restores the default"""
+        self.min_interval = max(self.base_interval, 1.0 / rate) if rate else self.base_interval
+        self.max_interval = max(self.max_interval, self.min_interval)
+        self.interval = max(self.interval, self.min_interval)
+
+    def record_broadcast(self, backlogged: bool, now: float):
+        """Adapt the interval to whether the previous updates were still queued"""
+        if backlogged:
+            self.interval = min(self.interval * 2, self.max_interval)
+            self.slow_broadcasts += 1
+        else:
+            self.interval = max(self.interval - self.base_interval / 2, self.min_interval)
+        self.next_send_at = now + self.interval
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "delta": self.delta,
+            "interval_ms": self.interval * 1000,
+            "streams": len(self.states),
+            "messages_sent": self.messages_sent,
+            "keyframes_sent": self.keyframes_sent,
+            "unchanged_skipped": self.unchanged_skipped,
+            "slow_broadcasts": self.slow_broadcasts,
+            "queue": self.sender.get_stats()
+        }
+
+
+class SubscriptionIndex:
+    """
+    Which sockets receive which streams
+
+    A topic is a stream id ("drone-1") or an fnmatch pattern ("drone-*",
+    "*"). Exact topics are looked up by stream id; patterns are matched
+    against each stream id once and the result is cached until the
+    subscriptions change. A socket that never subscribed receives every
+    stream; once it subscribes it only receives its topics, even after
+    unsubscribing from all of them.
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, Set[Any]] = {}
+        self._patterns: Dict[str, Set[Any]] = {}
+        # Sockets that never subscribed
+        self._unfiltered: Set[Any] = set()
+        self._topics: Dict[Any, Set[str]] = {}
+        self._matches: Dict[str, FrozenSet[Any]] = {}
+
+    def add(self, websocket: Any):
+        self._unfiltered.add(websocket)
+        self._matches.clear()
+
+    def remove(self, websocket: Any):
+        self._unfiltered.discard(websocket)
+        self._unindex(websocket, self._topics.pop(websocket, set()))
+        self._matches.clear()
+
+    def topics(self, websocket: Any) -> Optional[Set[str]]:
+        """Topics of a socket, or None if it receives every stream"""
+        return None if websocket in self._unfiltered else self._topics.get(websocket, set())
+
+    def subscribe(self, websocket: Any, topics: Iterable[str]) -> Set[str]:
+        """
+        Add topics to a socket's subscriptions
+
+        Returns:
+            The socket's topics after subscribing
+
+        Raises:
+            ValueError: If a topic is not a non-empty string, or there are too many
+        """
+        topics = self._validate(topics)
+        current = self._topics.setdefault(websocket, set())
+        if len(current | topics) > MAX_TOPICS_PER_SOCKET:
+            raise ValueError(f"At most {MAX_TOPICS_PER_SOCKET} topics per socket")
+
+        self._unfiltered.discard(websocket)
+        for topic in topics - current:
+            index = self._patterns if WILDCARD_CHARS & set(topic) else self._exact
+            index.setdefault(topic, set()).add(websocket)
+        current |= topics
+        self._matches.clear()
+        return set(current)
+
+    def unsubscribe(self, websocket: Any, topics: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Remove topics (all of them if None) from a socket's subscriptions
+
+        Returns:
+            The socket's topics after unsubscribing
+
+        Raises:
+            ValueError: If a topic is not a non-empty string
+        """
+        current = self._topics.setdefault(websocket, set())
+        removed = set(current) if topics is None else self._validate(topics) & current
+        self._unfiltered.discard(websocket)
+        self._unindex(websocket, removed)
+        current -= removed
+        self._matches.clear()
+        return set(current)
+
+    def match(self, stream_id: str) -> FrozenSet[Any]:
+        """Sockets receiving a stream"""
+        sockets = self._matches.get(stream_id)
+        if sockets is None:
+            matched = set(self._unfiltered)
+            matched.update(self._exact.get(stream_id, ()))
+            for pattern, subscribed in self._patterns.items():
+                if fnmatch.fnmatchcase(stream_id, pattern):
+                    matched.update(subscribed)
+            sockets = self._matches[stream_id] = frozenset(matched)
+        return sockets
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "unfiltered_sockets": len(self._unfiltered),
+            "topics": len(self._exact),
+            "patterns": len(self._patterns)
+        }
+
+    @staticmethod
+    def _validate(topics: Iterable[str]) -> Set[str]:
+        if isinstance(topics, str):
+            topics = [topics]
+        if not isinstance(topics, (list, tuple, set, frozenset)):
+            raise ValueError("Topics must be a string or a list of strings")
+        topics = set(topics)
+        if not all(isinstance(topic, str) and topic for topic in topics):
+            raise ValueError("Topics must be non-empty strings")
+        return topics
+
+    def _unindex(self, websocket: Any, topics: Iterable[str]):
+        for topic in topics:
+            index = self._patterns if WILDCARD_CHARS & set(topic) else self._exact
+            subscribed = index.get(topic)
+            if subscribed is not None:
+                subscribed.discard(websocket)
+                if not subscribed:
+                    del index[topic]
+
+
+class DetectionBroadcaster:
+    """Queue the latest detection of each subscribed stream for every due subscriber"""
+
+    def __init__(
+        self,
+        min_interval: float = 0.1,
+        max_interval: float = 2.0,
+        delta: bool = False,
+        keyframe_interval: float = 10.0,
+        position_tolerance: float = 1.0,
+        max_queue: int = 32,
+        slow_policy: str = "drop",
+        send_timeout: float = 5.0,
+        on_close: Optional[Callable[[Any, str], None]] = None
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.max_queue = max_queue
+        self.slow_policy = slow_policy
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.encoder = DeltaEncoder(position_tolerance=position_tolerance)
+        self.subscribers: Dict[Any, Subscriber] = {}
+        self.subscriptions = SubscriptionIndex()
+        self.broadcasts = 0
+        self.slow_disconnects = 0
+
+    def add(self, websocket: Any) -> Subscriber:
+        """Register a socket and start its sender (from the event loop)"""
+        sender = SocketSender(
+            websocket,
+            max_queue=self.max_queue,
+            policy=self.slow_policy,
+            send_timeout=self.send_timeout,
+            on_close=self._closed
+        )
+        subscriber = Subscriber(
+            sender,
+            min_interval=self.min_interval,
+            max_interval=self.max_interval,
+            delta=self.delta,
+            keyframe_interval=self.keyframe_interval
+        )
+        self.subscribers[websocket] = subscriber
+        self.subscriptions.add(websocket)
+        sender.start()
+        return subscriber
+
+    def remove(self, websocket: Any):
+        subscriber = self.subscribers.pop(websocket, None)
+        self.subscriptions.remove(websocket)
+        if subscriber:
+            subscriber.sender.stop()
+
+    def _closed(self, websocket: Any, reason: str):
+        self.slow_disconnects += 1
+        self.remove(websocket)
+        if self.on_close:
+            self.on_close(websocket, reason)
+
+    async def broadcast(self, streams: Dict[str, Dict[str, Any]]):
+        """
+        Queue new detections for the subscribers that are due
+
+        Each stream goes only to the sockets subscribed to it. Each distinct
+        message is serialized once and only queued; the subscribers' senders
+        deliver it concurrently.
+
+        Args:
+            streams: Latest detection summary by stream id
+        """
+        now = time.monotonic()
+        self.encoder.clear_cache()
+        self.broadcasts += 1
+
+        due = {websocket: subscriber for websocket, subscriber in self.subscribers.items()
+               if subscriber.is_due(now)}
+        if not due:
+            return
+        backlogged = {websocket: subscriber.sender.pending > 0 for websocket, subscriber in due.items()}
+        routed: Dict[Any, Set[str]] = {websocket: set() for websocket in due}
+
+        for stream_id, detection in streams.items():
+            for websocket in self.subscriptions.match(stream_id):
+                subscriber = due.get(websocket)
+                if subscriber is None:
+                    continue
+                subscriber.send(stream_id, detection, self.encoder, now)
+                routed[websocket].add(stream_id)
+
+        for websocket, subscriber in due.items():
+            # Also drops the state of streams the socket unsubscribed from
+            subscriber.forget(routed[websocket])
+            subscriber.record_broadcast(backlogged[websocket], now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        subscribers = []
+        for websocket, subscriber in self.subscribers.items():
+            topics = self.subscriptions.topics(websocket)
+            subscribers.append({
+                **subscriber.get_stats(),
+                "topics": sorted(topics) if topics is not None else None
+            })
+        return {
+            "subscribers": len(subscribers),
+            "broadcasts": self.broadcasts,
+            "encodings": self.encoder.encodings,
+            "encoder": "orjson" if orjson is not None else "json",
+            "messages_sent": sum(stats["queue"]["messages_sent"] for stats in subscribers),
+            "bytes_sent": sum(stats["queue"]["bytes_sent"] for stats in subscribers),
+            "messages_dropped": sum(stats["queue"]["dropped"] for stats in subscribers),
+            "unchanged_skipped": sum(stats["unchanged_skipped"] for stats in subscribers),
+            "slow_disconnects": self.slow_disconnects,
+            "subscriptions": self.subscriptions.get_stats(),
+            "per_subscriber": subscribers
+        }
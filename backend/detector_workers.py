@@ -0,0 +1,345 @@
+"""
+Detector Worker Pool - Multi-process person detection for CPU-only hosts
+Each worker process loads its own PersonDetector. Frames are handed over
+through per-worker shared-memory slot rings instead of pickled arrays, and
+detections come back as compact (N, 5) float32 arrays.
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from person_detector import PersonDetector, positions_from_array, positions_to_array
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Worker Process
+# ============================================================================
+
+def _worker_main(
+    worker_id: int,
+    model_path: str,
+    detector_options: dict,
+    shm_name: str,
+    slot_bytes: int,
+    requests: multiprocessing.Queue,
+    results: multiprocessing.Queue
+):
+    """Worker process entry point: detect persons in frames placed in shared memory"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        detector = PersonDetector(model_path, **detector_options)
+        detector.warmup()
+        logger.info(f"Detector worker {worker_id} ready")
+
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+
+            request_id, frame_refs = request
+            try:
+                frames = []
+                for ref in frame_refs:
+                    if isinstance(ref, np.ndarray):
+                        # Frame did not fit in a slot and was sent inline
+                        frames.append(ref)
+                    else:
+                        slot, shape = ref
+                        frames.append(np.ndarray(
+                            shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes
+                        ))
+
+                batch_positions = detector.detect_persons_batch(frames)
+                del frames  # Drop shared-memory views before the slots are reused
+
+                results.put((worker_id, request_id, [
+                    positions_to_array(person_positions) for person_positions in batch_positions
+                ]))
+            except Exception as e:
+                results.put((worker_id, request_id, RuntimeError(f"Worker {worker_id}: {e}")))
+    finally:
+        shm.close()
+
+
+# ============================================================================
+# Pool
+# ============================================================================
+
+@dataclass
+class _Worker:
+    worker_id: int
+    process: multiprocessing.Process
+    requests: multiprocessing.Queue
+    shm: shared_memory.SharedMemory
+    free_slots: Deque[int] = field(default_factory=deque)
+    in_flight: int = 0
+
+
+@dataclass
+class _PendingRequest:
+    future: asyncio.Future
+    worker_id: int
+    slots: List[int]
+    shapes: List[Tuple[int, ...]]
+
+
+class DetectorWorkerPool:
+    """Pool of detector processes fed through shared-memory frame slots"""
+
+    def __init__(
+        self,
+        model_path: str,
+        detector_options: Optional[dict] = None,
+        workers: int = 2,
+        slots_per_worker: int = 8,
+        max_frame_width: int = 1920,
+        max_frame_height: int = 1080
+    ):
+        """
+        Initialize the pool (processes start with start())
+
+        Args:
+            model_path: Path to the YOLO model loaded by every worker
+            detector_options: PersonDetector keyword arguments (see PersonDetector.options())
+            workers: Number of worker processes
+            slots_per_worker: Frame slots in each worker's shared-memory ring
+            max_frame_width: Largest frame width that fits in a slot
+            max_frame_height: Largest frame height that fits in a slot
+        """
+        self.model_path = model_path
+        self.detector_options = dict(detector_options or {})
+        self.num_workers = max(1, workers)
+        self.slots_per_worker = max(1, slots_per_worker)
+        self.slot_bytes = max_frame_width * max_frame_height * 3
+
+        self._context = multiprocessing.get_context("spawn")
+        self._results: Optional[multiprocessing.Queue] = None
+        self._workers: List[_Worker] = []
+        self._pending: Dict[int, _PendingRequest] = {}
+        self._request_ids = itertools.count()
+        self._reader: Optional[threading.Thread] = None
+        self._slots_freed: Optional[asyncio.Event] = None
+
+        # Statistics
+        self.frames_via_shm = 0
+        self.frames_inline = 0
+
+    def start(self):
+        """Create the shared-memory rings and spawn the worker processes"""
+        if self._workers:
+            return
+
+        self._results = self._context.Queue()
+
+        for worker_id in range(self.num_workers):
+            shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.slots_per_worker)
+            requests = self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(
+                    worker_id, self.model_path, self.detector_options,
+                    shm.name, self.slot_bytes, requests, self._results
+                ),
+                name=f"detector-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            self._workers.append(_Worker(
+                worker_id=worker_id,
+                process=process,
+                requests=requests,
+                shm=shm,
+                free_slots=deque(range(self.slots_per_worker))
+            ))
+
+        self._reader = threading.Thread(target=self._read_results, name="detector-pool-results", daemon=True)
+        self._reader.start()
+
+        logger.info(
+            f"Detector worker pool started: {self.num_workers} process(es), "
+            f"{self.slots_per_worker} slot(s) of {self.slot_bytes / (1024 * 1024):.1f} MB each"
+        )
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop the workers and release the shared memory"""
+        for worker in self._workers:
+            try:
+                worker.requests.put(None)
+            except Exception:
+                pass
+
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.shm.close()
+            worker.shm.unlink()
+
+        if self._results is not None:
+            self._results.put(None)
+        if self._reader is not None:
+            self._reader.join(timeout)
+
+        for pending in self._pending.values():
+            pending.future.get_loop().call_soon_threadsafe(pending.future.cancel)
+        self._pending.clear()
+        self._workers = []
+
+        logger.info("Detector worker pool stopped")
+
+    def _read_results(self):
+        """Forward worker results to the event loop that submitted each request"""
+        while True:
+            try:
+                message = self._results.get()
+            except (EOFError, OSError):
+                break
+            if message is None:
+                break
+
+            worker_id, request_id, payload = message
+            pending = self._pending.get(request_id)
+            if pending is None:
+                continue
+            pending.future.get_loop().call_soon_threadsafe(self._complete, request_id, payload)
+
+    def _complete(self, request_id: int, payload):
+        pending = self._pending.pop(request_id, None)
+        if pending is None:
+            return
+
+        worker = self._workers[pending.worker_id]
+        worker.free_slots.extend(pending.slots)
+        worker.in_flight -= 1
+        self._slots_freed.set()
+
+        if pending.future.done():
+            return
+        if isinstance(payload, Exception):
+            pending.future.set_exception(payload)
+            return
+
+        pending.future.set_result([
+            positions_from_array(boxes, shape)
+            for boxes, shape in zip(payload, pending.shapes)
+        ])
+
+    async def _acquire_worker(self, slots_needed: int) -> _Worker:
+        """Wait for a live worker with enough free slots, preferring the least loaded"""
+        while True:
+            candidates = [
+                worker for worker in self._workers
+                if worker.process.is_alive() and len(worker.free_slots) >= slots_needed
+            ]
+            if candidates:
+                return max(candidates, key=lambda w: (len(w.free_slots), -w.in_flight))
+
+            if not any(worker.process.is_alive() for worker in self._workers):
+                raise RuntimeError("No detector worker processes are running")
+
+            self._slots_freed.clear()
+            try:
+                # Re-check liveness now and then too: a worker can die with nothing in flight
+                await asyncio.wait_for(self._slots_freed.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _detect_chunk(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        loop = asyncio.get_running_loop()
+        worker = await self._acquire_worker(len(frames))
+
+        slots: List[int] = []
+        frame_refs = []
+        for frame in frames:
+            if frame is None or frame.size == 0:
+                frame_refs.append(np.zeros((0, 0, 3), dtype=np.uint8))
+                continue
+
+            if frame.dtype != np.uint8 or frame.nbytes > self.slot_bytes:
+                frame_refs.append(np.ascontiguousarray(frame))
+                self.frames_inline += 1
+                continue
+
+            slot = worker.free_slots.popleft()
+            view = np.ndarray(
+                frame.shape, dtype=np.uint8, buffer=worker.shm.buf, offset=slot * self.slot_bytes
+            )
+            np.copyto(view, frame)
+            slots.append(slot)
+            frame_refs.append((slot, frame.shape))
+            self.frames_via_shm += 1
+
+        request_id = next(self._request_ids)
+        future = loop.create_future()
+        self._pending[request_id] = _PendingRequest(
+            future=future,
+            worker_id=worker.worker_id,
+            slots=slots,
+            shapes=[frame.shape if frame is not None else (0, 0) for frame in frames]
+        )
+        worker.in_flight += 1
+        worker.requests.put((request_id, frame_refs))
+
+        # The future is not cancelled with the caller: its slots are only
+        # recycled once the worker has answered
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=1.0)
+            if done:
+                return future.result()
+            if not worker.process.is_alive():
+                self._pending.pop(request_id, None)
+                # Wake waiters so they re-check which workers are still alive
+                self._slots_freed.set()
+                raise RuntimeError(f"Detector worker {worker.worker_id} exited")
+
+    async def detect_batch(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Detect persons in a batch of frames on the worker processes
+
+        Batches larger than a worker's ring are split across workers.
+
+        Args:
+            frames: List of input images as numpy arrays
+
+        Returns:
+            One list of person positions per input frame, in input order
+        """
+        if not self._workers:
+            raise RuntimeError("Detector worker pool is not running")
+        if self._slots_freed is None:
+            self._slots_freed = asyncio.Event()
+
+        chunks = [
+            frames[i:i + self.slots_per_worker]
+            for i in range(0, len(frames), self.slots_per_worker)
+        ]
+        chunk_results = await asyncio.gather(*(self._detect_chunk(chunk) for chunk in chunks))
+
+        return [person_positions for chunk in chunk_results for person_positions in chunk]
+
+    def get_stats(self) -> dict:
+        """Get pool statistics"""
+        return {
+            "workers": self.num_workers,
+            "workers_alive": sum(1 for worker in self._workers if worker.process.is_alive()),
+            "slots_per_worker": self.slots_per_worker,
+            "free_slots": sum(len(worker.free_slots) for worker in self._workers),
+            "requests_in_flight": len(self._pending),
+            "frames_via_shared_memory": self.frames_via_shm,
+            "frames_inline": self.frames_inline
+        }
@@ -0,0 +1,90 @@
+"""
+Frame Pipeline - Copy-free conversions between PyAV video frames and numpy
+The detector and the overlay work on bgr24 arrays. These helpers track who
+owns a frame's pixels so annotation can happen in place, and wrap annotated
+arrays into output frames without another full-frame copy.
+"""
+
+import sys
+from typing import List, Tuple
+
+import numpy as np
+from av import VideoFrame
+
+
+def frame_to_bgr(frame: VideoFrame) -> Tuple[np.ndarray, bool]:
+    """
+    Get a bgr24 array for a frame, converting only if needed
+
+    A bgr24 frame is returned as a view of its own plane (no copy), which
+    other consumers of the same frame (e.g. MediaRelay subscribers) also
+    see. Any other format (e.g. decoder yuv420p) is converted into a new
+    buffer that belongs to the caller.
+
+    Args:
+        frame: Source video frame
+
+    Returns:
+        Tuple of (bgr24 array, whether the caller may modify it)
+    """
+    return frame.to_ndarray(format="bgr24"), frame.format.name != "bgr24"
+
+
+def bgr_to_frame(image: np.ndarray, template: VideoFrame) -> VideoFrame:
+    """
+    Wrap a bgr24 array as a video frame with the template's timing
+
+    The array is wrapped without copying when its layout allows; it must not
+    be modified while the frame is in use.
+
+    Args:
+        image: bgr24 array (height, width, 3)
+        template: Frame whose pts and time_base are carried over
+
+    Returns:
+        New video frame
+    """
+    try:
+        new_frame = VideoFrame.from_numpy_buffer(image, format="bgr24")
+    except ValueError:
+        # Padded rows or a non-contiguous view cannot be wrapped
+        new_frame = VideoFrame.from_ndarray(image, format="bgr24")
+    new_frame.pts = template.pts
+    if template.time_base is not None:
+        new_frame.time_base = template.time_base
+    return new_frame
+
+
+class FrameBufferPool:
+    """
+    Reusable frame-sized buffers for annotating frames that are not owned
+
+    A buffer is handed out again only once nothing but the pool references
+    it, i.e. every output frame wrapping it (which may still be queued for
+    other relay subscribers) has been released.
+    """
+
+    def __init__(self, max_buffers: int = 4):
+        self.max_buffers = max_buffers
+        self._buffers: List[np.ndarray] = []
+        self.allocations = 0
+
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """Get an uninitialized uint8 buffer of the given shape"""
+        for buffer in self._buffers:
+            # References: the pool list, this loop variable and getrefcount's argument
+            if buffer.shape == shape and sys.getrefcount(buffer) <= 3:
+                return buffer
+
+        buffer = np.empty(shape, dtype=np.uint8)
+        self.allocations += 1
+        if len(self._buffers) >= self.max_buffers:
+            self._buffers.pop(0)
+        self._buffers.append(buffer)
+        return buffer
+
+    def copy(self, image: np.ndarray) -> np.ndarray:
+        """Copy an image into a pooled buffer"""
+        buffer = self.acquire(image.shape)
+        np.copyto(buffer, image)
+        return buffer
@@ -0,0 +1,302 @@
+"""
+Inference Scheduling - Shares one detector between many video tracks
+Model calls run on a dedicated executor so the event loop never blocks on
+inference, and pending frames from all tracks are grouped into batches
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from person_detector import PersonDetector
+from detector_workers import DetectorWorkerPool
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class InferenceExecutor:
+    """Runs detector calls on a dedicated thread or process pool"""
+
+    def __init__(
+        self,
+        detector: PersonDetector,
+        kind: str = "thread",
+        workers: int = 1,
+        pool_options: Optional[dict] = None,
+        warmup: bool = True
+    ):
+        """
+        Initialize the executor
+
+        Args:
+            detector: Detector reused directly by a single worker thread; otherwise
+                only its settings are used (see workers_load_model())
+            kind: "thread" or "process"
+            workers: Number of worker threads or processes
+            pool_options: Extra DetectorWorkerPool arguments for the process mode
+            warmup: Warm up the model copies of worker threads
+        """
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown inference executor: {kind} (expected one of {EXECUTOR_KINDS})")
+
+        self.detector = detector
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.warmup = warmup
+        self._local = threading.local()
+        self._pool: Optional[DetectorWorkerPool] = None
+
+        # Thread mode also hosts annotation for the process mode (no model access)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="inference",
+            initializer=self._init_thread_worker if kind == "thread" else None
+        )
+
+        if kind == "process":
+            # Each process loads its own model and reads frames from shared memory
+            self._pool = DetectorWorkerPool(
+                detector.model_path,
+                detector_options=detector.options(),
+                workers=self.workers,
+                **(pool_options or {})
+            )
+            self._pool.start()
+
+        logger.info(f"Inference executor started ({kind}, {self.workers} worker(s))")
+
+    @staticmethod
+    def workers_load_model(kind: str, workers: int) -> bool:
+        """Whether every worker loads its own model, so the caller's detector needs none"""
+        return kind == "process" or workers > 1
+
+    def _init_thread_worker(self):
+        # The Ultralytics predictor keeps per-call state, so only a single worker
+        # may share the main detector; with more, each worker loads its own copy
+        if not self.workers_load_model(self.kind, self.workers):
+            self._local.detector = self.detector
+        else:
+            self._local.detector = PersonDetector(self.detector.model_path, **self.detector.options())
+            if self.warmup:
+                self._local.detector.warmup()
+
+    def _call_thread_detector(self, method: str, *args):
+        return getattr(self._local.detector, method)(*args)
+
+    async def _call(self, method: str, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call_thread_detector, method, *args)
+
+    async def detect(self, image: np.ndarray) -> List[Dict]:
+        """Run PersonDetector.detect_persons on a worker"""
+        if self._pool:
+            return (await self._pool.detect_batch([image]))[0]
+        return await self._call("detect_persons", image)
+
+    async def detect_batch(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        """Run PersonDetector.detect_persons_batch on a worker"""
+        if self._pool:
+            return await self._pool.detect_batch(frames)
+        return await self._call("detect_persons_batch", frames)
+
+    async def process_frame(self, frame: np.ndarray, in_place: bool = False) -> Tuple[np.ndarray, Dict]:
+        """Run PersonDetector.process_video_frame on a worker"""
+        if self._pool:
+            if frame is None or frame.size == 0:
+                return frame, self.detector.get_detection_summary([])
+            person_positions = await self.detect(frame)
+            annotated_frame = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.detector.annotate_frame, frame, person_positions, in_place
+            )
+            return annotated_frame, self.detector.get_detection_summary(person_positions)
+        return await self._call("process_video_frame", frame, in_place)
+
+    def get_stats(self) -> dict:
+        """Get executor statistics"""
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "pool": self._pool.get_stats() if self._pool else None
+        }
+
+    def shutdown(self):
+        """Stop the workers without waiting for queued calls"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._pool:
+            self._pool.shutdown()
+        logger.info("Inference executor stopped")
+
+
+class InferenceScheduler:
+    """Dynamic batching scheduler that tracks submit frames to"""
+
+    def __init__(self, executor: InferenceExecutor, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            executor: Executor used to run the batches
+            max_batch_size: Maximum number of frames per model call
+            max_wait_ms: Maximum time the first frame of a batch waits for others
+        """
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # One batch in flight per executor worker
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batch_tasks: set = set()
+        # Frames taken off the queue by _run but not yet handed to a batch task
+        self._held: List[Tuple[np.ndarray, asyncio.Future]] = []
+
+        # Statistics
+        self.batches_run = 0
+        self.frames_processed = 0
+        self.last_batch_size = 0
+        self.last_batch_latency_ms = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the batching loop on the running event loop"""
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.executor.workers)
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Inference scheduler started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f})"
+        )
+
+    async def stop(self):
+        """Stop the batching loop and fail any frames still waiting"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for task in list(self._batch_tasks):
+            task.cancel()
+
+        # Frames the loop was collecting or holding for a free slot, then the queue
+        stopped = RuntimeError("Inference scheduler stopped")
+        held, self._held = self._held, []
+        if self._queue:
+            while not self._queue.empty():
+                held.append(self._queue.get_nowait())
+        for _, future in held:
+            if not future.done():
+                future.set_exception(stopped)
+
+        logger.info("Inference scheduler stopped")
+
+    async def submit(self, frame: np.ndarray) -> List[Dict]:
+        """
+        Queue a frame for detection and wait for its result
+
+        Args:
+            frame: Input video frame
+
+        Returns:
+            List of person positions for this frame
+        """
+        if not self.is_running:
+            raise RuntimeError("Inference scheduler is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((frame, future))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        """Wait for one frame, then gather more until the batch is full or the deadline passes"""
+        loop = asyncio.get_running_loop()
+
+        batch = self._held = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Tracks that stopped waiting (e.g. closed connections) are dropped
+        self._held = [(frame, future) for frame, future in batch if not future.done()]
+        return self._held
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._held = []
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        start = time.perf_counter()
+        try:
+            batch_positions = await self.executor.detect_batch([frame for frame, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Error running inference batch: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        for (_, future), person_positions in zip(batch, batch_positions):
+            if not future.done():
+                future.set_result(person_positions)
+
+        self.batches_run += 1
+        self.frames_processed += len(batch)
+        self.last_batch_size = len(batch)
+        self.last_batch_latency_ms = (time.perf_counter() - start) * 1000
+
+    def get_stats(self) -> dict:
+        """Get batching statistics"""
+        return {
+            "running": self.is_running,
+            "executor": self.executor.get_stats(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending_frames": self._queue.qsize() if self._queue else 0,
+            "batches_run": self.batches_run,
+            "frames_processed": self.frames_processed,
+            "average_batch_size": (
+                self.frames_processed / self.batches_run if self.batches_run else 0.0
+            ),
+            "last_batch_size": self.last_batch_size,
+            "last_batch_latency_ms": self.last_batch_latency_ms
+        }
@@ -1,3 +1,8 @@
+import time
+
+# Process start reference for the startup metrics
+_PROCESS_START = time.perf_counter()
+
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
@@ -6,7 +11,7 @@ import numpy as np
 import json
 import asyncio
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 import uvicorn
 from pathlib import Path
 import base64
@@ -14,8 +19,12 @@ from io import BytesIO
 from PIL import Image
 
 from person_detector import PersonDetector
+from inference import InferenceExecutor
+from detection_broadcast import SocketSender, encode_message
 import config  # Import centralized configuration
 
+_IMPORTS_DONE = time.perf_counter()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,59 +43,96 @@ app.add_middleware(
 
 # Global variables
 detector = None
+inference_executor = None
 connected_clients: List[WebSocket] = []
 video_capture = None
 is_streaming = False
+# Camera calls block, so they run on worker threads; one at a time, since
+# the processing loop and /video_feed share the capture
+capture_lock = asyncio.Lock()
+
+# Cold-start timing in milliseconds since process start (see /health)
+startup_metrics = {
+    "imports_ms": (_IMPORTS_DONE - _PROCESS_START) * 1000,
+    "ready_ms": None
+}
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        # One bounded send queue per socket, so a slow client never stalls the others
+        self.senders: Dict[WebSocket, SocketSender] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        sender = SocketSender(
+            websocket,
+            max_queue=config.BROADCAST_QUEUE_SIZE,
+            policy=config.BROADCAST_SLOW_POLICY,
+            send_timeout=config.BROADCAST_SEND_TIMEOUT,
+            on_close=self._close_slow
+        )
+        self.senders[websocket] = sender
+        sender.start()
         logger.info(f"Client connected. Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        sender = self.senders.pop(websocket, None)
+        if sender:
+            sender.stop()
         logger.info(f"Client disconnected. Total connections: {len(self.active_connections)}")
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        try:
-            await websocket.send_text(message)
-        except Exception as e:
-            logger.error(f"Error sending message: {e}")
-            self.disconnect(websocket)
+    def _close_slow(self, websocket: WebSocket, reason: str):
+        self.disconnect(websocket)
 
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
+        async def close():
             try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
-                disconnected.append(connection)
-        
-        # Remove disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection)
+                await websocket.close(code=1013, reason="Too slow")
+            except Exception:
+                pass
+
+        asyncio.create_task(close())
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        """Queue a reply ahead of broadcasts; the socket's sender is its only writer"""
+        sender = self.senders.get(websocket)
+        if sender:
+            sender.enqueue(message, priority=True)
+
+    async def broadcast(self, message: str, key: Optional[str] = None):
+        """
+        Queue a serialized message for every client; each socket sends on its own
+
+        A message with a key replaces one with the same key that is still
+        waiting, so a backlogged client skips straight to the newest update.
+        """
+        for connection in list(self.active_connections):
+            sender = self.senders.get(connection)
+            if sender:
+                sender.enqueue(message, key=key)
 
 manager = ConnectionManager()
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the person detector and camera on startup"""
-    global detector, video_capture, is_streaming
+    global detector, inference_executor, video_capture, is_streaming
+    
+    # Worker processes (and worker threads beyond the first) load their own
+    # model, so the detector here then only annotates and summarizes
+    load_model = not InferenceExecutor.workers_load_model(config.INFERENCE_EXECUTOR, config.INFERENCE_WORKERS)
     
     try:
         # Try to load custom trained model, fallback to pre-trained
         model_path = Path("Model/best_person_detection.pt")
         if not model_path.exists():
             logger.warning(f"Custom model not found at {model_path}, using pre-trained YOLOv8n")
-            detector = PersonDetector("yolov8n.pt")
+            detector = PersonDetector("yolov8n.pt", load=load_model, **config.DETECTOR_OPTIONS)
         else:
-            detector = PersonDetector(str(model_path))
+            detector = PersonDetector(str(model_path), load=load_model, **config.DETECTOR_OPTIONS)
         
         logger.info("Person detection system initialized successfully")
         
@@ -98,18 +144,39 @@ async def startup_event():
         logger.error(f"Failed to initialize detector: {e}")
         # Fallback to basic detector
         try:
-            detector = PersonDetector("yolov8n.pt")
+            detector = PersonDetector("yolov8n.pt", load=load_model, **config.DETECTOR_OPTIONS)
             logger.info("Fallback detector initialized")
         except Exception as e2:
             logger.error(f"Failed to initialize fallback detector: {e2}")
             detector = None
+    
+    # Pay the first-inference cost now instead of on the first request
+    if detector is not None and config.MODEL_WARMUP and load_model:
+        detector.warmup()
+    
+    # Run inference off the event loop so the API and WebSocket stay responsive
+    if detector is not None:
+        try:
+            inference_executor = InferenceExecutor(
+                detector,
+                kind=config.INFERENCE_EXECUTOR,
+                workers=config.INFERENCE_WORKERS,
+                pool_options=config.DETECTOR_POOL_OPTIONS,
+                warmup=config.MODEL_WARMUP
+            )
+        except Exception as e:
+            logger.error(f"Failed to start inference executor: {e}")
+            inference_executor = None
+    
+    startup_metrics["ready_ms"] = (time.perf_counter() - _PROCESS_START) * 1000
+    logger.info(f"Ready {startup_metrics['ready_ms']:.0f} ms after process start")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
-    global video_capture
-    if video_capture:
-        video_capture.release()
+    await release_camera()
+    if inference_executor:
+        inference_executor.shutdown()
     logger.info("Person detection system shutdown")
 
 @app.get("/")
@@ -123,30 +190,46 @@ async def health_check():
         "detector_loaded": detector is not None,
         "camera_available": video_capture is not None and video_capture.isOpened(),
         "is_streaming": is_streaming,
-        "active_connections": len(manager.active_connections)
+        "active_connections": len(manager.active_connections),
+        "startup": {**startup_metrics, **(detector.get_startup_metrics() if detector else {})}
     }
 
+async def read_camera_frame():
+    """Read the next camera frame without blocking the event loop"""
+    async with capture_lock:
+        if video_capture is None:
+            return False, None
+        return await asyncio.to_thread(video_capture.read)
+
+async def release_camera():
+    """Release the camera once no read is using it"""
+    global video_capture
+    async with capture_lock:
+        if video_capture is not None:
+            capture, video_capture = video_capture, None
+            await asyncio.to_thread(capture.release)
+
 @app.post("/start_camera")
 async def start_camera(camera_id: int = 0):
     """Start camera capture"""
     global video_capture, is_streaming
     
     try:
-        if video_capture is not None:
-            video_capture.release()
-        
-        video_capture = cv2.VideoCapture(camera_id)
+        await release_camera()
         
-        if not video_capture.isOpened():
-            logger.error(f"Failed to open camera {camera_id}")
-            raise HTTPException(status_code=400, detail=f"Failed to open camera {camera_id}")
-        
-        # Test if we can read a frame
-        ret, frame = video_capture.read()
-        if not ret or frame is None:
-            logger.error(f"Failed to read frame from camera {camera_id}")
-            video_capture.release()
-            raise HTTPException(status_code=400, detail=f"Failed to read frame from camera {camera_id}")
+        async with capture_lock:
+            # Opening a device can take seconds
+            video_capture = await asyncio.to_thread(cv2.VideoCapture, camera_id)
+            
+            if not video_capture.isOpened():
+                logger.error(f"Failed to open camera {camera_id}")
+                raise HTTPException(status_code=400, detail=f"Failed to open camera {camera_id}")
+            
+            # Test if we can read a frame
+            ret, frame = await asyncio.to_thread(video_capture.read)
+            if not ret or frame is None:
+                logger.error(f"Failed to read frame from camera {camera_id}")
+                raise HTTPException(status_code=400, detail=f"Failed to read frame from camera {camera_id}")
         
         is_streaming = True
         logger.info(f"Camera {camera_id} started successfully")
@@ -155,20 +238,16 @@ async def start_camera(camera_id: int = 0):
         
     except Exception as e:
         logger.error(f"Error starting camera: {e}")
-        if video_capture is not None:
-            video_capture.release()
-            video_capture = None
+        await release_camera()
         raise HTTPException(status_code=500, detail=f"Error starting camera: {str(e)}")
 
 @app.post("/stop_camera")
 async def stop_camera():
     """Stop camera capture"""
-    global video_capture, is_streaming
+    global is_streaming
     
     try:
-        if video_capture:
-            video_capture.release()
-            video_capture = None
+        await release_camera()
         
         is_streaming = False
         logger.info("Camera stopped successfully")
@@ -183,7 +262,7 @@ async def stop_camera():
 @app.get("/detect_from_file")
 async def detect_from_file(file_path: str):
     """Detect persons from an image file"""
-    if detector is None:
+    if detector is None or inference_executor is None:
         raise HTTPException(status_code=500, detail="Detector not initialized")
     
     try:
@@ -193,7 +272,7 @@ async def detect_from_file(file_path: str):
             raise HTTPException(status_code=404, detail="Image file not found")
         
         # Detect persons
-        person_positions = detector.detect_persons(image)
+        person_positions = await inference_executor.detect(image)
         detection_summary = detector.get_detection_summary(person_positions)
         
         return detection_summary
@@ -205,7 +284,7 @@ async def detect_from_file(file_path: str):
 @app.post("/detect_from_base64")
 async def detect_from_base64(data: dict):
     """Detect persons from base64 encoded image"""
-    if detector is None:
+    if detector is None or inference_executor is None:
         raise HTTPException(status_code=500, detail="Detector not initialized")
     
     try:
@@ -218,7 +297,7 @@ async def detect_from_base64(data: dict):
         image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
         
         # Detect persons
-        person_positions = detector.detect_persons(image)
+        person_positions = await inference_executor.detect(image)
         detection_summary = detector.get_detection_summary(person_positions)
         
         return detection_summary
@@ -256,24 +335,26 @@ async def process_video_stream():
     """Process video stream and broadcast detection data"""
     global video_capture, detector, is_streaming
     
-    if not is_streaming or video_capture is None or detector is None:
+    if not is_streaming or video_capture is None or inference_executor is None:
         return
     
     try:
-        ret, frame = video_capture.read()
+        ret, frame = await read_camera_frame()
         if not ret:
             logger.warning("Failed to read frame from camera")
             return
         
-        # Process frame for person detection
-        annotated_frame, detection_summary = detector.process_video_frame(frame)
+        # Only the detections are broadcast, so skip drawing the overlay
+        person_positions = await inference_executor.detect(frame)
+        detection_summary = detector.get_detection_summary(person_positions)
         
         # Add frame data to detection summary
         detection_summary["frame_available"] = True
         
         # Broadcast detection data to all connected clients
         if manager.active_connections:
-            await manager.broadcast(json.dumps(detection_summary))
+            # Serialized once for all clients
+            await manager.broadcast(encode_message(detection_summary), key="detection")
         
     except Exception as e:
         logger.error(f"Error processing video stream: {e}")
@@ -287,7 +368,7 @@ async def video_feed():
         logger.error("Camera not started - please call /start_camera first")
         raise HTTPException(status_code=400, detail="Camera not started - please call /start_camera first")
     
-    if detector is None:
+    if detector is None or inference_executor is None:
         logger.error("Detector not initialized")
         raise HTTPException(status_code=400, detail="Detector not initialized")
     
@@ -301,7 +382,7 @@ async def video_feed():
         
         while True:
             try:
-                ret, frame = video_capture.read()
+                ret, frame = await read_camera_frame()
                 if not ret:
                     logger.warning("Failed to read frame from camera")
                     await asyncio.sleep(0.1)
@@ -312,8 +393,9 @@ async def video_feed():
                     await asyncio.sleep(0.1)
                     continue
                 
-                # Process frame for person detection
-                annotated_frame, detection_summary = detector.process_video_frame(frame)
+                # Process frame for person detection; the captured frame is ours,
+                # so the overlay is drawn on it directly
+                annotated_frame, detection_summary = await inference_executor.process_frame(frame, in_place=True)
                 
                 # Encode frame as JPEG
                 ret, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
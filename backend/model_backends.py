@@ -0,0 +1,207 @@
+"""
+Model Backends - Runtime selection for the person detection model
+PyTorch checkpoints are exported once to TorchScript, ONNX or OpenVINO and
+cached on disk, keyed by the hash of the weights file. Exported models are
+loaded through the same Ultralytics predictor, so pre- and post-processing
+do not change.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import warnings
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default cache location, created next to the weights file
+CACHE_DIRNAME = ".model_cache"
+# Written next to an artifact once its export has finished
+COMPLETE_MARKER = ".complete"
+
+_yolo_class = None
+_import_lock = threading.Lock()
+
+
+def import_yolo():
+    """
+    Import torch and ultralytics on first use and return the YOLO class
+
+    The ML stack costs seconds and hundreds of MB to import, so it is only
+    pulled in by processes that actually load a model.
+    """
+    global _yolo_class
+    with _import_lock:
+        if _yolo_class is None:
+            import torch
+
+            # Force PyTorch to use weights_only=False for Ultralytics compatibility
+            # This is safe because we trust the YOLO model weights
+            os.environ['TORCH_FORCE_WEIGHTS_ONLY_LOAD'] = '0'
+            warnings.filterwarnings('ignore', category=FutureWarning)
+
+            # Monkey-patch torch.load to use weights_only=False by default
+            original_torch_load = torch.load
+
+            def patched_torch_load(*args, **kwargs):
+                kwargs.setdefault('weights_only', False)
+                return original_torch_load(*args, **kwargs)
+
+            torch.load = patched_torch_load
+
+            from ultralytics import YOLO
+            _yolo_class = YOLO
+    return _yolo_class
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    # Ultralytics export format name
+    format: str
+    # Appended to the checkpoint stem to name the exported artifact
+    suffix: str
+    # Extra YOLO.export() arguments
+    options: Dict = field(default_factory=dict)
+
+
+# Backend name -> export format (None runs the checkpoint directly)
+MODEL_BACKENDS: Dict[str, Optional[ExportFormat]] = {
+    "pytorch": None,
+    # Skips checkpoint unpickling; traced for a fixed 640x640 input
+    "torchscript": ExportFormat("torchscript", ".torchscript"),
+    # Dynamic axes keep batched and tiled inference (variable batch/input size) working
+    "onnx": ExportFormat("onnx", ".onnx", {"dynamic": True, "simplify": False}),
+    "openvino": ExportFormat("openvino", "_openvino_model", {"dynamic": True}),
+}
+
+
+def weights_hash(model_path: str) -> str:
+    """Short SHA-256 of a weights file, used as the cache key"""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as weights:
+        for chunk in iter(lambda: weights.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def exported_model_path(
+    model_path: str,
+    backend: str,
+    cache_dir: Optional[str] = None,
+    digest: Optional[str] = None
+) -> Path:
+    """
+    Location of the cached export of a checkpoint for a backend
+
+    Args:
+        model_path: Path to the PyTorch checkpoint (.pt)
+        backend: One of MODEL_BACKENDS
+        cache_dir: Cache root (default: .model_cache next to the checkpoint)
+        digest: weights_hash() of the checkpoint, if already computed
+
+    Returns:
+        <cache root>/<weights hash>/<stem><suffix> (a file or, for OpenVINO, a directory)
+    """
+    export_format = MODEL_BACKENDS[backend]
+    source = Path(model_path)
+    if export_format is None:
+        return source
+
+    root = Path(cache_dir) if cache_dir else source.parent / CACHE_DIRNAME
+    return root / (digest or weights_hash(model_path)) / (source.stem + export_format.suffix)
+
+
+def backend_for_path(model_file: str) -> str:
+    """Backend that runs a model file, judged by its name (e.g. a quantized .onnx)"""
+    name = Path(model_file).name
+    for backend, export_format in MODEL_BACKENDS.items():
+        if export_format is not None and name.endswith(export_format.suffix):
+            return backend
+    return "pytorch"
+
+
+def is_cached(artifact: Path) -> bool:
+    """True if an export finished writing this artifact"""
+    return artifact.exists() and artifact.with_name(artifact.name + COMPLETE_MARKER).exists()
+
+
+def export_model(
+    model_path: str,
+    backend: str,
+    cache_dir: Optional[str] = None,
+    digest: Optional[str] = None
+) -> str:
+    """
+    Export a checkpoint for a backend into its hash-keyed cache directory
+
+    Args:
+        model_path: Path to the PyTorch checkpoint (.pt)
+        backend: One of MODEL_BACKENDS other than "pytorch"
+        cache_dir: Cache root (default: .model_cache next to the checkpoint)
+        digest: weights_hash() of the checkpoint, if already computed
+
+    Returns:
+        Path of the exported model
+    """
+    YOLO = import_yolo()
+
+    export_format = MODEL_BACKENDS[backend]
+    artifact = exported_model_path(model_path, backend, cache_dir, digest)
+    artifact.parent.mkdir(parents=True, exist_ok=True)
+
+    # Ultralytics writes the export next to the weights, so export from a
+    # link (or copy) of them inside the cache directory
+    weights = artifact.parent / Path(model_path).name
+    if not weights.exists():
+        try:
+            os.link(model_path, weights)
+        except OSError:
+            shutil.copy2(model_path, weights)
+
+    logger.info(f"Exporting {model_path} for the {backend} backend (one-time)...")
+    exported = Path(YOLO(str(weights)).export(format=export_format.format, **export_format.options))
+    if exported.resolve() != artifact.resolve():
+        raise RuntimeError(f"Export wrote {exported}, expected {artifact}")
+
+    artifact.with_name(artifact.name + COMPLETE_MARKER).touch()
+    logger.info(f"Exported model cached at {artifact}")
+    return str(artifact)
+
+
+def resolve_model_path(model_path: str, backend: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Get the model file to load for a backend, exporting it first if needed
+
+    Paths that are not PyTorch checkpoints (e.g. an .onnx file) are assumed
+    to be exported already and are returned unchanged.
+
+    Args:
+        model_path: Path to the PyTorch checkpoint (.pt)
+        backend: One of MODEL_BACKENDS
+        cache_dir: Cache root (default: .model_cache next to the checkpoint)
+
+    Returns:
+        Path to pass to ultralytics.YOLO
+    """
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend} (expected one of {tuple(MODEL_BACKENDS)})")
+
+    if MODEL_BACKENDS[backend] is None or Path(model_path).suffix != ".pt":
+        return model_path
+
+    if not Path(model_path).exists():
+        # Named pretrained weights (e.g. yolov8n.pt) are downloaded first
+        import_yolo()
+        from ultralytics.utils.downloads import attempt_download_asset
+        model_path = str(attempt_download_asset(model_path))
+
+    # Hash the weights once for both the cache lookup and a cold export
+    digest = weights_hash(model_path)
+    artifact = exported_model_path(model_path, backend, cache_dir, digest)
+    if is_cached(artifact):
+        return str(artifact)
+    return export_model(model_path, backend, cache_dir, digest)
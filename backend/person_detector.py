@@ -1,65 +1,665 @@
 import cv2
 import numpy as np
-import json
 import time
 from typing import List, Dict, Tuple, Optional
 import logging
-import torch
-import warnings
-import os
 
-# Force PyTorch to use weights_only=False for Ultralytics compatibility
-# This is safe because we trust the YOLO model weights
-os.environ['TORCH_FORCE_WEIGHTS_ONLY_LOAD'] = '0'
-warnings.filterwarnings('ignore', category=FutureWarning)
+# torch and ultralytics are only imported when a model is loaded (see
+# model_backends.import_yolo), so importing this module stays cheap
+from model_backends import MODEL_BACKENDS, backend_for_path, import_yolo, resolve_model_path
 
-# Monkey-patch torch.load to use weights_only=False by default
-_original_torch_load = torch.load
-def _patched_torch_load(*args, **kwargs):
-    kwargs.setdefault('weights_only', False)
-    return _original_torch_load(*args, **kwargs)
-torch.load = _patched_torch_load
+logger = logging.getLogger(__name__)
 
-from ultralytics import YOLO
 
-logger = logging.getLogger(__name__)
+def positions_from_array(boxes: np.ndarray, image_shape: Tuple[int, ...], start_id: int = 0) -> List[Dict]:
+    """
+    Build person position dictionaries from a compact box array
+    
+    Args:
+        boxes: (N, 5) array of [x_center, y_center, width, height, confidence] in pixels
+        image_shape: Shape of the source image, (height, width, ...)
+        start_id: Id assigned to the first person
+        
+    Returns:
+        List of dictionaries containing person positions and metadata
+    """
+    if len(boxes) == 0:
+        return []
+    
+    # Calculate normalized coordinates (0-1 range)
+    img_height, img_width = image_shape[:2]
+    scale = np.array([img_width, img_height, img_width, img_height], dtype=boxes.dtype)
+    normalized = boxes[:, :4] / scale
+    
+    return [
+        {
+            'id': start_id + i,
+            'x_center': x,
+            'y_center': y,
+            'width': w,
+            'height': h,
+            'confidence': c,
+            'normalized_x': nx,
+            'normalized_y': ny,
+            'normalized_width': nw,
+            'normalized_height': nh
+        }
+        for i, ((x, y, w, h, c), (nx, ny, nw, nh)) in enumerate(
+            zip(boxes.tolist(), normalized.tolist())
+        )
+    ]
+
+
+def positions_to_array(person_positions: List[Dict]) -> np.ndarray:
+    """
+    Pack person positions into a compact (N, 5) float32 array
+    
+    Detector outputs are float32, so the round trip through
+    positions_from_array() is lossless.
+    
+    Args:
+        person_positions: List of person positions
+        
+    Returns:
+        Array of [x_center, y_center, width, height, confidence] rows
+    """
+    return np.array(
+        [
+            (pos['x_center'], pos['y_center'], pos['width'], pos['height'], pos['confidence'])
+            for pos in person_positions
+        ],
+        dtype=np.float32
+    ).reshape(-1, 5)
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of center-format boxes
+    
+    Args:
+        boxes_a: (N, 4+) array of [x_center, y_center, width, height, ...]
+        boxes_b: (M, 4+) array of [x_center, y_center, width, height, ...]
+        
+    Returns:
+        (N, M) array of IoU values
+    """
+    a_min = boxes_a[:, None, :2] - boxes_a[:, None, 2:4] / 2
+    a_max = boxes_a[:, None, :2] + boxes_a[:, None, 2:4] / 2
+    b_min = boxes_b[None, :, :2] - boxes_b[None, :, 2:4] / 2
+    b_max = boxes_b[None, :, :2] + boxes_b[None, :, 2:4] / 2
+    
+    overlap = np.clip(np.minimum(a_max, b_max) - np.maximum(a_min, b_min), 0, None)
+    intersection = overlap[..., 0] * overlap[..., 1]
+    area_a = boxes_a[:, 2] * boxes_a[:, 3]
+    area_b = boxes_b[:, 2] * boxes_b[:, 3]
+    union = area_a[:, None] + area_b[None, :] - intersection
+    
+    return intersection / np.maximum(union, 1e-9)
+
+
+def non_max_suppression(boxes: np.ndarray, iou_threshold: float = 0.5) -> np.ndarray:
+    """
+    Greedy NMS over center-format boxes, highest confidence first
+    
+    Args:
+        boxes: (N, 5) array of [x_center, y_center, width, height, confidence]
+        iou_threshold: Boxes overlapping a kept box by more than this are dropped
+    
+    Returns:
+        Indices of the kept boxes, by descending confidence
+    """
+    order = np.argsort(-boxes[:, 4], kind='stable')
+    keep = []
+    
+    while len(order):
+        best = order[0]
+        keep.append(best)
+        if len(order) == 1:
+            break
+        overlaps = box_iou(boxes[best:best + 1], boxes[order[1:]])[0]
+        order = order[1:][overlaps <= iou_threshold]
+    
+    return np.array(keep, dtype=np.int64)
+
+
+def tile_grid(height: int, width: int, tile_size: int, overlap: float = 0.2) -> List[Tuple[int, int, int, int]]:
+    """
+    Split an image into overlapping square tiles covering it completely
+    
+    Tiles step by ``tile_size * (1 - overlap)``; the last tile in each
+    direction is aligned to the image edge so no tile is padded.
+    
+    Args:
+        height: Image height in pixels
+        width: Image width in pixels
+        tile_size: Tile edge length in pixels
+        overlap: Fraction of the tile shared with its neighbour (0.0 to <1.0)
+    
+    Returns:
+        List of (x1, y1, x2, y2) tile rectangles
+    """
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+    
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+    
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def draw_positions(image: np.ndarray, person_positions: List[Dict]):
+    """
+    Draw bounding boxes, labels and center points onto an image in place
+    
+    Args:
+        image: BGR image to draw on
+        person_positions: List of person positions to draw
+    """
+    try:
+        for pos in person_positions:
+            x_center = pos['x_center']
+            y_center = pos['y_center']
+            width = pos['width']
+            height = pos['height']
+            confidence = pos['confidence']
+            
+            # Calculate bounding box coordinates
+            x1 = int(x_center - width / 2)
+            y1 = int(y_center - height / 2)
+            x2 = int(x_center + width / 2)
+            y2 = int(y_center + height / 2)
+            
+            # Draw bounding box
+            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            
+            # Draw label
+            label = f"Person {pos['id']}: {confidence:.2f}"
+            cv2.putText(image, label, (x1, y1 - 10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            
+            # Draw center point
+            cv2.circle(image, (int(x_center), int(y_center)), 3, (255, 0, 0), -1)
+    except Exception as e:
+        logger.error(f"Error drawing bounding boxes: {e}")
+
+
+class PersonTracker:
+    """
+    Lightweight IoU tracker that gives persons stable ids across frames
+    
+    Detections are greedily associated with tracks by IoU against each
+    track's predicted box. Track centers follow a constant-velocity model
+    smoothed with an alpha-beta filter (a steady-state Kalman filter), which
+    also predicts boxes on frames where detection is skipped. One tracker
+    is used per video stream.
+    """
+    
+    def __init__(
+        self,
+        iou_threshold: float = 0.3,
+        max_age: int = 30,
+        alpha: float = 0.6,
+        beta: float = 0.2
+    ):
+        """
+        Initialize the tracker
+        
+        Args:
+            iou_threshold: Minimum IoU for a detection to continue a track
+            max_age: Frames a track survives without a matching detection
+            alpha: Position gain of the alpha-beta filter
+            beta: Velocity gain of the alpha-beta filter
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.alpha = alpha
+        self.beta = beta
+        self.reset()
+    
+    def reset(self):
+        """Drop all tracks"""
+        self._next_id = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._boxes = np.empty((0, 5), dtype=np.float32)  # x, y, w, h, confidence
+        self._velocity = np.empty((0, 2), dtype=np.float32)  # center motion per frame
+        self._last_frame = np.empty(0, dtype=np.int64)
+        self._last_update_frame: Optional[int] = None
+        self._image_shape: Optional[Tuple[int, ...]] = None
+    
+    @property
+    def track_count(self) -> int:
+        return len(self._ids)
+    
+    def _predicted_boxes(self, frame_number: int) -> np.ndarray:
+        boxes = self._boxes.copy()
+        elapsed = (frame_number - self._last_frame).astype(np.float32)
+        boxes[:, :2] += self._velocity * elapsed[:, None]
+        return boxes
+    
+    def update(self, person_positions: List[Dict], image_shape: Tuple[int, ...], frame_number: int) -> List[Dict]:
+        """
+        Associate new detections with existing tracks
+        
+        Args:
+            person_positions: Detections for this frame (their 'id' is replaced in place)
+            image_shape: Shape of the frame the detections come from
+            frame_number: Index of that frame in the stream
+            
+        Returns:
+            The detections, with 'id' set to persistent track ids
+        """
+        self._image_shape = image_shape
+        self._last_update_frame = frame_number
+        
+        detections = positions_to_array(person_positions)
+        predicted = self._predicted_boxes(frame_number)
+        
+        matched_tracks: Dict[int, int] = {}
+        if len(predicted) and len(detections):
+            iou = box_iou(predicted, detections)
+            candidates = np.argwhere(iou >= self.iou_threshold)
+            order = np.argsort(-iou[candidates[:, 0], candidates[:, 1]], kind='stable')
+            used_detections = set()
+            for track_index, detection_index in candidates[order].tolist():
+                if track_index in matched_tracks or detection_index in used_detections:
+                    continue
+                matched_tracks[track_index] = detection_index
+                used_detections.add(detection_index)
+        
+        # Correct matched tracks towards their detections
+        if matched_tracks:
+            track_indices = np.fromiter(matched_tracks.keys(), dtype=np.int64)
+            detection_indices = np.fromiter(matched_tracks.values(), dtype=np.int64)
+            elapsed = np.maximum(frame_number - self._last_frame[track_indices], 1).astype(np.float32)
+            
+            residual = detections[detection_indices, :2] - predicted[track_indices, :2]
+            self._boxes[track_indices, :2] = predicted[track_indices, :2] + self.alpha * residual
+            self._boxes[track_indices, 2:] = detections[detection_indices, 2:]
+            self._velocity[track_indices] += self.beta * residual / elapsed[:, None]
+            self._last_frame[track_indices] = frame_number
+            
+            for track_index, detection_index in matched_tracks.items():
+                person_positions[detection_index]['id'] = int(self._ids[track_index])
+        
+        # Start tracks for unmatched detections
+        matched_detections = set(matched_tracks.values())
+        new_detections = [i for i in range(len(detections)) if i not in matched_detections]
+        if new_detections:
+            new_ids = np.arange(self._next_id, self._next_id + len(new_detections), dtype=np.int64)
+            self._next_id += len(new_detections)
+            
+            self._ids = np.concatenate([self._ids, new_ids])
+            self._boxes = np.concatenate([self._boxes, detections[new_detections]])
+            self._velocity = np.concatenate([self._velocity, np.zeros((len(new_detections), 2), dtype=np.float32)])
+            self._last_frame = np.concatenate([self._last_frame, np.full(len(new_detections), frame_number)])
+            
+            for detection_index, track_id in zip(new_detections, new_ids.tolist()):
+                person_positions[detection_index]['id'] = track_id
+        
+        # Forget tracks that have gone unmatched for too long
+        alive = (frame_number - self._last_frame) <= self.max_age
+        if not alive.all():
+            self._ids = self._ids[alive]
+            self._boxes = self._boxes[alive]
+            self._velocity = self._velocity[alive]
+            self._last_frame = self._last_frame[alive]
+        
+        return person_positions
+    
+    def predict(self, frame_number: int) -> List[Dict]:
+        """
+        Predict positions of the persons seen at the last update
+        
+        Args:
+            frame_number: Index of the frame to predict for
+            
+        Returns:
+            List of person positions extrapolated to that frame
+        """
+        if self._last_update_frame is None or self._image_shape is None:
+            return []
+        
+        visible = self._last_frame == self._last_update_frame
+        if not visible.any():
+            return []
+        
+        predicted = self._predicted_boxes(frame_number)[visible]
+        person_positions = positions_from_array(predicted, self._image_shape)
+        for pos, track_id in zip(person_positions, self._ids[visible].tolist()):
+            pos['id'] = track_id
+        
+        return person_positions
+
+
+class RegionOfInterest:
+    """
+    User-defined polygons that restrict where persons are detected
+    
+    Inference runs on the bounding rectangle of the polygons only, and
+    detections whose center falls outside every polygon are discarded.
+    """
+    
+    def __init__(self, polygons: List[List[Tuple[float, float]]]):
+        """
+        Initialize the region
+        
+        Args:
+            polygons: Polygons as lists of (x, y) points in normalized (0-1) coordinates
+        """
+        if not polygons:
+            raise ValueError("At least one ROI polygon is required")
+        
+        self.polygons = []
+        for polygon in polygons:
+            points = np.asarray(polygon, dtype=np.float32)
+            if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+                raise ValueError("Each ROI polygon needs at least 3 (x, y) points")
+            if points.min() < 0 or points.max() > 1:
+                raise ValueError("ROI coordinates must be normalized to the 0-1 range")
+            self.polygons.append(points)
+        
+        self._mask_cache: Dict[Tuple[int, int], np.ndarray] = {}
+    
+    def to_list(self) -> List[List[List[float]]]:
+        return [polygon.tolist() for polygon in self.polygons]
+    
+    def _pixel_polygons(self, height: int, width: int) -> List[np.ndarray]:
+        scale = np.array([width, height], dtype=np.float32)
+        return [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons]
+    
+    def mask(self, height: int, width: int) -> np.ndarray:
+        """Binary mask (255 inside the region) for a frame of the given size"""
+        key = (height, width)
+        if key not in self._mask_cache:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, self._pixel_polygons(height, width), 255)
+            self._mask_cache[key] = mask
+        return self._mask_cache[key]
+    
+    def crop(self, image: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Crop an image to the bounding rectangle of the region
+        
+        Returns:
+            Tuple of (cropped view, (x_offset, y_offset))
+        """
+        height, width = image.shape[:2]
+        points = np.concatenate(self._pixel_polygons(height, width))
+        x0, y0 = np.clip(points.min(axis=0), 0, [width - 1, height - 1])
+        x1, y1 = np.clip(points.max(axis=0) + 1, 1, [width, height])
+        return image[y0:y1, x0:x1], (int(x0), int(y0))
+    
+    def restore(self, person_positions: List[Dict], offset: Tuple[int, int], image_shape: Tuple[int, ...]) -> List[Dict]:
+        """
+        Map detections on a crop back to full-frame coordinates and drop those outside the region
+        
+        Args:
+            person_positions: Detections on the cropped image
+            offset: Crop offset returned by crop()
+            image_shape: Shape of the full frame
+            
+        Returns:
+            List of person positions in full-frame coordinates
+        """
+        if not person_positions:
+            return []
+        
+        height, width = image_shape[:2]
+        boxes = positions_to_array(person_positions)
+        boxes[:, 0] += offset[0]
+        boxes[:, 1] += offset[1]
+        
+        cx = np.clip(boxes[:, 0].astype(np.int64), 0, width - 1)
+        cy = np.clip(boxes[:, 1].astype(np.int64), 0, height - 1)
+        inside = self.mask(height, width)[cy, cx] > 0
+        
+        return positions_from_array(boxes[inside], image_shape)
+
+
+class MotionGate:
+    """
+    Cheap frame-differencing gate that skips inference on unchanged frames
+    
+    Frames are compared on a small blurred grayscale copy against the last
+    frame that passed the gate, so slow drift still accumulates into a
+    detection. One gate is used per video stream.
+    """
+    
+    def __init__(
+        self,
+        pixel_threshold: int = 25,
+        min_changed_fraction: float = 0.002,
+        max_skipped_frames: int = 30,
+        width: int = 160,
+        roi: Optional[RegionOfInterest] = None
+    ):
+        """
+        Initialize the gate
+        
+        Args:
+            pixel_threshold: Grayscale difference that counts a pixel as changed
+            min_changed_fraction: Fraction of changed pixels that counts as motion
+            max_skipped_frames: Frames skipped at most before a detection is forced
+            width: Width of the downscaled comparison frame
+            roi: Only consider motion inside this region
+        """
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.max_skipped_frames = max_skipped_frames
+        self.width = width
+        self.roi = roi
+        self.frames_skipped = 0
+        self.last_changed_fraction = 0.0
+        self.reset()
+    
+    def reset(self):
+        """Forget the reference frame so the next frame always passes"""
+        self._reference: Optional[np.ndarray] = None
+        self._skipped_in_row = 0
+    
+    def should_detect(self, frame: np.ndarray) -> bool:
+        """
+        Check whether a frame changed enough since the last detection
+        
+        Args:
+            frame: Input BGR video frame
+            
+        Returns:
+            True if the detector should run on this frame
+        """
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        
+        if (
+            self._reference is not None
+            and self._reference.shape == gray.shape
+            and self._skipped_in_row < self.max_skipped_frames
+        ):
+            changed = cv2.absdiff(gray, self._reference) > self.pixel_threshold
+            if self.roi is not None:
+                mask = self.roi.mask(height, self.width) > 0
+                changed_fraction = np.count_nonzero(changed & mask) / max(1, np.count_nonzero(mask))
+            else:
+                changed_fraction = np.count_nonzero(changed) / changed.size
+            self.last_changed_fraction = float(changed_fraction)
+            
+            if changed_fraction < self.min_changed_fraction:
+                self._skipped_in_row += 1
+                self.frames_skipped += 1
+                return False
+        
+        self._reference = gray
+        self._skipped_in_row = 0
+        return True
+
 
 class PersonDetector:
-    def __init__(self, model_path: str, conf_threshold: float = 0.5):
+    # Tile detections this close (in pixels) to an inner tile edge are cut off
+    TILE_EDGE_MARGIN = 2
+    
+    def __init__(
+        self,
+        model_path: str,
+        conf_threshold: float = 0.5,
+        tile_size: Optional[int] = None,
+        tile_overlap: float = 0.2,
+        tile_nms_iou: float = 0.5,
+        backend: str = "pytorch",
+        cache_dir: Optional[str] = None,
+        load: bool = True
+    ):
         """
         Initialize the person detector
         
         Args:
             model_path: Path to the trained YOLO model
             conf_threshold: Confidence threshold for detections
+            tile_size: Enable tiled inference for frames larger than this many
+                pixels on either side (None runs a single pass on every frame)
+            tile_overlap: Fraction of each tile shared with its neighbours
+            tile_nms_iou: IoU above which overlapping tile detections are merged
+            backend: Inference runtime, one of model_backends.MODEL_BACKENDS
+                ("pytorch", "torchscript", "onnx" or "openvino")
+            cache_dir: Where exported models are cached, keyed by the weights
+                hash (default: .model_cache next to the weights)
+            load: Load the model in this process. False when inference workers
+                load their own copies; this instance then only annotates
+                frames and summarizes detections
         """
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(f"Unknown model backend: {backend} (expected one of {tuple(MODEL_BACKENDS)})")
+        
         self.model_path = model_path
+        self.backend = backend
+        # Runtime actually in use; falls back to "pytorch" if the export fails
+        self.active_backend = backend
         self.conf_threshold = conf_threshold
+        self.tile_size = tile_size if tile_size and tile_size > 0 else None
+        self.tile_overlap = min(max(tile_overlap, 0.0), 0.9)
+        self.tile_nms_iou = tile_nms_iou
+        self.cache_dir = cache_dir
         self.model = None
-        self.load_model()
+        # Inference runs on workers that load their own model (see load)
+        self.model_in_workers = not load
+        
+        # Cold-start metrics (milliseconds)
+        self.load_ms: Optional[float] = None
+        self.warmup_ms: Optional[float] = None
+        self.first_detection_ms: Optional[float] = None
+        self._warming_up = False
+        
+        if load:
+            self.load_model()
+    
+    @property
+    def available(self) -> bool:
+        """Whether detection can run: the model is loaded here or by the inference workers"""
+        return self.model is not None or self.model_in_workers
+    
+    def options(self) -> Dict:
+        """Keyword arguments that recreate this detector (e.g. in worker threads or processes)"""
+        return {
+            'conf_threshold': self.conf_threshold,
+            'tile_size': self.tile_size,
+            'tile_overlap': self.tile_overlap,
+            'tile_nms_iou': self.tile_nms_iou,
+            'backend': self.backend,
+            'cache_dir': self.cache_dir
+        }
     
     def load_model(self):
-        """Load the YOLO model - simplified without PyTorch serialization hacks"""
+        """Load the YOLO model through the configured backend"""
+        start = time.perf_counter()
+        model_file = self.model_path
         try:
+            # Exported once per weights hash and cached on disk
+            model_file = resolve_model_path(self.model_path, self.backend, self.cache_dir)
+        except Exception as e:
+            logger.error(f"Could not prepare the {self.backend} model, using PyTorch: {e}")
+        # An already exported file (e.g. INT8 .onnx from quantize_model.py) runs on its own runtime
+        self.active_backend = backend_for_path(model_file)
+        
+        try:
+            YOLO = import_yolo()
             # Just load the model directly - YOLO handles compatibility
-            self.model = YOLO(self.model_path)
-            logger.info(f"Model loaded successfully from {self.model_path}")
+            self.model = YOLO(model_file, task='detect')
+            logger.info(f"Model loaded successfully from {model_file} ({self.active_backend} backend)")
+            if self.active_backend == "torchscript" and self.tile_size not in (None, 640):
+                logger.warning("TorchScript models are traced for 640x640 input; use TILE_SIZE=640 with tiling")
         except Exception as e:
-            logger.error(f"Failed to load model from {self.model_path}: {e}")
+            logger.error(f"Failed to load model from {model_file}: {e}")
             # fallback to default model
             try:
                 self.model = YOLO('yolov8n.pt')
+                self.active_backend = "pytorch"
                 logger.info("Using pre-trained YOLOv8n model as fallback")
             except Exception as e2:
                 logger.error(f"Failed to load fallback model: {e2}")
                 self.model = None
+        
+        self.load_ms = (time.perf_counter() - start) * 1000
     
-    def detect_persons(self, image: np.ndarray) -> List[Dict]:
+    def warmup(self, frame_shape: Tuple[int, int] = (720, 1280)) -> Optional[float]:
+        """
+        Run one inference on a blank frame so the first real frame is not slow
+        
+        The first model call builds the Ultralytics predictor, fuses layers
+        and initializes the runtime, which can take several times longer
+        than a regular inference.
+        
+        Args:
+            frame_shape: (height, width) of the frames that will be processed
+            
+        Returns:
+            Warm-up duration in milliseconds, or None if no model is loaded
+        """
+        if self.model is None:
+            return None
+        
+        start = time.perf_counter()
+        self._warming_up = True
+        try:
+            self.detect_persons_batch([np.zeros((*frame_shape, 3), dtype=np.uint8)])
+        finally:
+            self._warming_up = False
+        self.warmup_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Model warm-up took {self.warmup_ms:.0f} ms")
+        return self.warmup_ms
+    
+    def get_startup_metrics(self) -> Dict:
+        """Get model load, warm-up and first detection latency (milliseconds)"""
+        return {
+            'backend': self.active_backend,
+            'model_load_ms': self.load_ms,
+            'warmup_ms': self.warmup_ms,
+            'first_detection_ms': self.first_detection_ms
+        }
+    
+    def _predict(self, source, **kwargs):
+        """Run the model, recording the latency of the first real (non-warm-up) call"""
+        if self.first_detection_ms is not None or self._warming_up:
+            return self.model(source, conf=self.conf_threshold, verbose=False, **kwargs)
+        
+        start = time.perf_counter()
+        results = self.model(source, conf=self.conf_threshold, verbose=False, **kwargs)
+        self.first_detection_ms = (time.perf_counter() - start) * 1000
+        return results
+    
+    def detect_persons(self, image: np.ndarray, roi: Optional[RegionOfInterest] = None) -> List[Dict]:
         """
         Detect persons in an image and return their positions
         
         Args:
             image: Input image as numpy array
+            roi: Only run inference on, and keep detections inside, this region
             
         Returns:
             List of dictionaries containing person positions and metadata
@@ -72,43 +672,20 @@ class PersonDetector:
             logger.error("Invalid image provided")
             return []
         
+        if roi is not None:
+            crop, offset = roi.crop(image)
+            return roi.restore(self.detect_persons(crop), offset, image.shape)
+        
         try:
-            results = self.model(image, conf=self.conf_threshold, verbose=False)
+            if self._needs_tiling(image):
+                return self._detect_tiled([image])[0]
+            
+            results = self._predict(image)
             
             person_positions = []
             
             for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        cls = int(box.cls[0])
-                        conf = float(box.conf[0])
-                        
-                        if cls == 0 and conf > self.conf_threshold:  # Person class
-                            # Get bounding box coordinates in pixels (xywh format)
-                            x_center_px, y_center_px, width_px, height_px = box.xywh[0].cpu().numpy()
-                            
-                            # Get image dimensions
-                            img_height, img_width = result.orig_shape
-                            
-                            # Calculate normalized coordinates (0-1 range)
-                            normalized_x = x_center_px / img_width
-                            normalized_y = y_center_px / img_height
-                            normalized_width = width_px / img_width
-                            normalized_height = height_px / img_height
-                            
-                            person_positions.append({
-                                'id': len(person_positions),
-                                'x_center': float(x_center_px),
-                                'y_center': float(y_center_px),
-                                'width': float(width_px),
-                                'height': float(height_px),
-                                'confidence': float(conf),
-                                'normalized_x': float(normalized_x),
-                                'normalized_y': float(normalized_y),
-                                'normalized_width': float(normalized_width),
-                                'normalized_height': float(normalized_height)
-                            })
+                person_positions.extend(self._decode_result(result, start_id=len(person_positions)))
             
             return person_positions
             
@@ -116,6 +693,131 @@ class PersonDetector:
             logger.error(f"Error during detection: {e}")
             return []
     
+    def _decode_result(self, result, start_id: int = 0) -> List[Dict]:
+        """
+        Convert one Ultralytics result into person position dictionaries
+        
+        Args:
+            result: Ultralytics ``Results`` object for one image
+            start_id: Id assigned to the first person in this result
+            
+        Returns:
+            List of dictionaries containing person positions and metadata
+        """
+        return positions_from_array(self._result_boxes(result), result.orig_shape, start_id)
+    
+    def _result_boxes(self, result) -> np.ndarray:
+        """
+        Extract person boxes from one Ultralytics result
+        
+        The whole boxes tensor is moved to the host in a single copy and the
+        class/confidence filtering is done as array operations, so the cost
+        no longer grows with per-box tensor access.
+        
+        Args:
+            result: Ultralytics ``Results`` object for one image
+            
+        Returns:
+            (N, 5) array of [x_center, y_center, width, height, confidence] in pixels
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return np.empty((0, 5), dtype=np.float32)
+        
+        # Rows are [x1, y1, x2, y2, (track_id,) conf, cls]
+        data = boxes.data
+        if hasattr(data, 'cpu'):
+            data = data.cpu().numpy()
+        
+        cls = data[:, -1].astype(np.int64)
+        keep = (cls == 0) & (data[:, -2] > self.conf_threshold)  # Person class
+        if not keep.any():
+            return np.empty((0, 5), dtype=np.float32)
+        
+        data = data[keep]
+        
+        # Same xyxy -> xywh arithmetic as Ultralytics' Boxes.xywh
+        boxes_array = np.empty((len(data), 5), dtype=data.dtype)
+        boxes_array[:, 0] = (data[:, 0] + data[:, 2]) / 2
+        boxes_array[:, 1] = (data[:, 1] + data[:, 3]) / 2
+        boxes_array[:, 2] = data[:, 2] - data[:, 0]
+        boxes_array[:, 3] = data[:, 3] - data[:, 1]
+        boxes_array[:, 4] = data[:, -2]
+        
+        return boxes_array
+    
+    def _needs_tiling(self, image: np.ndarray) -> bool:
+        return self.tile_size is not None and max(image.shape[:2]) > self.tile_size
+    
+    def _drop_clipped(self, boxes: np.ndarray, tile: Tuple[int, int, int, int], image_shape: Tuple[int, ...]) -> np.ndarray:
+        """Drop tile detections cut off by a tile edge that is not an image edge"""
+        x1, y1, x2, y2 = tile
+        height, width = image_shape[:2]
+        margin = self.TILE_EDGE_MARGIN
+        
+        left = boxes[:, 0] - boxes[:, 2] / 2
+        top = boxes[:, 1] - boxes[:, 3] / 2
+        right = boxes[:, 0] + boxes[:, 2] / 2
+        bottom = boxes[:, 1] + boxes[:, 3] / 2
+        
+        clipped = np.zeros(len(boxes), dtype=bool)
+        if x1 > 0:
+            clipped |= left <= margin
+        if y1 > 0:
+            clipped |= top <= margin
+        if x2 < width:
+            clipped |= right >= (x2 - x1) - margin
+        if y2 < height:
+            clipped |= bottom >= (y2 - y1) - margin
+        
+        return boxes[~clipped]
+    
+    def _detect_tiled(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Detect persons in large frames by running the model on overlapping tiles
+        
+        Every frame contributes its tiles plus one downscaled full-frame
+        pass (which keeps persons larger than a tile), and all of them go
+        through the model in a single call. Tile detections cut off by an
+        inner tile edge are dropped, since the overlap or the full-frame pass
+        covers them, and the rest are merged with cross-tile NMS.
+        
+        Args:
+            frames: Valid input images as numpy arrays
+            
+        Returns:
+            One list of person positions per input frame, in input order
+        """
+        crops = []
+        owners = []  # (frame index, tile rectangle or None for the full frame)
+        for index, frame in enumerate(frames):
+            crops.append(frame)
+            owners.append((index, None))
+            for tile in tile_grid(frame.shape[0], frame.shape[1], self.tile_size, self.tile_overlap):
+                x1, y1, x2, y2 = tile
+                crops.append(frame[y1:y2, x1:x2])
+                owners.append((index, tile))
+        
+        results = self._predict(crops, imgsz=self.tile_size)
+        
+        frame_boxes: List[List[np.ndarray]] = [[] for _ in frames]
+        for (index, tile), result in zip(owners, results):
+            boxes = self._result_boxes(result)
+            if tile is not None and len(boxes):
+                boxes = self._drop_clipped(boxes, tile, frames[index].shape)
+                boxes[:, 0] += tile[0]
+                boxes[:, 1] += tile[1]
+            frame_boxes[index].append(boxes)
+        
+        batch_positions = []
+        for frame, parts in zip(frames, frame_boxes):
+            boxes = np.concatenate(parts)
+            if len(boxes):
+                boxes = boxes[non_max_suppression(boxes, self.tile_nms_iou)]
+            batch_positions.append(positions_from_array(boxes, frame.shape))
+        
+        return batch_positions
+    
     def get_detection_summary(self, person_positions: List[Dict]) -> Dict:
         """
         Get a summary of detections
@@ -143,12 +845,13 @@ class PersonDetector:
             'timestamp': int(time.time() * 1000)
         }
     
-    def process_video_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, Dict]:
+    def process_video_frame(self, frame: np.ndarray, in_place: bool = False) -> Tuple[np.ndarray, Dict]:
         """
         Process a single video frame and return annotated frame with detection data
         
         Args:
             frame: Input video frame
+            in_place: Draw on the input frame instead of a copy (see annotate_frame)
             
         Returns:
             Tuple of (annotated_frame, detection_summary)
@@ -163,39 +866,94 @@ class PersonDetector:
             
             # Get detection summary
             detection_summary = self.get_detection_summary(person_positions)
-            
-            # Create annotated frame
-            annotated_frame = frame.copy()
         except Exception as e:
             logger.error(f"Error processing video frame: {e}")
             return frame, self.get_detection_summary([])
         
-        # Draw bounding boxes on the frame
+        return self.annotate_frame(frame, person_positions, in_place), detection_summary
+    
+    def detect_persons_batch(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Detect persons in several images with a single model call
+        
+        Frames may come from different streams and may have different sizes.
+        Invalid frames yield an empty list and are not sent to the model.
+        
+        Args:
+            frames: List of input images as numpy arrays
+            
+        Returns:
+            One list of person positions per input frame, in input order
+        """
+        batch_positions: List[List[Dict]] = [[] for _ in frames]
+        
+        if self.model is None:
+            logger.error("Model not loaded")
+            return batch_positions
+        
+        valid_indices = [
+            i for i, frame in enumerate(frames)
+            if frame is not None and frame.size > 0
+        ]
+        if len(valid_indices) != len(frames):
+            logger.error(f"Skipping {len(frames) - len(valid_indices)} invalid frame(s) in batch")
+        if not valid_indices:
+            return batch_positions
+        
+        tiled_indices = [i for i in valid_indices if self._needs_tiling(frames[i])]
+        single_indices = [i for i in valid_indices if not self._needs_tiling(frames[i])]
+        
         try:
-            for pos in person_positions:
-                x_center = pos['x_center']
-                y_center = pos['y_center']
-                width = pos['width']
-                height = pos['height']
-                confidence = pos['confidence']
-                
-                # Calculate bounding box coordinates
-                x1 = int(x_center - width / 2)
-                y1 = int(y_center - height / 2)
-                x2 = int(x_center + width / 2)
-                y2 = int(y_center + height / 2)
-                
-                # Draw bounding box
-                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                
-                # Draw label
-                label = f"Person {pos['id']}: {confidence:.2f}"
-                cv2.putText(annotated_frame, label, (x1, y1 - 10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            if tiled_indices:
+                tiled_positions = self._detect_tiled([frames[i] for i in tiled_indices])
+                for i, person_positions in zip(tiled_indices, tiled_positions):
+                    batch_positions[i] = person_positions
+            
+            if single_indices:
+                results = self._predict([frames[i] for i in single_indices])
                 
-                # Draw center point
-                cv2.circle(annotated_frame, (int(x_center), int(y_center)), 3, (255, 0, 0), -1)
+                for i, result in zip(single_indices, results):
+                    batch_positions[i] = self._decode_result(result)
+            
         except Exception as e:
-            logger.error(f"Error drawing bounding boxes: {e}")
+            logger.error(f"Error during batch detection: {e}")
+        
+        return batch_positions
+    
+    def process_video_frames(self, frames: List[np.ndarray]) -> List[Tuple[np.ndarray, Dict]]:
+        """
+        Process several video frames with one forward pass
+        
+        Args:
+            frames: List of input video frames
+            
+        Returns:
+            List of (annotated_frame, detection_summary) tuples, in input order
+        """
+        batch_positions = self.detect_persons_batch(frames)
+        
+        return [
+            (self.annotate_frame(frame, person_positions), self.get_detection_summary(person_positions))
+            for frame, person_positions in zip(frames, batch_positions)
+        ]
+    
+    def annotate_frame(self, frame: np.ndarray, person_positions: List[Dict],
+                       in_place: bool = False) -> np.ndarray:
+        """
+        Draw bounding boxes, labels and center points on a copy of the frame
+        
+        Args:
+            frame: Input video frame
+            person_positions: List of person positions to draw
+            in_place: Draw directly on the input frame, saving a full-frame copy.
+                Only safe when the caller owns the frame and nothing else reads it.
+            
+        Returns:
+            Annotated frame (the input frame if it is invalid or in_place is set)
+        """
+        if frame is None or frame.size == 0:
+            return frame
         
-        return annotated_frame, detection_summary
\ No newline at end of file
+        annotated_frame = frame if in_place else frame.copy()
+        draw_positions(annotated_frame, person_positions)
+        return annotated_frame
\ No newline at end of file
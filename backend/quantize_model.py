@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+INT8 Quantization - Builds a statically quantized ONNX person model
+
+The FP32 checkpoint (Model/best_person_detection.pt from the training
+notebook, or MODEL_PATH) is exported to ONNX, calibrated on frames from
+local videos or dataset images, and quantized to INT8 with ONNX Runtime.
+The result loads directly with MODEL_PATH=<model>_int8.onnx.
+
+A report compares latency, peak memory and AP50/recall/precision of the
+INT8 model against the FP32 model on a held-out clip.
+
+Usage:
+    python quantize_model.py --calibration upload/ --eval-video ForBiggerEscapes.mp4
+"""
+
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+import config
+from benchmark_utils import (
+    average_precision, latency_summary, match_count, peak_rss_mb, print_table, read_frames, time_detector
+)
+from model_backends import import_yolo, resolve_model_path
+
+TRAINED_MODEL_PATH = Path(__file__).resolve().parent.parent / "Model" / "best_person_detection.pt"
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+# ============================================================================
+# Calibration
+# ============================================================================
+
+def iter_calibration_images(sources: List[str], limit: int, holdout: Optional[str] = None) -> Iterator[np.ndarray]:
+    """
+    Yield up to `limit` BGR images spread evenly over the calibration sources
+
+    Sources are video files, image files, or directories of either (e.g. a
+    dataset's images/train folder). Only the first half of the held-out
+    clip is used, so evaluation frames never calibrate the model.
+    """
+    files: List[Path] = []
+    for source in sources:
+        path = Path(source)
+        candidates = sorted(path.rglob("*")) if path.is_dir() else [path]
+        files.extend(
+            candidate for candidate in candidates
+            if candidate.suffix.lower() in VIDEO_EXTENSIONS | IMAGE_EXTENSIONS
+        )
+    if not files:
+        raise RuntimeError(f"No calibration videos or images found in {sources}")
+
+    videos = [f for f in files if f.suffix.lower() in VIDEO_EXTENSIONS]
+    images = [f for f in files if f.suffix.lower() in IMAGE_EXTENSIONS]
+    per_video = max(1, limit // max(1, len(videos) + (1 if images else 0)))
+
+    produced = 0
+    for video in videos:
+        capture = cv2.VideoCapture(str(video))
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+        if holdout and video.resolve() == Path(holdout).resolve():
+            frame_count //= 2
+        stride = max(1, frame_count // per_video)
+        for frame in read_frames(str(video), min(per_video, limit - produced), stride):
+            yield frame
+            produced += 1
+        if produced >= limit:
+            return
+
+    for image_path in images[::max(1, len(images) // max(1, limit - produced))]:
+        image = cv2.imread(str(image_path))
+        if image is not None:
+            yield image
+            produced += 1
+        if produced >= limit:
+            return
+
+
+class FrameCalibrationReader:
+    """onnxruntime CalibrationDataReader fed with letterboxed frames"""
+
+    def __init__(self, input_name: str, images: Iterator[np.ndarray], imgsz: int):
+        import_yolo()
+        from ultralytics.data.augment import LetterBox
+
+        # Same preprocessing as the Ultralytics predictor uses for exported models
+        letterbox = LetterBox((imgsz, imgsz), auto=False)
+        self.input_name = input_name
+        self.batches = [
+            np.ascontiguousarray(
+                letterbox(image=image)[..., ::-1].transpose(2, 0, 1)[None], dtype=np.float32
+            ) / 255.0
+            for image in images
+        ]
+        self._iterator = iter(self.batches)
+
+    def get_next(self) -> Optional[dict]:
+        batch = next(self._iterator, None)
+        return None if batch is None else {self.input_name: batch}
+
+    def rewind(self):
+        self._iterator = iter(self.batches)
+
+
+def float_nodes(model) -> List[str]:
+    """
+    Nodes kept in floating point: the DFL convolution of the detection head
+
+    This fixed-weight conv turns the softmax over distance bins into box
+    offsets, where INT8 rounding would shift every box. Box decoding after
+    it stays in float anyway, since only Conv ops are quantized.
+    """
+    producers = {output: node for node in model.graph.node for output in node.output}
+
+    excluded = []
+    for node in model.graph.node:
+        if node.op_type != "Conv":
+            continue
+        # Walk back through shape-only ops
+        producer = producers.get(node.input[0])
+        while producer is not None and producer.op_type in ("Transpose", "Reshape"):
+            producer = producers.get(producer.input[0])
+        if producer is not None and producer.op_type == "Softmax":
+            excluded.append(node.name)
+    return excluded
+
+
+def quantize(fp32_path: str, int8_path: str, images: Iterator[np.ndarray], imgsz: int, per_channel: bool = True):
+    """Statically quantize an exported ONNX model to INT8 (QDQ format)"""
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared_path = str(Path(int8_path).with_suffix(".prep.onnx"))
+    try:
+        quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+    except Exception as e:
+        print(f"Pre-processing skipped ({e})")
+        prepared_path = fp32_path
+
+    fp32_model = onnx.load(prepared_path)
+    reader = FrameCalibrationReader(fp32_model.graph.input[0].name, images, imgsz)
+    print(f"Calibrating on {len(reader.batches)} image(s)...")
+
+    quantize_static(
+        prepared_path,
+        int8_path,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        op_types_to_quantize=["Conv"],
+        nodes_to_exclude=float_nodes(fp32_model),
+        per_channel=per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax
+    )
+    if prepared_path != fp32_path:
+        Path(prepared_path).unlink(missing_ok=True)
+
+    # Keep the Ultralytics metadata (stride, names, imgsz) the predictor reads
+    int8_model = onnx.load(int8_path)
+    existing = {prop.key for prop in int8_model.metadata_props}
+    for prop in onnx.load(fp32_path, load_external_data=False).metadata_props:
+        if prop.key not in existing:
+            int8_model.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(int8_model, int8_path)
+
+
+# ============================================================================
+# Evaluation
+# ============================================================================
+
+def _measure(model_file: str, video: str, frames: int, start: int, stride: int, conf: float, results):
+    """Child process: load one model, time it and collect detections; reports peak RSS"""
+    from person_detector import PersonDetector
+
+    clip = read_frames(video, frames, stride, start=start)
+    detector = PersonDetector(model_file, conf_threshold=0.001)
+    if detector.model is None:
+        results.put(None)
+        return
+
+    # All candidate boxes for AP, then latency at the deployed threshold
+    candidates, _ = time_detector(detector, clip, warmup=0)
+    detector.conf_threshold = conf
+    _, latencies = time_detector(detector, clip)
+
+    results.put((detector.active_backend, candidates, latencies, peak_rss_mb()))
+
+
+def measure(model_file: str, args, start: int) -> Optional[tuple]:
+    """
+    Run _measure in a fresh process so each model's peak memory is isolated
+
+    Returns None if the model does not load, the process dies without a
+    result (e.g. killed for memory, or a runtime abort) or it exceeds
+    --eval-timeout.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_measure,
+        args=(model_file, args.eval_video, args.eval_frames, start, args.eval_stride, args.conf, results)
+    )
+    process.start()
+
+    outcome = None
+    deadline = time.monotonic() + args.eval_timeout
+    while True:
+        try:
+            outcome = results.get(timeout=1.0)
+            break
+        except queue.Empty:
+            pass
+        if not process.is_alive():
+            # The result may still be in flight from a process that just exited
+            try:
+                outcome = results.get(timeout=1.0)
+            except queue.Empty:
+                print(f"  evaluation process exited with code {process.exitcode} without a result",
+                      file=sys.stderr)
+            break
+        if time.monotonic() > deadline:
+            print(f"  evaluation timed out after {args.eval_timeout:g}s", file=sys.stderr)
+            process.terminate()
+            break
+
+    process.join(timeout=10)
+    if process.is_alive():
+        process.kill()
+    return outcome
+
+
+def evaluate(models: dict, args) -> Optional[dict]:
+    """
+    Latency, peak memory and accuracy of each model against FP32 PyTorch pseudo-labels
+
+    Returns None if the FP32 baseline (the reference labels) cannot be measured.
+    """
+    capture = cv2.VideoCapture(args.eval_video)
+    start = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) // 2  # Second half is held out
+    capture.release()
+
+    measured = {}
+    for name, model_file in models.items():
+        print(f"Evaluating {name} ({model_file})...")
+        outcome = measure(model_file, args, start)
+        if outcome is None:
+            print(f"  could not load {model_file}", file=sys.stderr)
+            continue
+        measured[name] = outcome
+
+    if "fp32" not in measured:
+        print(f"FP32 baseline {models['fp32']} could not be evaluated; no reference labels", file=sys.stderr)
+        return None
+
+    # Reference labels: the FP32 checkpoint's detections at the deployed threshold
+    reference = [boxes[boxes[:, 4] > args.conf] for boxes in measured["fp32"][1]]
+    reference_persons = int(sum(len(boxes) for boxes in reference))
+
+    report = {
+        "eval_video": args.eval_video,
+        "eval_frames": len(reference),
+        "reference_persons": reference_persons,
+        "conf_threshold": args.conf,
+        "models": {}
+    }
+    for name, (backend, candidates, latencies, peak_mb) in measured.items():
+        deployed = [boxes[boxes[:, 4] > args.conf] for boxes in candidates]
+        matched = sum(match_count(boxes, labels) for boxes, labels in zip(deployed, reference))
+        detected = sum(len(boxes) for boxes in deployed)
+        report["models"][name] = {
+            "file": models[name],
+            "backend": backend,
+            "size_mb": _size_mb(models[name]),
+            "latency": latency_summary(latencies),
+            "peak_rss_mb": peak_mb,
+            "ap50": average_precision(candidates, reference),
+            "recall": matched / reference_persons if reference_persons else 0.0,
+            "precision": matched / detected if detected else 0.0
+        }
+    return report
+
+
+def _size_mb(model_file: str) -> float:
+    path = Path(model_file)
+    files = [path] + list(path.parent.glob(path.name + ".data")) if path.is_file() else list(path.rglob("*"))
+    return sum(f.stat().st_size for f in files if f.is_file()) / (1024 * 1024)
+
+
+# ============================================================================
+# Main
+# ============================================================================
+
+def main() -> int:
+    default_model = str(TRAINED_MODEL_PATH) if TRAINED_MODEL_PATH.exists() else config.MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Quantize the person model to INT8 and report accuracy/latency")
+    parser.add_argument("--model", default=default_model, help="FP32 PyTorch checkpoint (.pt)")
+    parser.add_argument("--output", help="INT8 model path (default: <model>_int8.onnx)")
+    parser.add_argument("--calibration", nargs="+", default=[config.UPLOAD_FOLDER, "ForBiggerEscapes.mp4"],
+                        help="Videos, images, or directories of them (e.g. dataset/images/train)")
+    parser.add_argument("--calibration-frames", type=int, default=200, help="Number of calibration images")
+    parser.add_argument("--imgsz", type=int, default=640, help="Calibration input size")
+    parser.add_argument("--per-tensor", action="store_true", help="Per-tensor instead of per-channel weights")
+    parser.add_argument("--eval-video", default="ForBiggerEscapes.mp4", help="Held-out clip (second half is used)")
+    parser.add_argument("--eval-frames", type=int, default=50, help="Number of evaluation frames")
+    parser.add_argument("--eval-stride", type=int, default=3, help="Keep every Nth frame of the held-out clip")
+    parser.add_argument("--conf", type=float, default=config.DETECTION_CONFIDENCE, help="Deployed confidence threshold")
+    parser.add_argument("--eval-timeout", type=float, default=1800, help="Seconds allowed per model evaluation")
+    parser.add_argument("--skip-quantize", action="store_true", help="Only evaluate an existing INT8 model")
+    args = parser.parse_args()
+
+    if Path(args.model).suffix != ".pt":
+        print("--model must be a PyTorch checkpoint (.pt)", file=sys.stderr)
+        return 1
+
+    fp32_onnx = resolve_model_path(args.model, "onnx")
+    int8_path = args.output or str(Path(args.model).with_name(Path(args.model).stem + "_int8.onnx"))
+
+    if not args.skip_quantize:
+        images = iter_calibration_images(
+            [source for source in args.calibration if Path(source).exists()],
+            args.calibration_frames,
+            holdout=args.eval_video
+        )
+        quantize(fp32_onnx, int8_path, images, args.imgsz, per_channel=not args.per_tensor)
+        print(f"INT8 model written to {int8_path}")
+
+    report = evaluate({"fp32": args.model, "fp32-onnx": fp32_onnx, "int8-onnx": int8_path}, args)
+    if report is None:
+        return 1
+
+    report_path = Path(int8_path).with_suffix(".report.json")
+    report_path.write_text(json.dumps(report, indent=2))
+
+    print(f"\n{report['eval_frames']} held-out frame(s) from {args.eval_video}, "
+          f"{report['reference_persons']} person(s) found by the FP32 model\n")
+    print_table(
+        ["model", "size MB", "mean ms", "p95 ms", "peak RSS MB", "AP50", "recall", "precision"],
+        [
+            [
+                name,
+                f"{model['size_mb']:.1f}",
+                f"{model['latency']['mean_ms']:.1f}",
+                f"{model['latency']['p95_ms']:.1f}",
+                f"{model['peak_rss_mb']:.0f}",
+                f"{model['ap50']:.3f}",
+                f"{model['recall']:.3f}",
+                f"{model['precision']:.3f}"
+            ]
+            for name, model in report["models"].items()
+        ]
+    )
+    print(f"\nReport saved to {report_path}")
+    print(f"Use it with: MODEL_PATH={int8_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
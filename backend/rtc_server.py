@@ -3,17 +3,24 @@ WebRTC Backend Server for Person Detection
 Receives video from camera/source -> Processes with YOLO -> Streams to frontend
 """
 
+import time
+
+# Process start reference for the startup metrics
+_PROCESS_START = time.perf_counter()
+
 import asyncio
 import json
 import logging
+import math
 import os
-import time
-from typing import Dict, Set, Optional
+from typing import Callable, Dict, List, Set, Optional, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
 from contextlib import asynccontextmanager
 from pathlib import Path
+from urllib.parse import urlparse
 
+import av
 import cv2
 import numpy as np
 from aiortc import (
@@ -22,9 +29,11 @@ from aiortc import (
     VideoStreamTrack,
     RTCConfiguration,
     RTCIceServer,
+    RTCDataChannel,
     MediaStreamTrack
 )
 from aiortc.contrib.media import MediaRelay
+from aiortc.mediastreams import VIDEO_CLOCK_RATE, VIDEO_TIME_BASE, MediaStreamError
 from av import VideoFrame
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -34,9 +43,17 @@ from pydantic import BaseModel
 import uvicorn
 from dotenv import load_dotenv
 
-from person_detector import PersonDetector
+from person_detector import PersonDetector, PersonTracker, MotionGate, RegionOfInterest
+from frame_pipeline import FrameBufferPool, bgr_to_frame, frame_to_bgr
+from video_sources import (
+    LIVE_URL_SCHEMES, LatencyWindow, LiveCapture, PyAVFileReader, ReadAheadReader, stream_url_allowed
+)
+from detection_broadcast import DetectionBroadcaster, encode_message
+from inference import InferenceExecutor, InferenceScheduler
 import config  # Centralized configuration
 
+_IMPORTS_DONE = time.perf_counter()
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -94,7 +111,17 @@ class OfferRequest(BaseModel):
     source: str = "file"  # "camera" or "file"
     video_path: Optional[str] = None  # Path to video file if source is "file"
     camera_id: int = 0  # Camera ID if source is "camera"
+    stream_url: Optional[str] = None  # RTSP/HTTP URL if source is "camera" (instead of camera_id)
+    publisher_id: Optional[str] = None  # Published stream to watch if source is "publisher"
     loop_video: bool = True  # Whether to loop video file
+    roi_polygons: Optional[list] = None  # Normalized [[x, y], ...] polygons limiting detection ([] = whole frame; set by the first viewer)
+    overlay: Optional[bool] = None  # Draw boxes into the video (default: VIDEO_OVERLAY)
+
+class PublishRequest(BaseModel):
+    sdp: str
+    type: str
+    publisher_id: str  # Stream name viewers subscribe to, e.g. "drone-1"
+    roi_polygons: Optional[list] = None  # Normalized [[x, y], ...] polygons limiting detection
 
 class IceServersRequest(BaseModel):
     iceServers: list
@@ -115,35 +142,39 @@ class DetectionData(BaseModel):
 # Video Processing Track
 # ============================================================================
 
+def resolve_video_path(video_path: Optional[str]) -> str:
+    """Find a video file: as given, in the upload folder, or fall back to the default video"""
+    # Use default video if none specified
+    if video_path is None:
+        video_path = config.DEFAULT_VIDEO_PATH
+    
+    if os.path.exists(video_path):
+        return video_path
+    
+    # Try in upload folder
+    alt_path = os.path.join(config.UPLOAD_FOLDER, os.path.basename(video_path))
+    if os.path.exists(alt_path):
+        return alt_path
+    
+    # Try default video
+    default_path = config.DEFAULT_VIDEO_PATH
+    if os.path.exists(default_path):
+        logger.warning(f"Video file not found: {video_path}, using default: {default_path}")
+        return default_path
+    
+    raise FileNotFoundError(f"Video file not found: {video_path}")
+
+
 class VideoFileTrack(VideoStreamTrack):
     """Video track that reads from a video file"""
     
     def __init__(self, video_path: str = None, loop: bool = True):
         super().__init__()
         
-        # Use default video if none specified
-        if video_path is None:
-            video_path = config.DEFAULT_VIDEO_PATH
-        
-        self.video_path = video_path
+        self.video_path = resolve_video_path(video_path)
         self.loop = loop
         self.frame_count = 0
         
-        # Try to find the video file
-        if not os.path.exists(self.video_path):
-            # Try in upload folder
-            alt_path = os.path.join(config.UPLOAD_FOLDER, os.path.basename(self.video_path))
-            if os.path.exists(alt_path):
-                self.video_path = alt_path
-            else:
-                # Try default video
-                default_path = config.DEFAULT_VIDEO_PATH
-                if os.path.exists(default_path):
-                    logger.warning(f"Video file not found: {video_path}, using default: {default_path}")
-                    self.video_path = default_path
-                else:
-                    raise FileNotFoundError(f"Video file not found: {video_path}")
-        
         self.cap = cv2.VideoCapture(self.video_path)
         
         if not self.cap.isOpened():
@@ -158,18 +189,20 @@ class VideoFileTrack(VideoStreamTrack):
         logger.info(f"Video file initialized: {self.video_path}")
         logger.info(f"Video properties: {self.width}x{self.height} @ {self.fps}fps, {self.total_frames} frames")
         
-    async def recv(self):
-        pts, time_base = await self.next_timestamp()
-        
+        # Decode on a background thread; recv() only dequeues decoded frames
+        self.reader = ReadAheadReader(
+            self._read_frame,
+            capacity=config.VIDEO_READAHEAD_FRAMES,
+            name=f"decode-{os.path.basename(self.video_path)}"
+        )
+        # Time recv() waits for a decoded frame (excluding frame pacing)
+        self.recv_latency = LatencyWindow()
+    
+    def _read_frame(self) -> np.ndarray:
+        """Decode the next frame (runs on the read-ahead thread)"""
         ret, frame = self.cap.read()
         
         # Loop the video when it ends
-        if not ret and self.loop:
-            logger.info("Video ended, restarting from beginning")
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.cap.read()
-            self.frame_count = 0
-        
         if not ret:
             logger.info("Video ended, restarting from beginning")
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
@@ -178,84 +211,830 @@ class VideoFileTrack(VideoStreamTrack):
         
         if not ret:
             # If still can't read, create a black frame
-            frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)        
+            frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
         self.frame_count += 1
+        return frame
         
-        # Convert frame to VideoFrame
-        video_frame = VideoFrame.from_ndarray(frame, format="bgr24")
+    async def recv(self):
+        pts, time_base = await self.next_timestamp()
+        
+        start = time.perf_counter()
+        frame = await self.reader.get()
+        self.recv_latency.record((time.perf_counter() - start) * 1000)
+        if frame is None:
+            raise MediaStreamError
+        
+        # Wrap the freshly decoded array without copying it
+        video_frame = VideoFrame.from_numpy_buffer(frame, format="bgr24")
         video_frame.pts = pts
         video_frame.time_base = time_base
         
         return video_frame
     
     def stop(self):
+        super().stop()
+        # Release the capture once the decode thread no longer reads from it
+        self.reader.stop(on_stopped=self._release)
+    
+    def _release(self):
         if self.cap:
             self.cap.release()
             logger.info(f"Video file {self.video_path} released")
+    
+    def get_stats(self) -> dict:
+        """Decoder read-ahead statistics"""
+        return {
+            "decoder": "opencv",
+            "readahead_frames": self.reader.capacity,
+            "buffered_frames": self.reader.buffered,
+            "frames_decoded": self.reader.items_read,
+            "underruns": self.reader.underruns,
+            "recv_latency": self.recv_latency.summary()
+        }
+
+
+class PyAVFileTrack(VideoStreamTrack):
+    """
+    Video track that decodes a file with PyAV straight to VideoFrames
+    
+    Frames stay in the decoder's pixel format (the encoder and raw viewers
+    need no BGR conversion) and are paced by the container's timestamps
+    instead of a fixed frame rate.
+    """
+    
+    # Resynchronize the playback clock if frames fall this far behind (e.g. after an idle pause)
+    MAX_LAG_SECONDS = 0.5
+    
+    def __init__(self, video_path: str = None, loop: bool = True):
+        super().__init__()
+        
+        self.video_path = resolve_video_path(video_path)
+        self.loop = loop
+        
+        try:
+            self.decoder = PyAVFileReader(self.video_path, loop=loop)
+        except av.error.FFmpegError as e:
+            raise RuntimeError(f"Could not open video file: {self.video_path} ({e})")
+        
+        self.fps = self.decoder.fps
+        self.total_frames = self.decoder.total_frames
+        self.width = self.decoder.width
+        self.height = self.decoder.height
+        
+        logger.info(f"Video file initialized (PyAV): {self.video_path}")
+        logger.info(f"Video properties: {self.width}x{self.height} @ {self.fps}fps, {self.total_frames} frames")
+        
+        # Decode on a background thread; recv() only dequeues decoded frames
+        self.reader = ReadAheadReader(
+            self.decoder.read,
+            capacity=config.VIDEO_READAHEAD_FRAMES,
+            name=f"decode-{os.path.basename(self.video_path)}"
+        )
+        self.recv_latency = LatencyWindow()
+        # Wall-clock time at which the frame with pts 0 is due
+        self._clock_start: Optional[float] = None
+    
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        
+        start = time.perf_counter()
+        frame = await self.reader.get()
+        self.recv_latency.record((time.perf_counter() - start) * 1000)
+        if frame is None:
+            raise MediaStreamError
+        
+        # Pace playback by the container timestamps
+        frame_time = float(frame.pts * frame.time_base)
+        now = time.time()
+        if self._clock_start is None or now - (self._clock_start + frame_time) > self.MAX_LAG_SECONDS:
+            self._clock_start = now - frame_time
+        wait = self._clock_start + frame_time - now
+        if wait > 0:
+            await asyncio.sleep(wait)
+        
+        return frame
+    
+    def stop(self):
+        super().stop()
+        # Close the container once the decode thread no longer reads from it
+        self.reader.stop(on_stopped=self._release)
+    
+    def _release(self):
+        self.decoder.close()
+        logger.info(f"Video file {self.video_path} released")
+    
+    def get_stats(self) -> dict:
+        """Decoder read-ahead statistics"""
+        return {
+            "decoder": "pyav",
+            "loops": self.decoder.loops,
+            "readahead_frames": self.reader.capacity,
+            "buffered_frames": self.reader.buffered,
+            "frames_decoded": self.reader.items_read,
+            "underruns": self.reader.underruns,
+            "recv_latency": self.recv_latency.summary()
+        }
+
+
+def create_file_track(video_path: str, loop: bool = True) -> MediaStreamTrack:
+    """Create a file track with the configured decoder (VIDEO_DECODER)"""
+    if config.VIDEO_DECODER == "pyav":
+        return PyAVFileTrack(video_path, loop=loop)
+    return VideoFileTrack(video_path, loop=loop)
+
+
+class LiveVideoTrack(VideoStreamTrack):
+    """
+    Video track that captures from a live source (camera device or stream URL)
+    
+    Capture runs on its own thread into a small drop-oldest buffer, so a
+    slow consumer (inference, an idle pause) never backs up the camera or
+    the network stream: stale frames are discarded and recv() always gets
+    the most recent ones. Timestamps come from the capture clock, and a
+    dropped connection is reopened with backoff while the track stays live.
+    """
+    
+    def __init__(self, source: Union[int, str]):
+        super().__init__()
+        
+        self.source = source
+        self.capture = LiveCapture(
+            source,
+            initial_delay=config.LIVE_RECONNECT_INITIAL_DELAY,
+            max_delay=config.LIVE_RECONNECT_MAX_DELAY
+        )
+        self.reader = ReadAheadReader(
+            self.capture.read,
+            capacity=config.LIVE_BUFFER_FRAMES,
+            name=f"capture-{source}",
+            drop_oldest=True
+        )
+        # Time recv() waits for a frame, and how old a frame is when it is handed on
+        self.recv_latency = LatencyWindow()
+        self.frame_age = LatencyWindow()
+        self._clock_start: Optional[float] = None
+        self._last_pts: Optional[int] = None
+        
+        logger.info(f"Live source initialized: {source}")
+    
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        
+        start = time.perf_counter()
+        item = await self.reader.get()
+        self.recv_latency.record((time.perf_counter() - start) * 1000)
+        if item is None:
+            raise MediaStreamError
+        
+        image, captured_at = item
+        self.frame_age.record((time.time() - captured_at) * 1000)
+        
+        # Timestamps follow the capture clock, so gaps (dropped frames, reconnects) keep real time
+        if self._clock_start is None:
+            self._clock_start = captured_at
+        pts = int((captured_at - self._clock_start) * VIDEO_CLOCK_RATE)
+        if self._last_pts is not None and pts <= self._last_pts:
+            pts = self._last_pts + 1
+        self._last_pts = pts
+        
+        # Each captured array is new, so it is wrapped without copying
+        video_frame = VideoFrame.from_numpy_buffer(image, format="bgr24")
+        video_frame.pts = pts
+        video_frame.time_base = VIDEO_TIME_BASE
+        
+        return video_frame
+    
+    def stop(self):
+        super().stop()
+        # Unblock a reconnect backoff, then stop the capture thread (without
+        # waiting: a read in progress releases the capture when it returns)
+        self.capture.close()
+        self.reader.stop()
+        logger.info(f"Live source {self.source} released")
+    
+    def get_stats(self) -> dict:
+        """Capture, reconnect and buffering statistics"""
+        return {
+            "decoder": "live",
+            **self.capture.get_stats(),
+            "buffer_frames": self.reader.capacity,
+            "buffered_frames": self.reader.buffered,
+            "frames_dropped": self.reader.dropped,
+            "underruns": self.reader.underruns,
+            "recv_latency": self.recv_latency.summary(),
+            "frame_age": self.frame_age.summary()
+        }
+
+
+def check_stream_url(url: str):
+    """
+    Make sure the server may open a client-supplied stream URL
+
+    FFmpeg opens the URL server-side, so it must be a network stream
+    matching one of the configured LIVE_ALLOWED_SOURCES patterns.
+
+    Raises:
+        HTTPException: 400 for a malformed or non-network URL, 403 if it is not allowed
+    """
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        parsed = None
+    if parsed is None or parsed.scheme.lower() not in LIVE_URL_SCHEMES or not parsed.hostname:
+        raise HTTPException(
+            status_code=400,
+            detail=f"stream_url must be a {'/'.join(LIVE_URL_SCHEMES)} URL with a host"
+        )
+    if not any(stream_url_allowed(url, pattern) for pattern in config.LIVE_ALLOWED_SOURCES):
+        raise HTTPException(status_code=403, detail="stream_url is not in LIVE_ALLOWED_SOURCES")
+
+
+def live_source_key(offer_request: OfferRequest) -> Tuple[str, Union[int, str]]:
+    """Shared-source key and capture source for a camera offer (stream URL or device index)"""
+    if offer_request.stream_url:
+        check_stream_url(offer_request.stream_url)
+        return offer_request.stream_url, offer_request.stream_url
+    return f"camera:{offer_request.camera_id}", offer_request.camera_id
+
+
+# Label of the client-created data channel that receives per-frame detections
+DETECTION_CHANNEL_LABEL = "detections"
 
 
 class ProcessedVideoTrack(VideoStreamTrack):
     """Video track that processes incoming video with person detection"""
     
-    def __init__(self, track: MediaStreamTrack, detector: PersonDetector, client_id: str):
+    # Smoothing factor for the latency and frame-interval moving averages
+    EMA_ALPHA = 0.2
+    
+    def __init__(
+        self,
+        track: MediaStreamTrack,
+        detector: PersonDetector,
+        client_id: str,
+        scheduler: Optional[InferenceScheduler] = None,
+        detection_interval: int = 1,
+        adaptive_cadence: bool = False,
+        max_detection_interval: int = 10,
+        decoupled: bool = False,
+        tracker: Optional[PersonTracker] = None,
+        motion_gate: Optional[MotionGate] = None,
+        roi: Optional[RegionOfInterest] = None,
+        exclusive_source: bool = False,
+        overlay: bool = True
+    ):
         super().__init__()
         self.track = track
         self.detector = detector
         self.client_id = client_id
+        self.scheduler = scheduler
         self.frame_count = 0
         self.last_detection_data = None
+        # Processing time of the first frame (cold path: first inference)
+        self.first_frame_ms: Optional[float] = None
+        
+        # Detection cadence: run inference every N frames and reuse the last
+        # boxes in between; adaptive mode derives N from inference latency
+        self.detection_interval = max(1, detection_interval)
+        self.adaptive_cadence = adaptive_cadence
+        self.max_detection_interval = max(self.detection_interval, max_detection_interval)
+        self.frames_since_detection = 0
+        # Until the first detection runs, every frame is due (the motion gate may still skip it)
+        self.has_detected = False
+        self.detections_skipped = 0
+        self.last_positions: list = []
+        self.detection_count = 0
+        self.inference_latency_ms: Optional[float] = None
+        self.frame_interval_ms: Optional[float] = None
+        self._last_frame_time: Optional[float] = None
+        
+        # Decoupled mode: recv() never waits for inference; a background task
+        # detects on the newest frame only and stale frames are dropped
+        self.decoupled = decoupled
+        self.frames_dropped = 0
+        self._latest_frame: Optional[tuple] = None
+        self._frame_ready = asyncio.Event()
+        self._detection_task: Optional[asyncio.Task] = None
+        
+        # Optional tracker: persistent person ids, and predicted boxes on
+        # frames without a fresh detection
+        self.tracker = tracker
+        
+        # Optional motion gate (skip inference on static frames) and region
+        # of interest (only spend inference where people can appear)
+        self.motion_gate = motion_gate
+        self.roi = None
+        self.set_roi(roi)
+        
+        # Zero-copy frame path: overlays are drawn in place on frames this track
+        # owns (converted frames, or every frame when it is the source's only
+        # reader); shared frames are copied into pooled buffers first
+        self.exclusive_source = exclusive_source
+        self.buffer_pool = FrameBufferPool()
+        self.frames_copied = 0
+        
+        # Overlay-free mode forwards source frames untouched; clients draw the
+        # boxes from per-frame metadata keyed by the frame's pts instead
+        self.overlay = overlay
+        self.frame_listeners: List[Callable[[str], None]] = []
+    
+    def set_roi(self, roi: Optional[RegionOfInterest]):
+        """Restrict detection for this stream to a region (None for the full frame)"""
+        self.roi = roi
+        if self.motion_gate:
+            self.motion_gate.roi = roi
+            self.motion_gate.reset()
+        if roi:
+            logger.info(f"[{self.client_id}] Detection restricted to {len(roi.polygons)} ROI polygon(s)")
+    
+    def _update_frame_interval(self, frame: VideoFrame):
+        """Track the source frame interval from presentation timestamps"""
+        if frame.pts is None or frame.time_base is None:
+            return
+        frame_time = float(frame.pts * frame.time_base)
+        if self._last_frame_time is not None and frame_time > self._last_frame_time:
+            interval_ms = (frame_time - self._last_frame_time) * 1000
+            if self.frame_interval_ms is None:
+                self.frame_interval_ms = interval_ms
+            else:
+                self.frame_interval_ms += self.EMA_ALPHA * (interval_ms - self.frame_interval_ms)
+        self._last_frame_time = frame_time
+    
+    def _record_inference_latency(self, latency_ms: float):
+        if self.inference_latency_ms is None:
+            self.inference_latency_ms = latency_ms
+        else:
+            self.inference_latency_ms += self.EMA_ALPHA * (latency_ms - self.inference_latency_ms)
+    
+    def current_detection_interval(self) -> int:
+        """Number of frames between detections at the current cadence"""
+        if not self.adaptive_cadence or self.inference_latency_ms is None:
+            return self.detection_interval
+        
+        # Detect as often as the frame budget allows
+        frame_budget_ms = self.frame_interval_ms or 1000 / 30
+        interval = math.ceil(self.inference_latency_ms / frame_budget_ms)
+        return min(max(interval, self.detection_interval), self.max_detection_interval)
+    
+    def _should_detect(self) -> bool:
+        return (
+            not self.has_detected
+            or self.frames_since_detection + 1 >= self.current_detection_interval()
+        )
+    
+    def _has_motion(self, img: np.ndarray) -> bool:
+        return self.motion_gate is None or self.motion_gate.should_detect(img)
+    
+    def _can_detect(self) -> bool:
+        # Inference only ever runs on the scheduler's executor, never on the event loop
+        return self.scheduler is not None and self.scheduler.is_running
+    
+    async def _detect(self, img: np.ndarray) -> list:
+        """Run detection on the inference executor, batched with other tracks"""
+        roi = self.roi
+        frame_shape = img.shape
+        if roi:
+            img, offset = roi.crop(img)
+        
+        person_positions = await self.scheduler.submit(img)
+        
+        if roi:
+            person_positions = roi.restore(person_positions, offset, frame_shape)
+        return person_positions
+    
+    async def _run_detection(self, img: np.ndarray, frame_number: int, pts: Optional[int] = None):
+        """Detect persons in a frame and publish the result as the latest detection"""
+        if not self._can_detect():
+            # No scheduler (or it stopped during shutdown): skip this frame's detection
+            self.frames_since_detection += 1
+            self.detections_skipped += 1
+            return
+        
+        start = time.perf_counter()
+        person_positions = await self._detect(img)
+        self._record_inference_latency((time.perf_counter() - start) * 1000)
+        
+        if self.tracker:
+            person_positions = self.tracker.update(person_positions, img.shape, frame_number)
+        
+        self.frames_since_detection = 0
+        self.has_detected = True
+        self.detection_count += 1
+        self.last_positions = person_positions
+        
+        detection_summary = self.detector.get_detection_summary(person_positions)
+        detection_summary['frame_number'] = frame_number
+        detection_summary['pts'] = pts
+        detection_summary['client_id'] = self.client_id
+        self.last_detection_data = detection_summary
+        
+        if self.detection_count % 30 == 0:
+            logger.info(
+                f"[{self.client_id}] Frame {frame_number}: "
+                f"{detection_summary['total_persons']} persons detected "
+                f"(every {self.current_detection_interval()} frame(s))"
+            )
+    
+    def _offer_latest_frame(self, img: np.ndarray, pts: Optional[int]):
+        """Hand the newest frame to the background detector, replacing any stale one"""
+        if self._latest_frame is not None:
+            self.frames_dropped += 1
+        self._latest_frame = (img, self.frame_count, pts)
+        self._frame_ready.set()
+        
+        if self._detection_task is None or self._detection_task.done():
+            self._detection_task = asyncio.create_task(self._detection_loop())
+    
+    def _positions_between_detections(self) -> list:
+        """Boxes for a frame without its own detection: predicted if tracking, else the last ones"""
+        if self.tracker:
+            return self.tracker.predict(self.frame_count)
+        return self.last_positions
+    
+    async def _detection_loop(self):
+        """Background detection on the latest frame only"""
+        while True:
+            try:
+                await self._frame_ready.wait()
+                self._frame_ready.clear()
+                
+                latest, self._latest_frame = self._latest_frame, None
+                if latest is None:
+                    continue
+                
+                await self._run_detection(*latest)
+                
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in background detection for {self.client_id}: {e}")
+                await asyncio.sleep(0.1)
         
     async def recv(self):
+        _, new_frame = await self.next_frames(overlay=self.overlay)
+        return new_frame
+    
+    async def next_frames(self, overlay: bool = True, keep_raw: bool = False) -> Tuple[VideoFrame, VideoFrame]:
+        """
+        Run detection on the next source frame
+        
+        Args:
+            overlay: Draw the boxes into the output frame
+            keep_raw: Leave the source frame's pixels untouched so it can be
+                streamed as well (forces a copy before drawing)
+            
+        Returns:
+            Tuple of (source frame, output frame); the output frame is the
+            source frame itself when nothing is drawn
+        """
         try:
             frame = await self.track.recv()
-            img = frame.to_ndarray(format="bgr24")
+            received_at = time.perf_counter()
+            img, owned = frame_to_bgr(frame)
+            owned = owned or (self.exclusive_source and not keep_raw)
+            self.frame_count += 1
+            self._update_frame_interval(frame)
             
             # Only process detection if detector is available
-            if self.detector and self.detector.model:
-                # Process frame with person detection
-                annotated_img, detection_summary = self.detector.process_video_frame(img)
+            if self.detector and self.detector.available:
+                if self.decoupled:
+                    # Return promptly with the most recent overlay available
+                    if self._has_motion(img):
+                        self._offer_latest_frame(img, frame.pts)
+                        # The background detector still reads this frame
+                        owned = False
+                    person_positions = self._positions_between_detections()
+                elif self._should_detect() and self._has_motion(img):
+                    await self._run_detection(img, self.frame_count, frame.pts)
+                    person_positions = self.last_positions
+                else:
+                    # Reuse or extrapolate the last boxes on frames between detections
+                    self.frames_since_detection += 1
+                    person_positions = self._positions_between_detections()
                 
-                self.frame_count += 1
-                detection_summary['frame_number'] = self.frame_count
-                detection_summary['client_id'] = self.client_id
-                self.last_detection_data = detection_summary
+                if self.frame_listeners:
+                    self._publish_frame_detections(frame, person_positions)
                 
-                if self.frame_count % 30 == 0:
-                    logger.info(
-                        f"[{self.client_id}] Frame {self.frame_count}: "
-                        f"{detection_summary['total_persons']} persons detected"
-                    )
+                if overlay:
+                    new_frame = self._overlay(frame, img, owned, person_positions)
+                else:
+                    new_frame = frame
             else:
                 # If no detector, just pass through the frame
-                annotated_img = img
+                new_frame = frame
                 logger.warning(f"Detector not available for client {self.client_id}")
             
-            # Create new video frame
-            new_frame = VideoFrame.from_ndarray(annotated_img, format="bgr24")
-            new_frame.pts = frame.pts
-            new_frame.time_base = frame.time_base
+            if self.first_frame_ms is None:
+                self.first_frame_ms = (time.perf_counter() - received_at) * 1000
+                logger.info(f"[{self.client_id}] First frame processed in {self.first_frame_ms:.0f} ms")
             
-            return new_frame
+            return frame, new_frame
             
         except Exception as e:
             logger.error(f"Error processing frame for {self.client_id}: {e}")
             # Return the original frame on error
-            return await self.track.recv()
+            frame = await self.track.recv()
+            return frame, frame
+    
+    def _overlay(self, frame: VideoFrame, img: np.ndarray, owned: bool, person_positions: list) -> VideoFrame:
+        """Draw the boxes into an output frame, copying pixels only when the source is shared"""
+        if not person_positions:
+            # Nothing to draw: forward the source frame in its native format
+            return frame
+        
+        if not owned:
+            img = self.buffer_pool.copy(img)
+            self.frames_copied += 1
+        annotated_img = self.detector.annotate_frame(img, person_positions, in_place=True)
+        return bgr_to_frame(annotated_img, frame)
+    
+    def add_frame_listener(self, listener: Callable[[str], None]):
+        """Receive every frame's boxes as a JSON message (serialized once for all listeners)"""
+        self.frame_listeners.append(listener)
+    
+    def remove_frame_listener(self, listener: Callable[[str], None]):
+        if listener in self.frame_listeners:
+            self.frame_listeners.remove(listener)
+    
+    def _publish_frame_detections(self, frame: VideoFrame, person_positions: list):
+        """Send the boxes shown on this frame, keyed by its pts, to the frame listeners"""
+        message = json.dumps({
+            "type": "frame_detections",
+            # Shared tracks are named after their source key, not a viewer
+            "stream": self.client_id,
+            "frame_number": self.frame_count,
+            "pts": frame.pts,
+            "time_base": str(frame.time_base) if frame.time_base is not None else None,
+            "width": frame.width,
+            "height": frame.height,
+            "positions": person_positions
+        })
+        for listener in list(self.frame_listeners):
+            try:
+                listener(message)
+            except Exception as e:
+                logger.error(f"[{self.client_id}] Error sending frame detections: {e}")
+    
+    def stop(self):
+        if self._detection_task:
+            self._detection_task.cancel()
+            self._detection_task = None
+        super().stop()
+    
+    def get_cadence_stats(self) -> dict:
+        """Get detection cadence statistics"""
+        return {
+            "decoupled": self.decoupled,
+            "frames_dropped": self.frames_dropped,
+            "adaptive": self.adaptive_cadence,
+            "detection_interval": self.current_detection_interval(),
+            "frames": self.frame_count,
+            "first_frame_ms": self.first_frame_ms,
+            "frames_copied": self.frames_copied,
+            "frame_listeners": len(self.frame_listeners),
+            "detections": self.detection_count,
+            "detections_skipped": self.detections_skipped,
+            "inference_latency_ms": self.inference_latency_ms,
+            "frame_interval_ms": self.frame_interval_ms,
+            "tracked_persons": self.tracker.track_count if self.tracker else None,
+            "motion_skipped_frames": self.motion_gate.frames_skipped if self.motion_gate else None,
+            "roi_polygons": self.roi.to_list() if self.roi else None
+        }
     
     def get_detection_data(self) -> Optional[dict]:
         return self.last_detection_data
 
 
+def create_processed_track(
+    track: MediaStreamTrack,
+    detector: PersonDetector,
+    client_id: str,
+    scheduler: Optional[InferenceScheduler] = None,
+    exclusive_source: bool = False
+) -> ProcessedVideoTrack:
+    """Create a ProcessedVideoTrack with the configured detection cadence"""
+    return ProcessedVideoTrack(
+        track,
+        detector,
+        client_id,
+        scheduler,
+        detection_interval=config.DETECTION_INTERVAL,
+        adaptive_cadence=config.DETECTION_ADAPTIVE,
+        max_detection_interval=config.DETECTION_MAX_INTERVAL,
+        decoupled=config.DETECTION_DECOUPLED,
+        tracker=PersonTracker(
+            iou_threshold=config.TRACKING_IOU_THRESHOLD,
+            max_age=config.TRACKING_MAX_AGE
+        ) if config.TRACKING_ENABLED else None,
+        motion_gate=MotionGate(
+            pixel_threshold=config.MOTION_PIXEL_THRESHOLD,
+            min_changed_fraction=config.MOTION_MIN_CHANGED_FRACTION,
+            max_skipped_frames=config.MOTION_MAX_SKIPPED_FRAMES
+        ) if config.MOTION_GATING_ENABLED else None,
+        exclusive_source=exclusive_source
+    )
+
+
+# ============================================================================
+# Shared Sources
+# ============================================================================
+
+class SourceOutputTrack(VideoStreamTrack):
+    """One rendering of a shared source (raw or with overlay), fanned out through MediaRelay"""
+    
+    def __init__(self, source: "SharedSource", overlay: bool):
+        super().__init__()
+        self.source = source
+        self.overlay = overlay
+        # Sequence number of the last source frame this output delivered
+        self.sequence = 0
+    
+    async def recv(self):
+        if self.readyState != "live":
+            # Ends the relay's reader task once the source is stopped
+            raise MediaStreamError
+        return await self.source.next_frame(self)
+
+
+class SharedSource:
+    """
+    A video source that is decoded and detected exactly once for all viewers
+    
+    Whichever output (raw or overlay) needs a new frame first pulls it through
+    the single ProcessedVideoTrack; the other output gets the same frame.
+    Viewers subscribe to an output through MediaRelay and share the track's
+    detection metadata, so per-source work does not grow with viewers.
+    
+    A pushed source (a track a publisher sends in) cannot be paused: while
+    nobody watches it, a drain task keeps reading and detecting so incoming
+    frames do not queue up and detections stay current.
+    """
+    
+    def __init__(
+        self,
+        key: str,
+        source_track: MediaStreamTrack,
+        processed_track: Optional[ProcessedVideoTrack],
+        relay: MediaRelay,
+        pushed: bool = False
+    ):
+        self.key = key
+        self.source_track = source_track
+        self.processed_track = processed_track
+        self.relay = relay
+        self.pushed = pushed
+        self.outputs = {overlay: SourceOutputTrack(self, overlay) for overlay in (True, False)}
+        # Client id -> whether that viewer gets the overlay
+        self.viewers: Dict[str, bool] = {}
+        self.created_at = time.time()
+        # When the last viewer left (None while watched); a new source is idle until subscribed
+        self.idle_since: Optional[float] = self.created_at
+        self.frames = 0
+        self._frames: Optional[Tuple[VideoFrame, VideoFrame]] = None
+        # The raw output has a relay reader, which MediaRelay keeps after its
+        # viewers leave: from then on boxes are never drawn on source frames
+        self._raw_relayed = False
+        # The current raw frame's pixels were not drawn on
+        self._raw_intact = True
+        self._lock = asyncio.Lock()
+        # MediaRelay keeps reading a track after its viewers leave, so reads
+        # block here while the source is idle instead of decoding for nobody
+        self._watched = asyncio.Event()
+        self._unwatched = asyncio.Event()
+        self._unwatched.set()
+        self._stopped = False
+        self._drain_task = asyncio.create_task(self._drain()) if pushed else None
+    
+    def roi_matches(self, roi: Optional[RegionOfInterest]) -> bool:
+        """Whether a region of interest is the one this source detects in (None: whole frame)"""
+        current = self.processed_track.roi if self.processed_track else None
+        return (roi.to_list() if roi else None) == (current.to_list() if current else None)
+    
+    def viewer_count(self, overlay: Optional[bool] = None) -> int:
+        """Number of viewers, optionally only those with (or without) the overlay"""
+        if overlay is None:
+            return len(self.viewers)
+        return sum(1 for wants_overlay in self.viewers.values() if wants_overlay == overlay)
+    
+    def subscribe(self, client_id: str, overlay: bool) -> MediaStreamTrack:
+        """Add a viewer and get its relayed video track"""
+        self.viewers[client_id] = overlay
+        if not overlay:
+            self._raw_relayed = True
+        self.idle_since = None
+        self._watched.set()
+        self._unwatched.clear()
+        return self.relay.subscribe(self.outputs[overlay])
+    
+    def unsubscribe(self, client_id: str) -> int:
+        """Remove a viewer; returns the number of viewers left"""
+        self.viewers.pop(client_id, None)
+        if not self.viewers and self.idle_since is None:
+            self.idle_since = time.time()
+            self._watched.clear()
+            self._unwatched.set()
+        return len(self.viewers)
+    
+    def idle_seconds(self) -> float:
+        """Seconds since the last viewer left (0 while watched)"""
+        return time.time() - self.idle_since if self.idle_since is not None else 0.0
+    
+    async def next_frame(self, output: SourceOutputTrack) -> VideoFrame:
+        """Frame for an output: the current one if it has not seen it yet, else the next"""
+        await self._watched.wait()
+        if self._stopped:
+            raise MediaStreamError
+        
+        if self._needs_frame(output):
+            async with self._lock:
+                # Another output may have advanced while this one waited
+                if self._needs_frame(output):
+                    await self._advance()
+        
+        output.sequence = self.frames
+        raw_frame, overlay_frame = self._frames
+        return overlay_frame if output.overlay else raw_frame
+    
+    def _needs_frame(self, output: SourceOutputTrack) -> bool:
+        """Whether an output has seen the current frame (or, raw, cannot be given it)"""
+        # A raw output subscribed after boxes were drawn on the current frame skips it
+        return output.sequence == self.frames or (not output.overlay and not self._raw_intact)
+    
+    async def _advance(self):
+        if self.processed_track:
+            keep_raw = self._raw_relayed
+            self._frames = await self.processed_track.next_frames(
+                overlay=self.viewer_count(overlay=True) > 0,
+                keep_raw=keep_raw
+            )
+            self._raw_intact = keep_raw or self._frames[0] is self._frames[1]
+        else:
+            frame = await self.source_track.recv()
+            self._frames = (frame, frame)
+        self.frames += 1
+    
+    async def _drain(self):
+        """Read a pushed source while it has no viewers"""
+        try:
+            while not self._stopped:
+                if self.viewers:
+                    await self._unwatched.wait()
+                    continue
+                async with self._lock:
+                    if not self.viewers and not self._stopped:
+                        await self._advance()
+        except MediaStreamError:
+            logger.info(f"Pushed source ended: {self.key}")
+    
+    def stop(self):
+        """Release the outputs, the processed track and the decoder"""
+        self._stopped = True
+        if self._drain_task:
+            self._drain_task.cancel()
+        # Wake paused readers so they see the stop
+        self._watched.set()
+        for output in self.outputs.values():
+            output.stop()
+        if self.processed_track:
+            self.processed_track.stop()
+        self.source_track.stop()
+    
+    def get_stats(self) -> dict:
+        return {
+            "source": self.key,
+            "pushed": self.pushed,
+            "viewers": self.viewer_count(),
+            "overlay_viewers": self.viewer_count(overlay=True),
+            "raw_viewers": self.viewer_count(overlay=False),
+            "frames": self.frames,
+            "detections": self.processed_track.detection_count if self.processed_track else 0,
+            "created_at": self.created_at,
+            "open_seconds": time.time() - self.created_at,
+            "idle_seconds": self.idle_seconds(),
+            "decoder": self.source_track.get_stats() if hasattr(self.source_track, "get_stats") else None
+        }
+
+
 # ============================================================================
 # Connection Management
 # ============================================================================
 
+def published_source_key(publisher_id: Optional[str]) -> str:
+    """Shared-source key of a publisher's stream"""
+    return f"publish:{publisher_id}"
+
+
 @dataclass
 class ClientConnection:
     client_id: str
     peer_connection: RTCPeerConnection
+    source: Optional[SharedSource] = None
     processed_track: Optional[ProcessedVideoTrack] = None
     websocket: Optional[WebSocket] = None
+    # Per-frame detections over the client's "detections" data channel
+    frame_listener: Optional[Callable[[str], None]] = None
     created_at: float = None
     
     def __post_init__(self):
@@ -263,40 +1042,94 @@ class ClientConnection:
             self.created_at = time.time()
 
 
+def attach_detection_channel(client: ClientConnection, channel: RTCDataChannel):
+    """
+    Send per-frame detections over a peer's "detections" data channel
+    
+    Clients that draw their own overlay (and publishers that want their
+    detections back) open this channel and receive the boxes of every frame,
+    keyed by pts.
+    """
+    if channel.label != DETECTION_CHANNEL_LABEL or not client.processed_track:
+        return
+    
+    def send_frame_detections(message: str):
+        if channel.readyState == "open":
+            channel.send(message)
+    
+    # A peer that opens the channel again replaces its previous listener
+    if client.frame_listener:
+        client.processed_track.remove_frame_listener(client.frame_listener)
+    client.frame_listener = send_frame_detections
+    client.processed_track.add_frame_listener(send_frame_detections)
+    logger.info(f"[{client.client_id}] Sending frame detections over data channel")
+
+
 class ConnectionManager:
     def __init__(self):
         self.clients: Dict[str, ClientConnection] = {}
         self.websockets: Set[WebSocket] = set()
         self.media_relay = MediaRelay()
         
-        # Shared video source - only one instance per video file
-        self.shared_video_tracks: Dict[str, VideoFileTrack] = {}
-        self.shared_processed_tracks: Dict[str, ProcessedVideoTrack] = {}
+        # Shared video sources - only one decoder and detector per video file
+        self.sources: Dict[str, SharedSource] = {}
+        self.sources_opened = 0
+        self.sources_evicted = 0
         
-    def get_or_create_shared_track(self, video_path: str, detector: Optional[PersonDetector] = None) -> tuple[VideoFileTrack, ProcessedVideoTrack]:
-        """Get or create shared video track for a specific video path"""
+        # Peers pushing video in (e.g. drones), by publisher id
+        self.publishers: Dict[str, ClientConnection] = {}
         
-        # Create unique key for this video path + detector combination
-        track_key = video_path
+        # Per-WebSocket sent state for change-detected, delta-encoded updates
+        self.broadcaster = DetectionBroadcaster(
+            min_interval=config.BROADCAST_INTERVAL,
+            max_interval=config.BROADCAST_MAX_INTERVAL,
+            delta=config.BROADCAST_DELTA,
+            keyframe_interval=config.BROADCAST_KEYFRAME_INTERVAL,
+            position_tolerance=config.BROADCAST_POSITION_TOLERANCE,
+            max_queue=config.BROADCAST_QUEUE_SIZE,
+            slow_policy=config.BROADCAST_SLOW_POLICY,
+            send_timeout=config.BROADCAST_SEND_TIMEOUT,
+            on_close=self._close_slow_websocket
+        )
         
-        # Check if we already have a shared track for this video
-        if track_key in self.shared_video_tracks:
-            shared_video_track = self.shared_video_tracks[track_key]
-            shared_processed_track = self.shared_processed_tracks.get(track_key)
-            return shared_video_track, shared_processed_track
+    def get_or_create_source(
+        self,
+        key: str,
+        open_track: Callable[[], MediaStreamTrack],
+        detector: Optional[PersonDetector] = None,
+        scheduler: Optional[InferenceScheduler] = None,
+        pushed: bool = False
+    ) -> SharedSource:
+        """
+        Get or create the shared source for a video file, live or published source
         
-        # Create new shared track
-        logger.info(f"Creating new shared video track for: {video_path}")
-        shared_video_track = VideoFileTrack(video_path, loop=True)
-        self.shared_video_tracks[track_key] = shared_video_track
+        Args:
+            key: Source identity (video path, "camera:<id>", stream URL or "publish:<id>")
+            open_track: Creates the source track if no source exists for key
+            detector: Person detector (no detection if unavailable)
+            scheduler: Inference scheduler shared by all sources
+            pushed: The track is pushed by a publisher and cannot be paused
+        """
+        source = self.sources.get(key)
+        if source:
+            return source
+        
+        logger.info(f"Creating new shared source for: {key}")
+        video_track = open_track()
         
         # Create processed track if detector is available
-        shared_processed_track = None
-        if detector and detector.model:
-            shared_processed_track = ProcessedVideoTrack(shared_video_track, detector, "shared")
-            self.shared_processed_tracks[track_key] = shared_processed_track
+        processed_track = None
+        if detector and detector.available:
+            # The processed track is the source track's only reader, so it may draw on its
+            # frames, as long as no raw viewer gets them (see SharedSource)
+            processed_track = create_processed_track(
+                video_track, detector, key, scheduler, exclusive_source=True
+            )
         
-        return shared_video_track, shared_processed_track
+        source = SharedSource(key, video_track, processed_track, self.media_relay, pushed=pushed)
+        self.sources[key] = source
+        self.sources_opened += 1
+        return source
         
     def add_client(self, client_id: str, pc: RTCPeerConnection) -> ClientConnection:
         client = ClientConnection(client_id=client_id, peer_connection=pc)
@@ -307,9 +1140,43 @@ class ConnectionManager:
     def get_client(self, client_id: str) -> Optional[ClientConnection]:
         return self.clients.get(client_id)
     
+    def add_publisher(self, publisher_id: str, pc: RTCPeerConnection) -> ClientConnection:
+        publisher = ClientConnection(client_id=publisher_id, peer_connection=pc)
+        self.publishers[publisher_id] = publisher
+        logger.info(f"Publisher added: {publisher_id}")
+        return publisher
+    
+    async def remove_publisher(self, publisher_id: str):
+        """Close a publisher and stop its source, ending the video of its viewers"""
+        publisher = self.publishers.pop(publisher_id, None)
+        if not publisher:
+            return
+        if publisher.processed_track and publisher.frame_listener:
+            publisher.processed_track.remove_frame_listener(publisher.frame_listener)
+        if publisher.source:
+            # Its viewers stay connected until they leave, but their detections
+            # end with the stream instead of being broadcast as stale boxes
+            for client in self.clients.values():
+                if client.source is publisher.source:
+                    self._detach_detections(client)
+            self.sources.pop(publisher.source.key, None)
+            publisher.source.stop()
+        await publisher.peer_connection.close()
+        logger.info(f"Publisher removed: {publisher_id}")
+    
+    @staticmethod
+    def _detach_detections(client: ClientConnection):
+        if client.processed_track and client.frame_listener:
+            client.processed_track.remove_frame_listener(client.frame_listener)
+        client.frame_listener = None
+        client.processed_track = None
+    
     async def remove_client(self, client_id: str):
         client = self.clients.pop(client_id, None)
         if client:
+            self._detach_detections(client)
+            if client.source:
+                client.source.unsubscribe(client_id)
             await client.peer_connection.close()
             logger.info(f"Client removed: {client_id}")
             
@@ -317,49 +1184,97 @@ class ConnectionManager:
         self._cleanup_unused_shared_tracks()
     
     def _cleanup_unused_shared_tracks(self):
-        """Remove shared tracks that are no longer being used"""
-        # This is a simple cleanup - in production you might want more sophisticated tracking
-        pass
+        """Stop shared sources whose last viewer left more than SOURCE_IDLE_TIMEOUT ago"""
+        self.evict_idle_sources(config.SOURCE_IDLE_TIMEOUT)
+    
+    def evict_idle_sources(self, idle_timeout: float) -> int:
+        """
+        Stop shared sources that have had no viewers for idle_timeout seconds
+        
+        Stopping a source releases its capture, its processed track (tracker,
+        background detection task, frame buffers) and its relay outputs.
+        
+        Returns:
+            Number of sources evicted
+        """
+        evicted = 0
+        for key, source in list(self.sources.items()):
+            # Published sources live as long as their publisher
+            if source.pushed:
+                continue
+            if source.viewer_count() == 0 and source.idle_seconds() >= idle_timeout:
+                del self.sources[key]
+                source.stop()
+                evicted += 1
+                logger.info(f"Shared source released after {source.idle_seconds():.0f}s idle: {key}")
+        self.sources_evicted += evicted
+        return evicted
     
     def get_shared_track_info(self) -> dict:
         """Get information about shared tracks"""
         return {
-            "shared_video_tracks": len(self.shared_video_tracks),
-            "shared_processed_tracks": len(self.shared_processed_tracks),
-            "active_clients": len(self.clients)
+            "shared_video_tracks": len(self.sources),
+            "shared_processed_tracks": sum(1 for source in self.sources.values() if source.processed_track),
+            "active_clients": len(self.clients),
+            "idle_sources": sum(1 for source in self.sources.values() if source.viewer_count() == 0),
+            "sources_opened": self.sources_opened,
+            "sources_evicted": self.sources_evicted,
+            "idle_timeout": config.SOURCE_IDLE_TIMEOUT,
+            "publishers": list(self.publishers),
+            "sources": [source.get_stats() for source in self.sources.values()]
         }
     
     async def add_websocket(self, websocket: WebSocket):
         await websocket.accept()
         self.websockets.add(websocket)
+        self.broadcaster.add(websocket)
         logger.info(f"WebSocket connected. Total: {len(self.websockets)}")
     
     def remove_websocket(self, websocket: WebSocket):
+        if websocket not in self.websockets:
+            return
         self.websockets.discard(websocket)
+        self.broadcaster.remove(websocket)
         logger.info(f"WebSocket disconnected. Total: {len(self.websockets)}")
     
-    async def broadcast_detection_data(self, client_id: str, data: dict):
-        """Broadcast detection data to all connected WebSockets"""
-        if not data:
-            return
-            
-        message = {
-            "type": "detection_update",
-            "client_id": client_id,
-            "data": data,
-            "timestamp": time.time()
-        }
+    def send_control(self, websocket: WebSocket, message: dict):
+        """
+        Queue a control reply (pong, acks, errors) ahead of detection updates
         
-        disconnected = set()
-        for ws in self.websockets:
+        The socket's sender task is its only writer, so replies never
+        interleave with a broadcast send and are bound by its send timeout.
+        """
+        subscriber = self.broadcaster.subscribers.get(websocket)
+        if subscriber:
+            subscriber.sender.enqueue(encode_message(message), priority=True)
+    
+    def _close_slow_websocket(self, websocket: WebSocket, reason: str):
+        """Drop a WebSocket that could not keep up (full queue or stalled send)"""
+        self.remove_websocket(websocket)
+        
+        async def close():
             try:
-                await ws.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting: {e}")
-                disconnected.add(ws)
+                await websocket.close(code=1013, reason="Too slow")
+            except Exception:
+                pass
         
-        for ws in disconnected:
-            self.remove_websocket(ws)
+        asyncio.create_task(close())
+    
+    def latest_detections(self) -> Dict[str, dict]:
+        """Latest detection summary of each viewer and each published stream, by stream id"""
+        streams = {}
+        for stream_id, client in [*self.clients.items(), *self.publishers.items()]:
+            if client.processed_track:
+                detection_data = client.processed_track.get_detection_data()
+                if detection_data:
+                    streams[stream_id] = detection_data
+        return streams
+    
+    async def broadcast_detections(self):
+        """Queue new detections for all WebSockets (skipping unchanged streams, as deltas)"""
+        if not self.websockets:
+            return
+        await self.broadcaster.broadcast(self.latest_detections())
 
 
 # ============================================================================
@@ -367,8 +1282,17 @@ class ConnectionManager:
 # ============================================================================
 
 detector: Optional[PersonDetector] = None
+inference_executor: Optional[InferenceExecutor] = None
+inference_scheduler: Optional[InferenceScheduler] = None
 connection_manager: Optional[ConnectionManager] = None
 broadcast_task: Optional[asyncio.Task] = None
+eviction_task: Optional[asyncio.Task] = None
+
+# Cold-start timing in milliseconds since process start (see /health)
+startup_metrics: Dict[str, Optional[float]] = {
+    "imports_ms": (_IMPORTS_DONE - _PROCESS_START) * 1000,
+    "ready_ms": None
+}
 
 
 # ============================================================================
@@ -376,23 +1300,16 @@ broadcast_task: Optional[asyncio.Task] = None
 # ============================================================================
 
 async def detection_broadcast_loop():
-    """Periodically broadcast detection data to all connected WebSockets"""
+    """Periodically broadcast new detection data to all connected WebSockets"""
     while True:
         try:
-            await asyncio.sleep(0.1)  # Broadcast every 100ms
+            # Subscribers that are due get what changed since their last update
+            await asyncio.sleep(config.BROADCAST_INTERVAL)
             
             if not connection_manager:
                 continue
             
-            # Broadcast detection data for each client
-            for client_id, client in connection_manager.clients.items():
-                if client.processed_track:
-                    detection_data = client.processed_track.get_detection_data()
-                    if detection_data:
-                        await connection_manager.broadcast_detection_data(
-                            client_id, 
-                            detection_data
-                        )
+            await connection_manager.broadcast_detections()
                         
         except asyncio.CancelledError:
             logger.info("Detection broadcast loop cancelled")
@@ -402,21 +1319,60 @@ async def detection_broadcast_loop():
             await asyncio.sleep(1.0)
 
 
+async def source_eviction_loop():
+    """Periodically release shared sources that have been idle past SOURCE_IDLE_TIMEOUT"""
+    while True:
+        try:
+            await asyncio.sleep(1.0)
+            
+            if connection_manager:
+                connection_manager.evict_idle_sources(config.SOURCE_IDLE_TIMEOUT)
+                
+        except asyncio.CancelledError:
+            logger.info("Source eviction loop cancelled")
+            break
+        except Exception as e:
+            logger.error(f"Error in source eviction loop: {e}")
+
+
 # ============================================================================
 # Lifespan Event Handler
 # ============================================================================
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global detector, connection_manager, broadcast_task
+    global detector, inference_executor, inference_scheduler, connection_manager, broadcast_task, eviction_task
     
     logger.info("Starting up WebRTC backend...")
     
     try:
-        # Initialize person detector
-        detector = PersonDetector(config.MODEL_PATH, conf_threshold=config.DETECTION_CONFIDENCE)
+        # Initialize person detector. Worker processes (and worker threads beyond
+        # the first) load their own model, so this one then only annotates
+        load_model = not InferenceExecutor.workers_load_model(config.INFERENCE_EXECUTOR, config.INFERENCE_WORKERS)
+        detector = PersonDetector(config.MODEL_PATH, load=load_model, **config.DETECTOR_OPTIONS)
         logger.info(f"Person detector initialized successfully with model: {config.MODEL_PATH}")
         
+        # Pay the first-inference cost now instead of on the first client frame
+        if config.MODEL_WARMUP and load_model:
+            detector.warmup()
+        
+        # Run inference off the event loop so signaling and broadcasts stay responsive
+        inference_executor = InferenceExecutor(
+            detector,
+            kind=config.INFERENCE_EXECUTOR,
+            workers=config.INFERENCE_WORKERS,
+            pool_options=config.DETECTOR_POOL_OPTIONS,
+            warmup=config.MODEL_WARMUP
+        )
+        
+        # Start the shared inference scheduler so all tracks batch their frames
+        inference_scheduler = InferenceScheduler(
+            inference_executor,
+            max_batch_size=config.INFERENCE_MAX_BATCH_SIZE,
+            max_wait_ms=config.INFERENCE_MAX_WAIT_MS
+        )
+        inference_scheduler.start()
+        
         # Initialize connection manager
         connection_manager = ConnectionManager()
         logger.info("Connection manager initialized")
@@ -425,9 +1381,17 @@ async def lifespan(app: FastAPI):
         broadcast_task = asyncio.create_task(detection_broadcast_loop())
         logger.info("Detection broadcast loop started")
         
+        # Release captures of sources nobody has watched for a while
+        eviction_task = asyncio.create_task(source_eviction_loop())
+        
+        startup_metrics["ready_ms"] = (time.perf_counter() - _PROCESS_START) * 1000
+        logger.info(f"Backend ready {startup_metrics['ready_ms']:.0f} ms after process start")
+        
     except Exception as e:
         logger.error(f"Failed to initialize: {e}")
         detector = None
+        inference_executor = None
+        inference_scheduler = None
         connection_manager = None
     
     yield
@@ -435,17 +1399,28 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down WebRTC backend...")
     
-    if broadcast_task:
-        broadcast_task.cancel()
-        try:
-            await broadcast_task
-        except asyncio.CancelledError:
-            pass
+    for task in (broadcast_task, eviction_task):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
     
     if connection_manager:
         client_ids = list(connection_manager.clients.keys())
         for client_id in client_ids:
             await connection_manager.remove_client(client_id)
+        for publisher_id in list(connection_manager.publishers):
+            await connection_manager.remove_publisher(publisher_id)
+        # Every source is idle now; release them all regardless of the timeout
+        connection_manager.evict_idle_sources(0)
+    
+    if inference_scheduler:
+        await inference_scheduler.stop()
+    
+    if inference_executor:
+        inference_executor.shutdown()
     
     logger.info("Shutdown complete")
 
@@ -481,7 +1456,7 @@ async def root():
         "status": "running",
         "version": "1.0.0",
         "default_video": config.DEFAULT_VIDEO_FILE,
-        "detector_loaded": detector is not None and detector.model is not None
+        "detector_loaded": detector is not None and detector.available
     }
 
 
@@ -489,7 +1464,9 @@ async def root():
 async def health_check():
     return {
         "status": "healthy",
-        "detector_loaded": detector is not None and detector.model is not None,
+        "detector_loaded": detector is not None and detector.available,
+        "model_backend": detector.active_backend if detector else None,
+        "startup": {**startup_metrics, **(detector.get_startup_metrics() if detector else {})},
         "active_clients": len(connection_manager.clients) if connection_manager else 0,
         "active_websockets": len(connection_manager.websockets) if connection_manager else 0,
         "timestamp": time.time()
@@ -505,7 +1482,8 @@ async def get_config():
         "rtc_url": config.RTC_URL,
         "rtc_ws_url": config.RTC_WS_URL,
         "default_video_source": config.DEFAULT_VIDEO_SOURCE,
-        "default_loop_video": config.DEFAULT_LOOP_VIDEO
+        "default_loop_video": config.DEFAULT_LOOP_VIDEO,
+        "video_overlay": config.VIDEO_OVERLAY
     }
 
 
@@ -532,6 +1510,7 @@ async def handle_ice_servers(request: IceServersRequest):
 @app.post("/offer")
 async def handle_offer(offer_request: OfferRequest):
     """Handle WebRTC offer from client"""
+    client_id = None
     try:
         if not connection_manager:
             raise HTTPException(status_code=503, detail="Connection manager not initialized")
@@ -539,7 +1518,16 @@ async def handle_offer(offer_request: OfferRequest):
         if not detector:
             logger.warning("Detector not initialized, video will stream without detection")
         
+        # Validate the requested region of interest before allocating anything
+        roi = None
+        if offer_request.roi_polygons:
+            try:
+                roi = RegionOfInterest(offer_request.roi_polygons)
+            except (ValueError, TypeError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid roi_polygons: {e}")
+        
         client_id = offer_request.client_id
+        overlay = config.VIDEO_OVERLAY if offer_request.overlay is None else offer_request.overlay
         
         # Check if client_id already exists and generate unique one if needed
         original_client_id = client_id
@@ -574,48 +1562,76 @@ async def handle_offer(offer_request: OfferRequest):
         async def on_icegatheringstatechange():
             logger.info(f"[{client_id}] ICE gathering state: {pc.iceGatheringState}")
         
-        # Get or create shared video track
+        @pc.on("datachannel")
+        def on_datachannel(channel: RTCDataChannel):
+            attach_detection_channel(client, channel)
+        
+        # Get or create the shared source
         try:
             if offer_request.source == "file":
                 video_path = offer_request.video_path or config.DEFAULT_VIDEO_PATH
-                shared_video_track, shared_processed_track = connection_manager.get_or_create_shared_track(
-                    video_path, detector
+                source = connection_manager.get_or_create_source(
+                    video_path,
+                    lambda: create_file_track(video_path, loop=True),
+                    detector,
+                    inference_scheduler
                 )
+            elif offer_request.source == "camera":
+                # Capture starts in the background and reconnects on its own
+                key, live_source = live_source_key(offer_request)
+                source = connection_manager.get_or_create_source(
+                    key, lambda: LiveVideoTrack(live_source), detector, inference_scheduler
+                )
+            elif offer_request.source == "publisher":
+                # Published streams exist only while their publisher is connected
+                source = connection_manager.sources.get(published_source_key(offer_request.publisher_id))
+                if source is None:
+                    raise HTTPException(
+                        status_code=404, detail=f"No published stream: {offer_request.publisher_id}"
+                    )
             else:
-                # Camera source not implemented in this version
-                raise HTTPException(status_code=501, detail="Camera source not implemented")
+                raise ValueError(f"Unknown source: {offer_request.source}")
             
-            logger.info(f"[{client_id}] Using shared video track for: {video_path}")
+            # The region of interest belongs to the source, since detection runs
+            # once for all viewers: the first viewer (or the publisher) sets it,
+            # later viewers share it and cannot change it for everyone
+            if source.processed_track:
+                if not source.viewers and not source.pushed:
+                    source.processed_track.set_roi(roi)
+                elif offer_request.roi_polygons is not None and not source.roi_matches(roi):
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Source {source.key} is already detecting with a different region of interest"
+                    )
             
+            logger.info(f"[{client_id}] Using shared source for: {source.key}")
+            
+        except HTTPException:
+            await connection_manager.remove_client(client_id)
+            raise
         except FileNotFoundError as e:
             logger.error(f"Video file not found: {e}")
             await connection_manager.remove_client(client_id)
             raise HTTPException(status_code=404, detail=str(e))
+        except ValueError as e:
+            await connection_manager.remove_client(client_id)
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             logger.error(f"Failed to get shared video track: {e}")
             await connection_manager.remove_client(client_id)
             raise HTTPException(status_code=500, detail=f"Video initialization failed: {e}")
         
-        # Create relay from shared track
-        if shared_processed_track:
-            # Use the shared processed track
-            relayed_track = connection_manager.media_relay.subscribe(shared_processed_track)
-            client.processed_track = shared_processed_track
-            logger.info(f"[{client_id}] Added shared processed video track with detection")
+        # Relay the source's video to this viewer; detection runs once per source
+        relayed_track = source.subscribe(client_id, overlay)
+        client.source = source
+        client.processed_track = source.processed_track
+        if client.processed_track:
+            logger.info(
+                f"[{client_id}] Subscribed to shared source with detection "
+                f"({source.viewer_count()} viewer(s), overlay {'on' if overlay else 'off'})"
+            )
         else:
-            # Create individual processed track for this client if detector is available
-            if detector and detector.model:
-                # Create a relay from the shared video track
-                relayed_video = connection_manager.media_relay.subscribe(shared_video_track)
-                # Create individual processed track that wraps the relayed video
-                client.processed_track = ProcessedVideoTrack(relayed_video, detector, client_id)
-                # Subscribe to the processed track for this client
-                relayed_track = connection_manager.media_relay.subscribe(client.processed_track)
-                logger.info(f"[{client_id}] Created individual processed track with detection")
-            else:
-                # Use the shared raw video track without detection
-                relayed_track = connection_manager.media_relay.subscribe(shared_video_track)
-                logger.warning(f"[{client_id}] Added video track without detection (detector not available)")
+            logger.warning(f"[{client_id}] Added video track without detection (detector not available)")
         
         pc.addTrack(relayed_track)
         
@@ -635,7 +1651,9 @@ async def handle_offer(offer_request: OfferRequest):
             "type": pc.localDescription.type,
             "client_id": client_id,
             "status": "success",
-            "detection_enabled": detector is not None and detector.model is not None,
+            "detection_enabled": detector is not None and detector.available,
+            "overlay": overlay,
+            "detection_channel": DETECTION_CHANNEL_LABEL,
             "shared_tracks": connection_manager.get_shared_track_info()
         }
         
@@ -643,9 +1661,116 @@ async def handle_offer(offer_request: OfferRequest):
         raise
     except Exception as e:
         logger.error(f"Error handling offer: {e}", exc_info=True)
+        # Drop the half-set-up client so it does not keep its source alive
+        if client_id in connection_manager.clients:
+            await connection_manager.remove_client(client_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/publish")
+async def handle_publish(publish_request: PublishRequest):
+    """
+    Accept a video track pushed in by a publisher (e.g. a drone)
+    
+    The publisher's offer carries a send-only video track. It becomes a
+    shared source ("publish:<publisher_id>"): detection runs on it once and
+    viewers watch it through /offer with source "publisher". The source
+    ends when the publisher disconnects.
+    """
+    if not connection_manager:
+        raise HTTPException(status_code=503, detail="Connection manager not initialized")
+    
+    publisher_id = publish_request.publisher_id
+    if publisher_id in connection_manager.publishers:
+        raise HTTPException(status_code=409, detail=f"Publisher already connected: {publisher_id}")
+    
+    roi = None
+    if publish_request.roi_polygons:
+        try:
+            roi = RegionOfInterest(publish_request.roi_polygons)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid roi_polygons: {e}")
+    
+    pc = RTCPeerConnection(configuration=create_rtc_configuration())
+    publisher = connection_manager.add_publisher(publisher_id, pc)
+    
+    @pc.on("connectionstatechange")
+    async def on_connectionstatechange():
+        logger.info(f"[{publisher_id}] Publisher connection state: {pc.connectionState}")
+        if pc.connectionState in ["failed", "closed"]:
+            await connection_manager.remove_publisher(publisher_id)
+    
+    @pc.on("track")
+    def on_track(track: MediaStreamTrack):
+        if track.kind != "video" or publisher.source:
+            return
+        
+        source = connection_manager.get_or_create_source(
+            published_source_key(publisher_id), lambda: track, detector, inference_scheduler, pushed=True
+        )
+        publisher.source = source
+        publisher.processed_track = source.processed_track
+        if publisher.processed_track and roi is not None:
+            publisher.processed_track.set_roi(roi)
+        logger.info(f"[{publisher_id}] Receiving published video as source {source.key}")
+        
+        @track.on("ended")
+        async def on_ended():
+            await connection_manager.remove_publisher(publisher_id)
+    
+    @pc.on("datachannel")
+    def on_datachannel(channel: RTCDataChannel):
+        attach_detection_channel(publisher, channel)
+    
+    try:
+        # The track event fires while the offer is applied
+        await pc.setRemoteDescription(
+            RTCSessionDescription(sdp=publish_request.sdp, type=publish_request.type)
+        )
+        if publisher.source is None:
+            raise HTTPException(status_code=400, detail="Offer has no video track")
+        
+        answer = await pc.createAnswer()
+        await pc.setLocalDescription(answer)
+    except HTTPException:
+        await connection_manager.remove_publisher(publisher_id)
+        raise
+    except Exception as e:
+        logger.error(f"Error handling publish offer: {e}", exc_info=True)
+        await connection_manager.remove_publisher(publisher_id)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    logger.info(f"[{publisher_id}] Publisher connected")
+    
+    return {
+        "sdp": pc.localDescription.sdp,
+        "type": pc.localDescription.type,
+        "publisher_id": publisher_id,
+        "source": publisher.source.key,
+        "status": "success",
+        "detection_enabled": publisher.processed_track is not None,
+        "detection_channel": DETECTION_CHANNEL_LABEL
+    }
+
+
+@app.post("/stop-publish")
+async def stop_publish(publisher_id: str):
+    """Disconnect a publisher and end its stream for all viewers"""
+    if not connection_manager:
+        raise HTTPException(status_code=503, detail="Connection manager not initialized")
+    
+    if publisher_id not in connection_manager.publishers:
+        raise HTTPException(status_code=404, detail="Publisher not found")
+    
+    await connection_manager.remove_publisher(publisher_id)
+    
+    return {
+        "status": "stopped",
+        "publisher_id": publisher_id,
+        "message": "Publisher disconnected successfully"
+    }
+
+
 @app.post("/stop-stream")
 async def stop_stream(client_id: str):
     """Stop a specific stream"""
@@ -677,14 +1802,12 @@ async def get_active_streams():
         if client.processed_track:
             detection_data = client.processed_track.get_detection_data()
         
-        # Check if using shared video tracks
-        has_video = len(connection_manager.shared_video_tracks) > 0
-        
         streams.append({
             "client_id": client_id,
             "connected_at": client.created_at,
             "connection_state": client.peer_connection.connectionState,
-            "has_video": has_video,
+            "has_video": client.source is not None,
+            "source": client.source.key if client.source else None,
             "has_detection": client.processed_track is not None,
             "latest_detection": detection_data,
             "using_shared_tracks": True
@@ -756,7 +1879,9 @@ async def get_connection_stats():
         "active_clients": len(connection_manager.clients),
         "shared_tracks": connection_manager.get_shared_track_info(),
         "websocket_connections": len(connection_manager.websockets),
-        "detector_loaded": detector is not None and detector.model is not None,
+        "detector_loaded": detector is not None and detector.available,
+        "inference": inference_scheduler.get_stats() if inference_scheduler else None,
+        "broadcast": connection_manager.broadcaster.get_stats(),
         "timestamp": time.time()
     }
     
@@ -768,7 +1893,12 @@ async def get_connection_stats():
             "connection_state": client.peer_connection.connectionState,
             "ice_state": client.peer_connection.iceConnectionState,
             "created_at": client.created_at,
-            "has_processed_track": client.processed_track is not None
+            "has_processed_track": client.processed_track is not None,
+            "source": client.source.key if client.source else None,
+            "overlay": client.source.viewers.get(client_id) if client.source else None,
+            "detection_cadence": (
+                client.processed_track.get_cadence_stats() if client.processed_track else None
+            )
         })
     
     stats["clients"] = client_details
@@ -787,11 +1917,13 @@ async def websocket_detection_endpoint(websocket: WebSocket):
         return
         
     await connection_manager.add_websocket(websocket)
+    subscriber = connection_manager.broadcaster.subscribers[websocket]
     
     try:
-        await websocket.send_json({
+        connection_manager.send_control(websocket, {
             "type": "connected",
             "message": "WebSocket connected successfully",
+            "delta": subscriber.delta,
             "timestamp": time.time()
         })
         
@@ -800,24 +1932,62 @@ async def websocket_detection_endpoint(websocket: WebSocket):
             message_type = data.get("type")
             
             if message_type == "ping":
-                await websocket.send_json({
+                connection_manager.send_control(websocket, {
                     "type": "pong",
                     "timestamp": time.time()
                 })
             
-            elif message_type == "subscribe":
-                client_id = data.get("client_id")
-                await websocket.send_json({
+            elif message_type in ("subscribe", "unsubscribe"):
+                # Stream ids or fnmatch patterns, e.g. ["drone-1", "drone-2*"];
+                # a single "client_id" is accepted as a one-stream subscription
+                topics = data.get("streams", data.get("client_id"))
+                subscriptions = connection_manager.broadcaster.subscriptions
+                try:
+                    if message_type == "subscribe":
+                        if topics is None:
+                            raise ValueError("Nothing to subscribe to: send \"streams\" or \"client_id\"")
+                        subscribed = subscriptions.subscribe(websocket, topics)
+                    else:
+                        # Without topics, unsubscribe from everything
+                        subscribed = subscriptions.unsubscribe(websocket, topics)
+                except ValueError as e:
+                    connection_manager.send_control(websocket, {
+                        "type": "error",
+                        "message": str(e),
+                        "timestamp": time.time()
+                    })
+                    continue
+                connection_manager.send_control(websocket, {
                     "type": "subscribed",
-                    "client_id": client_id,
+                    "client_id": data.get("client_id"),
+                    "streams": sorted(subscribed),
+                    "timestamp": time.time()
+                })
+            
+            elif message_type == "resync":
+                # The client lost its state: next update of every stream is full
+                subscriber.resync()
+            
+            elif message_type == "configure":
+                if "delta" in data:
+                    subscriber.delta = bool(data["delta"])
+                if "max_rate" in data:
+                    try:
+                        subscriber.set_max_rate(float(data["max_rate"]) if data["max_rate"] else None)
+                    except (TypeError, ValueError):
+                        pass
+                connection_manager.send_control(websocket, {
+                    "type": "configured",
+                    "delta": subscriber.delta,
+                    "interval_ms": subscriber.interval * 1000,
                     "timestamp": time.time()
                 })
             
             elif message_type == "get_status":
-                await websocket.send_json({
+                connection_manager.send_control(websocket, {
                     "type": "status",
                     "active_clients": len(connection_manager.clients),
-                    "detector_loaded": detector is not None and detector.model is not None,
+                    "detector_loaded": detector is not None and detector.available,
                     "timestamp": time.time()
                 })
                 
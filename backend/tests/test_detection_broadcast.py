@@ -0,0 +1,171 @@
+"""Delta updates reconstruct full updates, and subscriptions route each stream to its sockets"""
+
+import asyncio
+import json
+import random
+
+import pytest
+
+from detection_broadcast import (
+    MAX_TOPICS_PER_SOCKET, DeltaEncoder, DetectionBroadcaster, SubscriptionIndex
+)
+
+TOLERANCE = 1.0
+
+
+def make_detection(frame_number, persons):
+    return {
+        "client_id": "drone-1",
+        "frame_number": frame_number,
+        "timestamp": 1000.0 + frame_number,
+        "total_persons": len(persons),
+        "positions": [dict(position) for position in persons.values()],
+    }
+
+
+def apply(held, message):
+    """What a client does with a message (see README: /ws/detection)"""
+    if message["type"] == "detection_update":
+        detection = message["data"]
+        return (
+            {key: value for key, value in detection.items() if key != "positions"},
+            {position["id"]: position for position in detection["positions"]},
+        )
+    assert message["type"] == "detection_delta"
+    scalars, positions = held
+    assert message["base_frame"] == scalars["frame_number"]
+    scalars = {**scalars, **message["data"]}
+    positions = dict(positions)
+    for position in message["upsert"]:
+        positions[position["id"]] = position
+    for person_id in message["remove"]:
+        positions.pop(person_id, None)
+    return scalars, positions
+
+
+def test_delta_round_trip_matches_full_updates():
+    rng = random.Random(7)
+    encoder = DeltaEncoder(position_tolerance=TOLERANCE)
+    persons = {}
+    next_id = 0
+    state = held = None
+
+    for frame_number in range(200):
+        # People walk, stand still, arrive and leave
+        for position in persons.values():
+            if rng.random() < 0.5:
+                position["x_center"] += rng.uniform(-6, 6)
+                position["y_center"] += rng.uniform(-6, 6)
+        for person_id in [person_id for person_id in persons if rng.random() < 0.05]:
+            del persons[person_id]
+        for _ in range(rng.randint(0, 2)):
+            persons[next_id] = {
+                "id": next_id, "x_center": rng.uniform(0, 1280), "y_center": rng.uniform(0, 720),
+                "width": 40.0, "height": 90.0, "confidence": 0.9,
+            }
+            next_id += 1
+
+        detection = make_detection(frame_number, persons)
+        text, state = encoder.encode("drone-1", state, detection)
+        message = json.loads(text)
+        assert message["type"] == ("detection_update" if frame_number == 0 else "detection_delta")
+        held = apply(held, message)
+
+        scalars, positions = held
+        assert scalars["frame_number"] == frame_number
+        assert scalars["total_persons"] == len(persons)
+        assert set(positions) == set(persons)
+        for person_id, person in persons.items():
+            assert abs(positions[person_id]["x_center"] - person["x_center"]) <= TOLERANCE
+            assert abs(positions[person_id]["y_center"] - person["y_center"]) <= TOLERANCE
+
+
+def test_unchanged_boxes_are_not_resent():
+    encoder = DeltaEncoder(position_tolerance=TOLERANCE)
+    persons = {0: {"id": 0, "x_center": 100.0, "y_center": 100.0, "width": 40.0, "height": 90.0, "confidence": 0.9}}
+    _, state = encoder.encode("drone-1", None, make_detection(0, persons))
+
+    persons[0]["x_center"] += 0.5
+    text, _ = encoder.encode("drone-1", state, make_detection(1, persons))
+    delta = json.loads(text)
+    assert delta["upsert"] == [] and delta["remove"] == []
+    assert "total_persons" not in delta["data"]
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, text):
+        self.messages.append(json.loads(text))
+
+
+def test_broadcaster_sends_full_updates_by_default_and_skips_unchanged():
+    async def run():
+        broadcaster = DetectionBroadcaster(min_interval=0)
+        default, opted_in = RecordingSocket(), RecordingSocket()
+        broadcaster.add(default)
+        broadcaster.add(opted_in).delta = True
+
+        persons = {0: {"id": 0, "x_center": 100.0, "y_center": 100.0, "width": 40.0, "height": 90.0, "confidence": 0.9}}
+        for frame_number in (0, 0, 1):
+            persons[0]["x_center"] += 10
+            await broadcaster.broadcast({"drone-1": make_detection(frame_number, persons)})
+            await asyncio.sleep(0.01)
+        for socket in (default, opted_in):
+            broadcaster.remove(socket)
+        return default.messages, opted_in.messages
+
+    default, opted_in = asyncio.run(run())
+    # The repeated frame is not sent again
+    assert [message["type"] for message in default] == ["detection_update"] * 2
+    assert [message["type"] for message in opted_in] == ["detection_update", "detection_delta"]
+
+
+def test_subscription_routing():
+    index = SubscriptionIndex()
+    everything, drones, one = "everything", "drones", "one"
+    for websocket in (everything, drones, one):
+        index.add(websocket)
+
+    assert index.subscribe(drones, ["drone-*"]) == {"drone-*"}
+    assert index.subscribe(one, "camera:0") == {"camera:0"}
+
+    # Sockets that never subscribed receive every stream
+    assert index.match("drone-1") == {everything, drones}
+    assert index.match("drone-12") == {everything, drones}
+    assert index.match("camera:0") == {everything, one}
+    assert index.match("upload/video.mp4") == {everything}
+    # Patterns match the whole stream id, case-sensitively
+    assert index.match("my-drone-1") == {everything}
+    assert index.match("Drone-1") == {everything}
+
+
+def test_subscription_changes_invalidate_cached_matches():
+    index = SubscriptionIndex()
+    index.add("socket")
+    index.subscribe("socket", ["drone-?"])
+    assert index.match("drone-1") == {"socket"}
+
+    index.unsubscribe("socket", ["drone-?"])
+    # Unsubscribing from every topic does not switch back to receiving everything
+    assert index.topics("socket") == set()
+    assert index.match("drone-1") == frozenset()
+
+    index.subscribe("socket", ["drone-1"])
+    assert index.match("drone-1") == {"socket"}
+    index.remove("socket")
+    assert index.match("drone-1") == frozenset()
+    assert index.get_stats() == {"unfiltered_sockets": 0, "topics": 0, "patterns": 0}
+
+
+def test_subscription_validation():
+    index = SubscriptionIndex()
+    index.add("socket")
+    for topics in ([""], [3], {"stream": "drone-1"}):
+        with pytest.raises(ValueError):
+            index.subscribe("socket", topics)
+    with pytest.raises(ValueError):
+        index.subscribe("socket", [f"drone-{i}" for i in range(MAX_TOPICS_PER_SOCKET + 1)])
+    # A rejected subscription leaves the socket unfiltered
+    assert index.topics("socket") is None
@@ -0,0 +1,28 @@
+"""Importing the light modules must not pull in torch or ultralytics"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+# Same list as `python benchmark.py imports`, which also reports timings
+LIGHT_MODULES = ["config", "model_backends", "person_detector", "inference", "detector_workers"]
+HEAVY_MODULES = ["torch", "ultralytics"]
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_import_does_not_load_ml_stack(module):
+    # A fresh interpreter: other tests may already have imported torch here
+    probe = (
+        f"import json, sys\n"
+        f"import {module}\n"
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", probe], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,78 @@
+"""The scheduler batches concurrent frames and fails the ones it holds when stopped"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from inference import InferenceScheduler
+
+
+class FakeExecutor:
+    """Stands in for InferenceExecutor: answers each frame with its own first pixel"""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.batch_sizes = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def detect_batch(self, frames):
+        self.batch_sizes.append(len(frames))
+        await self.release.wait()
+        return [[{"id": int(frame[0, 0, 0])}] for frame in frames]
+
+    def get_stats(self):
+        return {"workers": self.workers}
+
+
+def make_frame(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_concurrent_frames_share_batches():
+    async def run():
+        executor = FakeExecutor()
+        scheduler = InferenceScheduler(executor, max_batch_size=4, max_wait_ms=50)
+        scheduler.start()
+        results = await asyncio.gather(*(scheduler.submit(make_frame(i)) for i in range(6)))
+        await scheduler.stop()
+        return executor.batch_sizes, results, scheduler.get_stats()
+
+    batch_sizes, results, stats = asyncio.run(run())
+    assert batch_sizes == [4, 2]
+    # Every caller gets the detections of its own frame
+    assert [positions[0]["id"] for positions in results] == list(range(6))
+    assert stats["batches_run"] == 2
+    assert stats["frames_processed"] == 6
+
+
+def test_stop_fails_held_and_queued_frames():
+    async def run():
+        executor = FakeExecutor(workers=1)
+        executor.release.clear()
+        scheduler = InferenceScheduler(executor, max_batch_size=1, max_wait_ms=0)
+        scheduler.start()
+
+        # The first frame occupies the only worker; the second is held waiting
+        # for a free slot and the third is still queued
+        submitted = [asyncio.create_task(scheduler.submit(make_frame(i))) for i in range(3)]
+        await asyncio.sleep(0.05)
+        assert executor.batch_sizes == [1]
+
+        await scheduler.stop()
+        outcomes = await asyncio.gather(*submitted, return_exceptions=True)
+        return outcomes, scheduler.is_running
+
+    outcomes, running = asyncio.run(run())
+    assert not running
+    assert isinstance(outcomes[0], asyncio.CancelledError)
+    for outcome in outcomes[1:]:
+        assert isinstance(outcome, RuntimeError)
+        assert "stopped" in str(outcome)
+
+
+def test_submit_requires_a_running_scheduler():
+    scheduler = InferenceScheduler(FakeExecutor())
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.submit(make_frame(0)))
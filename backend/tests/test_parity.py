@@ -0,0 +1,68 @@
+"""Exported backends must find the same persons as the PyTorch checkpoint
+
+Skipped unless the backend's runtime and the MODEL_PATH weights are available;
+`python benchmark.py parity` runs the same check over many video frames.
+"""
+
+from pathlib import Path
+
+import cv2
+import pytest
+
+import config
+from conftest import BACKEND_DIR
+from person_detector import PersonDetector, box_iou, positions_to_array
+
+RUNTIMES = {"onnx": "onnxruntime", "openvino": "openvino"}
+VIDEO_PATH = BACKEND_DIR / "ForBiggerEscapes.mp4"
+FRAME_INDEX = 60
+IOU_TOLERANCE = 0.9
+CONF_TOLERANCE = 0.05
+
+
+def model_path() -> Path:
+    path = Path(config.MODEL_PATH)
+    return path if path.is_absolute() else BACKEND_DIR / path
+
+
+@pytest.fixture(scope="module")
+def frame():
+    capture = cv2.VideoCapture(str(VIDEO_PATH))
+    capture.set(cv2.CAP_PROP_POS_FRAMES, FRAME_INDEX)
+    ret, image = capture.read()
+    capture.release()
+    if not ret:
+        pytest.skip(f"Could not read frame {FRAME_INDEX} of {VIDEO_PATH.name}")
+    return image
+
+
+@pytest.fixture(scope="module")
+def reference_boxes(frame):
+    if not model_path().exists():
+        pytest.skip(f"Model weights not found: {model_path()}")
+    detector = PersonDetector(str(model_path()), conf_threshold=config.DETECTION_CONFIDENCE)
+    if detector.model is None:
+        pytest.skip("PyTorch model could not be loaded")
+    return positions_to_array(detector.detect_persons(frame))
+
+
+@pytest.mark.parametrize("backend", sorted(RUNTIMES))
+def test_exported_backend_matches_pytorch(backend, frame, reference_boxes):
+    pytest.importorskip(RUNTIMES[backend])
+    detector = PersonDetector(
+        str(model_path()), conf_threshold=config.DETECTION_CONFIDENCE, backend=backend
+    )
+    if detector.active_backend != backend:
+        pytest.skip(f"The {backend} backend could not be loaded")
+
+    boxes = positions_to_array(detector.detect_persons(frame))
+
+    # Persons close to the threshold may flip either way; all others must match
+    borderline = config.DETECTION_CONFIDENCE + CONF_TOLERANCE
+    for expected in reference_boxes[reference_boxes[:, 4] > borderline]:
+        iou = box_iou(expected[None], boxes)[0] if len(boxes) else []
+        assert len(iou) and iou.max() >= IOU_TOLERANCE, f"missing person at {expected[:2]}"
+        assert abs(boxes[iou.argmax(), 4] - expected[4]) <= CONF_TOLERANCE
+    for actual in boxes[boxes[:, 4] > borderline]:
+        iou = box_iou(actual[None], reference_boxes)[0] if len(reference_boxes) else []
+        assert len(iou) and iou.max() >= IOU_TOLERANCE, f"extra person at {actual[:2]}"
@@ -0,0 +1,52 @@
+"""Box IoU, NMS and the tile grid used by tiled inference"""
+
+import numpy as np
+import pytest
+
+from person_detector import box_iou, non_max_suppression, tile_grid
+
+
+def test_box_iou():
+    boxes = np.array([[50, 50, 100, 100], [100, 50, 100, 100], [500, 500, 10, 10]], dtype=np.float32)
+    iou = box_iou(boxes, boxes)
+    assert np.allclose(np.diag(iou), 1.0)
+    # Half overlap: 5000 / (10000 + 10000 - 5000)
+    assert iou[0, 1] == pytest.approx(1 / 3)
+    assert iou[0, 2] == 0.0
+
+
+def test_nms_keeps_best_of_overlapping_boxes():
+    boxes = np.array([
+        [100, 100, 50, 100, 0.6],
+        [102, 101, 50, 100, 0.9],  # same person, seen by a neighbouring tile
+        [400, 100, 50, 100, 0.7],
+        [105, 100, 50, 100, 0.8],
+    ], dtype=np.float32)
+    assert non_max_suppression(boxes, iou_threshold=0.5).tolist() == [1, 2]
+
+
+def test_nms_keeps_boxes_below_threshold():
+    boxes = np.array([[50, 50, 100, 100, 0.9], [100, 50, 100, 100, 0.8]], dtype=np.float32)
+    assert non_max_suppression(boxes, iou_threshold=0.5).tolist() == [0, 1]
+    assert non_max_suppression(boxes, iou_threshold=0.3).tolist() == [0]
+
+
+@pytest.mark.parametrize("height,width", [(1080, 1920), (2160, 3840), (640, 640), (700, 1000)])
+def test_tile_grid_covers_image_without_padding(height, width):
+    tile_size, overlap = 640, 0.2
+    tiles = tile_grid(height, width, tile_size, overlap)
+
+    covered = np.zeros((height, width), dtype=bool)
+    for x1, y1, x2, y2 in tiles:
+        # Tiles stay inside the image and are full size unless the image is smaller
+        assert 0 <= x1 < x2 <= width and 0 <= y1 < y2 <= height
+        assert x2 - x1 == min(tile_size, width) and y2 - y1 == min(tile_size, height)
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+
+
+def test_tile_grid_overlap():
+    xs = sorted({x1 for x1, _, _, _ in tile_grid(640, 1920, 640, 0.2)})
+    # Stride of 512 px, the last tile aligned to the right edge
+    assert xs == [0, 512, 1024, 1280]
+    assert tile_grid(480, 640, 640) == [(0, 0, 640, 480)]
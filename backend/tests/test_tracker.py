@@ -0,0 +1,65 @@
+"""PersonTracker keeps ids stable across detections and predicts in between"""
+
+import numpy as np
+
+from person_detector import PersonTracker, positions_from_array
+
+IMAGE_SHAPE = (720, 1280, 3)
+
+
+def detections(*boxes):
+    # Detector ids restart at 0 every frame; the tracker replaces them
+    return positions_from_array(np.array(boxes, dtype=np.float32), IMAGE_SHAPE)
+
+
+def ids_by_x(positions):
+    return {round(pos['x_center']): pos['id'] for pos in positions}
+
+
+def test_ids_follow_moving_persons():
+    tracker = PersonTracker()
+    first = tracker.update(detections((100, 300, 50, 120, 0.9), (600, 300, 50, 120, 0.8)), IMAGE_SHAPE, 0)
+    ids = [pos['id'] for pos in first]
+    assert len(set(ids)) == 2
+
+    # Detector order flips while both persons walk right
+    for frame in range(1, 10):
+        shift = 5 * frame
+        positions = tracker.update(
+            detections((600 + shift, 300, 50, 120, 0.8), (100 + shift, 300, 50, 120, 0.9)), IMAGE_SHAPE, frame
+        )
+        assert ids_by_x(positions) == {600 + shift: ids[1], 100 + shift: ids[0]}
+
+
+def test_new_person_gets_new_id_and_old_ids_are_not_reused():
+    tracker = PersonTracker(max_age=2)
+    (first,) = tracker.update(detections((100, 300, 50, 120, 0.9)), IMAGE_SHAPE, 0)
+
+    # The first person leaves; once the track expires, a newcomer elsewhere gets a fresh id
+    for frame in range(1, 5):
+        tracker.update([], IMAGE_SHAPE, frame)
+    assert tracker.track_count == 0
+    (newcomer,) = tracker.update(detections((900, 300, 50, 120, 0.9)), IMAGE_SHAPE, 5)
+    assert newcomer['id'] != first['id']
+
+
+def test_track_survives_missed_detections_within_max_age():
+    tracker = PersonTracker(max_age=5)
+    (first,) = tracker.update(detections((100, 300, 50, 120, 0.9)), IMAGE_SHAPE, 0)
+    tracker.update([], IMAGE_SHAPE, 1)
+    tracker.update([], IMAGE_SHAPE, 2)
+    (again,) = tracker.update(detections((104, 300, 50, 120, 0.9)), IMAGE_SHAPE, 3)
+    assert again['id'] == first['id']
+
+
+def test_predict_extrapolates_between_detections():
+    tracker = PersonTracker(alpha=1.0, beta=1.0)
+    for frame in range(4):
+        tracker.update(detections((100 + 10 * frame, 300, 50, 120, 0.9)), IMAGE_SHAPE, frame)
+
+    (predicted,) = tracker.predict(5)
+    # Moving ~10 px per frame: two frames past the last detection at x=130
+    assert 140 < predicted['x_center'] < 160
+    assert predicted['id'] == tracker.update(
+        detections((150, 300, 50, 120, 0.9)), IMAGE_SHAPE, 5
+    )[0]['id']
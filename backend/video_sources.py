@@ -0,0 +1,484 @@
+"""
+Video Sources - Frame readers for the streaming tracks
+Blocking decode and capture run on a background thread that reads ahead into
+a bounded buffer, so coroutines serving video only dequeue frames and never
+hold the event loop while a frame is decoded or captured. Client-supplied
+stream URLs are matched against the allowed live sources here as well.
+"""
+
+import asyncio
+import fnmatch
+import logging
+import threading
+import time
+from collections import deque
+from fractions import Fraction
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import av
+import cv2
+import numpy as np
+from av import VideoFrame
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Rolling window of latency samples with percentile summaries"""
+
+    def __init__(self, size: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, latency_ms: float):
+        self._samples.append(latency_ms)
+        self.count += 1
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Sample count and p50/p95/p99/max over the window, in milliseconds"""
+        if not self._samples:
+            return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+
+        samples = np.fromiter(self._samples, dtype=np.float64)
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            "count": self.count,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(samples.max())
+        }
+
+
+class ReadAheadReader:
+    """
+    Run a blocking read function on a background thread, buffering results
+
+    The thread keeps up to `capacity` items ahead of the consumer and waits
+    while the buffer is full. Slow reads (a seek back to the start of a
+    looping file, a keyframe after it) are absorbed by the buffered items
+    instead of stalling the consumer. A read returning None, or raising, ends
+    the stream.
+
+    With drop_oldest the thread never waits: a live source cannot be paused,
+    so when the buffer is full the oldest item is discarded and the consumer
+    always gets the most recent items.
+
+    Nothing here blocks the event loop: stop() does not wait for a read in
+    progress, and cleanup of what the thread reads from is deferred until
+    the thread is done with it.
+    """
+
+    def __init__(
+        self,
+        read: Callable[[], Any],
+        capacity: int = 8,
+        name: str = "read-ahead",
+        drop_oldest: bool = False
+    ):
+        """
+        Initialize the reader (the thread starts on the first get())
+
+        Args:
+            read: Blocking function returning the next item, or None at the end
+            capacity: Maximum number of items read ahead
+            name: Thread name
+            drop_oldest: Discard the oldest item instead of waiting when full
+        """
+        self._read = read
+        self.capacity = max(1, capacity)
+        self.name = name
+        self.drop_oldest = drop_oldest
+        self._buffer: Deque[Any] = deque()
+        self._space = threading.Condition()
+        self._available: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        # The end of the stream (None) was queued after a last read
+        self._finished = False
+        # The thread returned; cleanup registered by stop() has run
+        self._exited = False
+        self._on_stopped: List[Callable[[], None]] = []
+        self.items_read = 0
+        self.underruns = 0
+        self.dropped = 0
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def start(self):
+        """Start the read-ahead thread (from a coroutine)"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._available = asyncio.Event()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._read_ahead()
+        finally:
+            with self._space:
+                self._exited = True
+                callbacks, self._on_stopped = self._on_stopped, []
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"[{self.name}] Cleanup after stop failed: {e}")
+
+    def _read_ahead(self):
+        while True:
+            with self._space:
+                while (not self.drop_oldest and len(self._buffer) >= self.capacity
+                       and not self._stopped):
+                    self._space.wait()
+                if self._stopped:
+                    return
+
+            try:
+                item = self._read()
+            except Exception as e:
+                logger.error(f"[{self.name}] Read failed, ending stream: {e}")
+                item = None
+
+            with self._space:
+                if self._stopped:
+                    return
+                if len(self._buffer) >= self.capacity:
+                    # Only reachable with drop_oldest
+                    self._buffer.popleft()
+                    self.dropped += 1
+                self._buffer.append(item)
+                if item is not None:
+                    self.items_read += 1
+                else:
+                    self._finished = True
+
+            try:
+                self._loop.call_soon_threadsafe(self._available.set)
+            except RuntimeError:
+                # Event loop closed
+                return
+
+            if item is None:
+                return
+
+    async def get(self) -> Any:
+        """Next item, waiting (without blocking the loop) if none is buffered; None at the end"""
+        self.start()
+        waited = False
+        while True:
+            # Clear before checking so a read finishing in between still wakes us
+            self._available.clear()
+            with self._space:
+                if self._buffer:
+                    item = self._buffer.popleft()
+                    self._space.notify()
+                    return item
+            if self._stopped or self._finished:
+                # The end of the stream was already returned (or the reader stopped)
+                return None
+
+            if not waited:
+                self.underruns += 1
+                waited = True
+            await self._available.wait()
+
+    def stop(self, on_stopped: Optional[Callable[[], None]] = None):
+        """
+        Stop the thread without waiting for it (safe to call on the event loop)
+
+        Args:
+            on_stopped: Cleanup of what the thread reads from (e.g. releasing
+                the capture); runs right away if the thread is not running,
+                otherwise on the thread once its read in progress returns
+        """
+        with self._space:
+            self._stopped = True
+            self._buffer.clear()
+            self._space.notify_all()
+            deferred = self._thread is not None and not self._exited
+            if deferred and on_stopped:
+                self._on_stopped.append(on_stopped)
+        if self._available is not None:
+            self._available.set()
+        if not deferred and on_stopped:
+            on_stopped()
+
+
+class PyAVFileReader:
+    """
+    Decode a video file with PyAV straight to VideoFrames
+
+    Frames keep the decoder's native pixel format (no BGR round trip) and
+    carry presentation timestamps from the container, rebased to start at 0.
+    When looping, the reader seeks back to the keyframe at the start of the
+    stream and continues the timeline after the last frame, so timestamps
+    keep increasing across loops. read() blocks; use it from a ReadAheadReader.
+    """
+
+    def __init__(self, video_path: str, loop: bool = True, thread_count: int = 0):
+        """
+        Open a video file
+
+        Args:
+            video_path: Path to the video file
+            loop: Restart from the beginning at the end of the file
+            thread_count: Codec decoding threads (0 = one per core)
+        """
+        self.video_path = video_path
+        self.loop = loop
+        self.container = av.open(video_path)
+        self.stream = self.container.streams.video[0]
+        # Frame and slice threading inside the codec
+        self.stream.thread_type = "AUTO"
+        self.stream.codec_context.thread_count = thread_count
+
+        self.time_base: Fraction = self.stream.time_base
+        self.start_pts = self.stream.start_time or 0
+        self.fps = float(self.stream.average_rate or 30)
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.total_frames = self.stream.frames
+        # Nominal frame duration in stream time base units
+        self.frame_duration = max(1, round(1 / (self.fps * self.time_base)))
+
+        self.loops = 0
+        self._loop_offset = 0
+        # Last output pts, and last container pts of the current pass
+        self._last_pts: Optional[int] = None
+        self._last_source_pts: Optional[int] = None
+        self._seek_target: Optional[int] = None
+        self._frames = self.container.decode(self.stream)
+
+    def seek(self, pts: int):
+        """
+        Seek so that the next frame read is the first one at or after `pts`
+
+        The container seeks to the keyframe before the target; frames between
+        it and the target are decoded and dropped by read().
+        """
+        self.container.seek(pts, stream=self.stream, backward=True, any_frame=False)
+        self._frames = self.container.decode(self.stream)
+        self._seek_target = pts
+        self._last_source_pts = None
+
+    def _next_frame(self) -> Optional[VideoFrame]:
+        for frame in self._frames:
+            if frame.pts is None:
+                # Some containers omit timestamps: continue from the last frame
+                frame.pts = (self._last_source_pts + self.frame_duration
+                             if self._last_source_pts is not None else self.start_pts)
+            self._last_source_pts = frame.pts
+            if self._seek_target is not None:
+                if frame.pts < self._seek_target:
+                    continue
+                self._seek_target = None
+            return frame
+        return None
+
+    def read(self) -> Optional[VideoFrame]:
+        """Next decoded frame, or None at the end of a file that does not loop"""
+        frame = self._next_frame()
+        if frame is None and self.loop and self._last_pts is not None:
+            # Continue the timeline one frame after the last frame of this pass
+            self._loop_offset = self._last_pts + self.frame_duration
+            self.loops += 1
+            self.seek(self.start_pts)
+            frame = self._next_frame()
+        if frame is None:
+            return None
+
+        frame.pts = frame.pts - self.start_pts + self._loop_offset
+        frame.time_base = self.time_base
+        self._last_pts = frame.pts
+        return frame
+
+    def close(self):
+        self.container.close()
+
+
+class LiveCapture:
+    """
+    Capture frames from a live source, reconnecting when it drops
+
+    The source is a V4L2 device index or a stream URL (RTSP, HTTP MJPEG, or
+    anything else FFmpeg opens). A failed read closes the capture and opens
+    it again; failed opens are retried with exponential backoff until the
+    capture is closed. A local file path also works: every end of file is a
+    disconnect, so the file plays on a loop through the reconnect path.
+    read() blocks; use it from a ReadAheadReader with drop_oldest.
+    """
+
+    def __init__(
+        self,
+        source: Union[int, str],
+        initial_delay: float = 0.5,
+        max_delay: float = 10.0,
+        timeout_ms: int = 5000
+    ):
+        """
+        Initialize the capture (the source is opened by the first read())
+
+        Args:
+            source: Device index, or URL/path of the stream
+            initial_delay: Seconds to wait after the first failed open
+            max_delay: Upper bound for the doubling retry delay
+            timeout_ms: Open and read timeout for network streams
+        """
+        self.source = source
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout_ms = timeout_ms
+        self._cap: Optional[cv2.VideoCapture] = None
+        self._delay = initial_delay
+        self._frames_since_connect = 0
+        self._closed = threading.Event()
+        # Held by the reading thread while it uses the capture
+        self._lock = threading.Lock()
+
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+        self.failed_connects = 0
+        self.frames = 0
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+
+    def _open(self) -> bool:
+        if isinstance(self.source, int):
+            cap = cv2.VideoCapture(self.source)
+        else:
+            # Bound how long a dead network source can block the capture thread
+            cap = cv2.VideoCapture(self.source, cv2.CAP_FFMPEG, [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, self.timeout_ms,
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, self.timeout_ms
+            ])
+        if not cap.isOpened():
+            cap.release()
+            return False
+
+        # Keep as few frames as possible queued inside the driver or demuxer
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._cap = cap
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        return True
+
+    def _backoff(self):
+        # Wakes up early when the capture is closed
+        self._closed.wait(self._delay)
+        self._delay = min(self._delay * 2, self.max_delay)
+
+    def _release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        self.connected = False
+
+    def read(self) -> Optional[Tuple[np.ndarray, float]]:
+        """Next frame and its wall-clock capture time, or None once closed"""
+        with self._lock:
+            while not self._closed.is_set():
+                if self._cap is None:
+                    if not self._open():
+                        self.failed_connects += 1
+                        logger.warning(
+                            f"Could not open live source {self.source}, retrying in {self._delay:.1f}s"
+                        )
+                        self._backoff()
+                        continue
+                    self._frames_since_connect = 0
+                    self.connects += 1
+                    self.connected = True
+                    logger.info(
+                        f"Live source {self.source} connected: "
+                        f"{self.width}x{self.height} @ {self.fps:.1f}fps"
+                    )
+
+                ok, frame = self._cap.read()
+                if ok and frame is not None:
+                    self._delay = self.initial_delay
+                    self._frames_since_connect += 1
+                    self.frames += 1
+                    return frame, time.time()
+
+                # Lost the source (or a file ended): reopen it right away, unless
+                # it opened but never delivered a frame
+                logger.warning(f"Live source {self.source} stopped delivering frames, reconnecting")
+                self.disconnects += 1
+                self._release()
+                if self._frames_since_connect == 0:
+                    self._backoff()
+
+            self._release()
+            return None
+
+    def close(self):
+        """Stop reading; a read in progress releases the capture when it returns"""
+        self._closed.set()
+        if self._lock.acquire(blocking=False):
+            try:
+                self._release()
+            finally:
+                self._lock.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "failed_connects": self.failed_connects,
+            "frames_captured": self.frames,
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps
+        }
+
+
+# Network protocols a client-supplied stream URL may use (never local files)
+LIVE_URL_SCHEMES = ("rtsp", "rtsps", "http", "https")
+
+
+def _split_netloc(netloc: str) -> Tuple[str, str]:
+    """Host (lowercase, without brackets) and port of a netloc, ignoring credentials"""
+    host_port = netloc.rpartition("@")[2]
+    host, port = host_port, ""
+    if ":" in host_port and not host_port.endswith("]"):
+        host, _, port = host_port.rpartition(":")
+    return host.strip("[]").lower(), port
+
+
+def stream_url_allowed(url: str, pattern: str) -> bool:
+    """
+    Whether a stream URL matches an allowed-source pattern
+
+    Scheme, host, port and path are matched separately, and a host wildcard
+    matches within one label only ("10.0.0.*" does not match
+    "10.0.0.5.example.com"), so credentials or extra labels cannot smuggle
+    in another host.
+    """
+    try:
+        parsed, allowed = urlparse(url), urlparse(pattern)
+    except ValueError:
+        # Malformed netloc (e.g. an invalid bracketed IPv6 host)
+        return False
+    if parsed.scheme.lower() != allowed.scheme.lower():
+        return False
+    host, port = _split_netloc(parsed.netloc)
+    allowed_host, allowed_port = _split_netloc(allowed.netloc)
+    host_labels, allowed_labels = host.split("."), allowed_host.split(".")
+    if len(host_labels) != len(allowed_labels) or not all(
+            fnmatch.fnmatchcase(label, allowed_label)
+            for label, allowed_label in zip(host_labels, allowed_labels)):
+        return False
+    path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+    allowed_path = allowed.path + (f"?{allowed.query}" if allowed.query else "")
+    return fnmatch.fnmatchcase(port, allowed_port) and fnmatch.fnmatchcase(path or "/", allowed_path or "/")